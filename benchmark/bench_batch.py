@@ -0,0 +1,78 @@
+"""
+逐条 handler 与批量 handler 写入数据库的对比
+
+sqlite 文件数据库, 每次 handler 调用为一次写入事务 (模拟一次数据库往返),
+20000 条弹幕, 每帧 20 条, 对比写入事务数和总耗时
+
+    python -m benchmark.bench_batch
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+from blive import BLiver, Events
+
+from .samples import danmu_msg, packed_frame
+
+N = 20000
+
+
+def open_db(path):
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE IF NOT EXISTS danmu (uid INTEGER, uname TEXT, content TEXT, ts INTEGER)")
+    return db
+
+
+def row(ctx):
+    msg = ctx.message
+    return (msg.sender.id, msg.sender.name, msg.content, msg.timestamp["ts"])
+
+
+async def run(frames, db, batch=None):
+    bliver = BLiver(510)
+    commits = 0
+
+    def save(ctx):
+        nonlocal commits
+        with db:
+            db.execute("INSERT INTO danmu VALUES (?, ?, ?, ?)", row(ctx))
+        commits += 1
+
+    def save_many(ctxs):
+        nonlocal commits
+        with db:
+            db.executemany("INSERT INTO danmu VALUES (?, ?, ?, ?)", [row(ctx) for ctx in ctxs])
+        commits += 1
+
+    if batch is None:
+        bliver.on(Events.DANMU_MSG, save)
+    else:
+        bliver.on_batch(Events.DANMU_MSG, save_many, max_size=batch, max_delay=0.2)
+    start = time.perf_counter()
+    for frame in frames:
+        await bliver._dispatch_frame(frame)
+        await asyncio.sleep(0)
+    await bliver.graceful_close()
+    elapsed = time.perf_counter() - start
+    count = db.execute("SELECT count(*) FROM danmu").fetchone()[0]
+    db.execute("DELETE FROM danmu")
+    db.commit()
+    name = "per message" if batch is None else f"batch {batch}"
+    print(f"{name:>12} {count:>8} {commits:>8} {elapsed:>8.2f}s {count / elapsed:>10.0f}")
+
+
+async def main():
+    frames = [packed_frame([danmu_msg(uid=i * 20 + j) for j in range(20)]) for i in range(N // 20)]
+    with tempfile.TemporaryDirectory() as d:
+        db = open_db(os.path.join(d, "danmu.db"))
+        print(f"{'handler':>12} {'rows':>8} {'commits':>8} {'time':>9} {'rows/s':>10}")
+        await run(frames, db)
+        for batch in (50, 500):
+            await run(frames, db, batch)
+        db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+"""
+json 后端对比
+
+对解压拆包后的 payload 做解析, 以及对消息体做序列化, 对比各个已安装的后端
+
+    python -m benchmark.bench_codec [--recording frames.rec]
+"""
+import argparse
+
+from blive.codec import available_codecs, get_codec
+from blive.core import BLiveMsgPackage
+
+from .samples import bench, mixed_messages, packed_frame, recorded_frames
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recording", help="使用 blive.record 录制的数据帧, 默认使用合成数据")
+    args = parser.parse_args()
+
+    packman = BLiveMsgPackage()
+    if args.recording:
+        frames = recorded_frames(args.recording, limit=2000)
+    else:
+        frames = [packed_frame(mixed_messages(100, seed=i)) for i in range(20)]
+    payloads = [payload for frame in frames for _, payload in packman.unpack_raw(frame)]
+    bodies = mixed_messages(2000)
+
+    def decode_str(codec):
+        # 旧路径: 先 utf-8 decode 再解析
+        for payload in payloads:
+            codec.loads(str(payload, "utf-8"))
+
+    def decode_bytes(codec):
+        for payload in payloads:
+            codec.loads(payload)
+
+    def encode(codec):
+        for body in bodies:
+            codec.dumps(body)
+
+    print(f"{len(payloads)} payloads, {sum(len(p) for p in payloads)} bytes")
+    print(f"{'codec':>8} {'decode str(us/msg)':>19} {'decode bytes(us/msg)':>21} {'encode(us/msg)':>15}")
+    for name in available_codecs():
+        codec = get_codec(name)
+        ds = bench(decode_str, codec, repeat=3) / len(payloads)
+        db = bench(decode_bytes, codec, repeat=3) / len(payloads)
+        en = bench(encode, codec, repeat=3) / len(bodies)
+        print(f"{name:>8} {ds * 1e6:>19.2f} {db * 1e6:>21.2f} {en * 1e6:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+礼物连击合并 benchmark
+
+--users 个用户同时连击, 每人 --gifts 次 SEND_GIFT (num=1), 每 10 次附带一条 COMBO_SEND,
+统计合并前后的消息数, 每条消息的处理耗时, 以及合并结果是否与原始礼物数一致
+
+    python -m benchmark.bench_combo [--users 500] [--gifts 40]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from blive import BLiver, Events
+from blive.combo import ComboAggregator
+from blive.timewheel import TimingWheel
+
+from .samples import combo_send_msg, packed_frame, send_gift_msg
+
+
+def gift_stream(users, gifts, seed=0):
+    random.seed(seed)
+    streams = []
+    for uid in range(users):
+        combo_id = f"batch:gift:combo_id:{uid}:7706705:30607:{seed}"
+        msgs = []
+        for i in range(1, gifts + 1):
+            m = send_gift_msg(uid=uid, combo_id=combo_id, num=1)
+            m["data"]["combo_stay_time"] = 1
+            msgs.append(m)
+            if i % 10 == 0:
+                msgs.append(combo_send_msg(uid=uid, combo_id=combo_id, total_num=i))
+        streams.append(msgs)
+    # 把所有用户的连击交错在一起
+    merged = []
+    while streams:
+        s = random.choice(streams)
+        merged.append(s.pop(0))
+        if not s:
+            streams.remove(s)
+    return merged
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--gifts", type=int, default=40)
+    args = parser.parse_args()
+
+    messages = gift_stream(args.users, args.gifts)
+    frames = [packed_frame(messages[i : i + 50]) for i in range(0, len(messages), 50)]
+
+    bliver = BLiver(510)
+    aggregator = ComboAggregator(wheel=TimingWheel(tick=0.1, slots=32), grace=0.2)
+    aggregator.wheel.start()
+    aggregator.attach(bliver)
+    settled = []
+    bliver.on(Events.GIFT_SETTLED, settled.append)
+
+    start = time.perf_counter()
+    for frame in frames:
+        await bliver._dispatch_frame(frame)
+    feed = time.perf_counter() - start
+    pending = len(aggregator.combos)
+    timers = len(aggregator.wheel)
+    while aggregator.combos:
+        await asyncio.sleep(0.1)
+    aggregator.close()
+    await bliver.graceful_close()
+
+    total = sum(c.num for c in settled)
+    print(f"input messages:    {len(messages)}")
+    print(f"settled events:    {len(settled)} ({len(messages) / len(settled):.0f}x fewer)")
+    print(f"gifts in/settled:  {args.users * args.gifts} / {total}")
+    print(f"open combos/timers after feed: {pending} / {timers}")
+    print(f"dispatch + aggregate: {feed / len(messages) * 1e6:.1f} us/msg")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+重复消息过滤 benchmark
+
+模拟每 --reconnect-every 帧断线重连一次, 重连后服务器重新下发最近 --replay 帧,
+对比不过滤和使用 Deduplicator 时 handler 统计到的醒目留言 / 礼物 / 弹幕数, 每条消息的额外耗时,
+以及 Deduplicator 占用的内存 (超过 max_size 后不再增长)
+
+    python -m benchmark.bench_dedup [--frames 4000] [--reconnect-every 200] [--replay 20] [--max-size 50000]
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from collections import Counter
+
+from blive import BLiver
+from blive.dedup import KEYS, Deduplicator
+
+from .samples import mixed_messages, packed_frame
+
+BATCH = 50
+
+
+def replayed_stream(frames, every, replay):
+    """原始帧序列中每 every 帧插入一次最近 replay 帧的重复"""
+    for i, frame in enumerate(frames, 1):
+        yield frame
+        if i % every == 0:
+            yield from frames[max(0, i - replay) : i]
+
+
+def unique_danmu(messages, seed):
+    """样例弹幕的 uid, 内容相同, 按真实情况让每条弹幕的发送时间不同"""
+    for i, m in enumerate(messages):
+        if m["cmd"] == "DANMU_MSG":
+            m["info"][0][4] = seed * BATCH + i
+    return messages
+
+
+async def run(frames, dedup, typed=False):
+    bliver = BLiver(510, dedup=dedup, typed=typed)
+    counts = Counter()
+    for cmd in KEYS:
+        bliver.on(cmd, lambda ctx: counts.update((ctx.body.get("cmd"),)))
+    start = time.perf_counter()
+    for frame in frames:
+        await bliver._dispatch_frame(frame)
+    elapsed = time.perf_counter() - start
+    await bliver.graceful_close()
+    return counts, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=4000)
+    parser.add_argument("--reconnect-every", type=int, default=200)
+    parser.add_argument("--replay", type=int, default=20)
+    parser.add_argument("--max-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    frames = [packed_frame(unique_danmu(mixed_messages(BATCH, seed=i), i)) for i in range(args.frames)]
+    stream = list(replayed_stream(frames, args.reconnect_every, args.replay))
+    n = len(stream) * BATCH
+
+    truth, _ = await run(frames, None)
+    plain, plain_time = await run(stream, None)
+    dedup = Deduplicator(max_size=args.max_size)
+    deduped, dedup_time = await run(stream, dedup)
+
+    # 单独统计 Deduplicator 的内存: 送入 10 倍 max_size 条不同的消息
+    tracemalloc.start()
+    bounded = Deduplicator(max_size=args.max_size)
+    for i in range(args.max_size * 10):
+        bounded.is_duplicate(510, "SUPER_CHAT_MESSAGE", {"data": {"id": i}})
+        if i + 1 in (args.max_size, args.max_size * 2, args.max_size * 10):
+            print(f"after {i + 1} ids: {tracemalloc.get_traced_memory()[0] / 1024 / 1024:.1f} MB, size={len(bounded.seen)}")
+    tracemalloc.stop()
+
+    print(f"{n} messages ({len(stream) - len(frames)} replayed frames)")
+    print(f"{'cmd':>20} {'actual':>8} {'no dedup':>9} {'dedup':>8}")
+    for cmd in sorted(truth):
+        print(f"{cmd:>20} {truth[cmd]:>8} {plain[cmd]:>9} {deduped[cmd]:>8}")
+    print(f"dispatch: {plain_time / n * 1e6:.2f} us/msg without dedup, {dedup_time / n * 1e6:.2f} us/msg with dedup")
+    print(f"dedup stats: {dedup.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
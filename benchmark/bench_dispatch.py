@@ -0,0 +1,61 @@
+"""
+突发流量下的内存对比
+
+慢 handler (每条消息 await 50ms) 遇到突发的 50k 条消息, 对比默认的每条消息一个 task 与有界分发队列
+
+    python -m benchmark.bench_dispatch
+"""
+import asyncio
+import gc
+import resource
+import time
+
+from blive import BLiver, Events
+from blive.dispatch import BoundedDispatcher, OverflowPolicy
+
+from .samples import danmu_msg, packed_frame
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 1024 / 1024
+
+
+async def burst(dispatcher, frames):
+    bliver = BLiver(510, dispatcher=dispatcher)
+
+    async def slow_handler(ctx):
+        await asyncio.sleep(0.05)
+
+    bliver.on(Events.DANMU_MSG, slow_handler)
+    gc.collect()
+    base = rss_mb()
+    start = time.perf_counter()
+    peak_tasks = 0
+    for frame in frames:
+        await bliver._dispatch_frame(frame)
+        await asyncio.sleep(0)
+        peak_tasks = max(peak_tasks, len(asyncio.all_tasks()))
+    elapsed = time.perf_counter() - start
+    name = "tasks" if dispatcher is None else dispatcher.policy.value
+    stats = dispatcher.stats() if dispatcher else {}
+    print(
+        f"{name:>12} {elapsed:>8.2f}s {rss_mb() - base:>9.1f} {peak_tasks:>10}"
+        f" {stats.get('depth', '-'):>6} {stats.get('dropped', '-'):>8} {stats.get('coalesced', '-'):>9}"
+    )
+    await bliver.graceful_close()
+    for t in asyncio.all_tasks() - {asyncio.current_task()}:
+        t.cancel()
+    await asyncio.sleep(0.01)
+
+
+async def main():
+    frames = [packed_frame([danmu_msg(uid=i * 100 + j) for j in range(100)]) for i in range(500)]
+    print(f"{'mode':>12} {'time':>9} {'rss(MB)':>9} {'peak tasks':>10} {'depth':>6} {'dropped':>8} {'coalesced':>9}")
+    await burst(None, frames)
+    for policy in (OverflowPolicy.DROP_OLDEST, OverflowPolicy.DROP_NEWEST, OverflowPolicy.COALESCE):
+        await burst(BoundedDispatcher(maxsize=1000, workers=8, policy=policy), frames)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
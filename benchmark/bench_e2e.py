@@ -0,0 +1,100 @@
+"""
+端到端吞吐 benchmark
+
+在子进程中启动 blive.mockserver 按设定速率推送消息, 用 BLiveHub 连接 1..N 个房间,
+统计 消息数/秒, handler 延迟 p50/p99 以及 RSS
+
+    python -m benchmark.bench_e2e [--rooms 1 10 100] [--rate 500] [--batch 20] [--version deflate] [--protover auto]
+"""
+import argparse
+import asyncio
+import resource
+import socket
+import sys
+import time
+
+from blive import Events
+from blive.hub import BLiveHub
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 1024 / 1024
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_server(args):
+    port = free_port()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "blive.mockserver",
+        "--port", str(port), "--rate", str(args.rate), "--batch", str(args.batch), "--version", args.version,
+        stdout=asyncio.subprocess.PIPE,
+    )
+    await proc.stdout.readline()  # 等待 server 启动
+    return proc, f"http://127.0.0.1:{port}"
+
+
+async def run(n, args):
+    proc, api_host = await start_server(args)
+    hub = BLiveHub(ssl=False, api_host=api_host, protover=args.protover)
+    latencies = []
+    received = 0
+
+    async def handler(ctx):
+        nonlocal received
+        received += 1
+        latencies.append(time.time() - ctx.body["_mock_ts"])
+
+    for cmd in (Events.DANMU_MSG, Events.INTERACT_WORD, Events.SEND_GIFT, Events.ONLINE_RANK_COUNT):
+        hub.on(cmd, handler)
+    for i in range(n):
+        hub.add_room(i + 1)
+
+    await asyncio.sleep(args.warmup)
+    received = 0
+    latencies.clear()
+    cpu = time.process_time()
+    start = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    print(
+        f"{n:>6} {received / elapsed:>12,.0f} {percentile(latencies, 50) * 1e3:>9.2f}"
+        f" {percentile(latencies, 99) * 1e3:>9.2f} {cpu / elapsed * 100:>7.1f}% {rss_mb():>8.1f}"
+    )
+    await hub.close()
+    proc.terminate()
+    await proc.wait()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--rate", type=float, default=500, help="每个房间每秒消息数")
+    parser.add_argument("--batch", type=int, default=20)
+    parser.add_argument("--version", choices=["auto", "normal", "deflate", "brotli"], default="deflate")
+    parser.add_argument("--protover", default="auto", help="客户端认证时的 protover, --version auto 时生效")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--warmup", type=float, default=2)
+    args = parser.parse_args()
+
+    print(f"rate={args.rate}/s per room, batch={args.batch}, version={args.version}")
+    print(f"{'rooms':>6} {'msgs/s':>12} {'p50(ms)':>9} {'p99(ms)':>9} {'cpu':>8} {'rss(MB)':>8}")
+    for n in args.rooms:
+        await run(n, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+带条件 handler benchmark
+
+注册 --handlers 个只关心某一个用户弹幕的 handler (例如按用户推送的订阅), 对比在 handler 内判断 uid
+与使用 app.on(..., uid=x) 过滤条件的每条消息耗时, 分别测试普通函数和协程 handler
+
+    python -m benchmark.bench_filters [--handlers 1000] [--messages 5000] [--users 20000]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from blive import BLiver, Events
+
+from .samples import danmu_msg, packed_frame
+
+
+def naive_handler(uid, hits, coroutine):
+    if coroutine:
+
+        async def handler(ctx):
+            if ctx.message.sender.id != uid:
+                return
+            hits.append(uid)
+
+    else:
+
+        def handler(ctx):
+            if ctx.message.sender.id != uid:
+                return
+            hits.append(uid)
+
+    return handler
+
+
+def filtered_handler(uid, hits, coroutine):
+    if coroutine:
+
+        async def handler(ctx):
+            hits.append(uid)
+
+    else:
+
+        def handler(ctx):
+            hits.append(uid)
+
+    return handler
+
+
+async def run(name, frames, handlers, coroutine, typed):
+    bliver = BLiver(510, typed=typed)
+    hits = []
+    for uid in range(handlers):
+        if name == "naive":
+            bliver.on(Events.DANMU_MSG, naive_handler(uid, hits, coroutine))
+        else:
+            bliver.on(Events.DANMU_MSG, filtered_handler(uid, hits, coroutine), uid=uid)
+    start = time.perf_counter()
+    for frame in frames:
+        await bliver._dispatch_frame(frame)
+        await asyncio.sleep(0)  # 让协程 handler 的 task 运行
+    while len(asyncio.all_tasks()) > 1:
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    await bliver.graceful_close()
+    return elapsed, len(hits)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--handlers", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=20000, help="发送弹幕的用户数, 前 --handlers 个用户被订阅")
+    args = parser.parse_args()
+
+    random.seed(0)
+    msgs = [danmu_msg(uid=random.randrange(args.users)) for _ in range(args.messages)]
+    frames = [packed_frame(msgs[i : i + 50]) for i in range(0, len(msgs), 50)]
+    print(f"{args.messages} danmu, {args.handlers} handlers, {args.users} users")
+    print(f"{'handler':>9} {'decode':>7} {'mode':>9} {'us/msg':>10} {'hits':>6}")
+    for coroutine in (False, True):
+        for typed in (False, True):
+            for name in ("naive", "filtered"):
+                elapsed, hits = await run(name, frames, args.handlers, coroutine, typed)
+                kind = "async" if coroutine else "sync"
+                decode = "typed" if typed else "dict"
+                print(f"{kind:>9} {decode:>7} {name:>9} {elapsed / args.messages * 1e6:>10.1f} {hits:>6}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
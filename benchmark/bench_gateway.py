@@ -0,0 +1,213 @@
+"""
+转发网关 benchmark
+
+模拟服务器在子进程中向 --rooms 个房间推送消息 (每个房间 --rate 条/秒), 网关在主进程中运行,
+--clients 个 websocket 客户端在另一个进程中连接网关并订阅全部房间, 只读取数据不解析
+    naive:   每个客户端单独注册 handler, 每条消息单独编码并 send_str (with_fastapi.py 的做法)
+    gateway: Gateway, 每批消息只拼接一次 json, 同组客户端共用
+统计客户端收到的消息数和网关进程的 CPU 占用; 之后加入 --slow 个不读取数据的客户端, 检查它们是否被断开
+
+    python -m benchmark.bench_gateway [--clients 1000,10000] [--naive-clients 200] [--rooms 2] [--rate 50] [--batch-delay 0.25] [--seconds 10]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from aiohttp import web
+
+from blive import Events
+from blive.gateway import Gateway
+from blive.hub import BLiveHub
+
+SERVER_PORT = 18961
+GATEWAY_PORT = 18962
+MARKER = b'"room_id":'
+WARMUP = 3
+
+
+def clients_main(n, path, seconds, ready, results, slow=False):
+    """在子进程中运行 n 个客户端, 返回 (统计时间内收到的消息数, 被网关断开的客户端数)"""
+
+    async def connect(semaphore):
+        # 限制同时握手的连接数, 避免超过 listen backlog
+        async with semaphore:
+            reader, writer = await asyncio.open_connection("127.0.0.1", GATEWAY_PORT)
+            if slow:
+                writer.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+            key = base64.b64encode(os.urandom(16)).decode()
+            writer.write(
+                f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n".encode()
+            )
+            await reader.readuntil(b"\r\n\r\n")
+        return reader, writer
+
+    async def client(semaphore, counter, connected):
+        reader, writer = await connect(semaphore)
+        connected[0] += 1
+        if slow:  # 不再读取
+            await asyncio.sleep(3600)
+        while True:
+            data = await reader.read(1024 * 1024)
+            if not data:
+                counter[1] += 1
+                return
+            counter[0] += data.count(MARKER)
+
+    async def main():
+        counter, connected = [0, 0], [0]
+        semaphore = asyncio.Semaphore(200)
+        tasks = [asyncio.ensure_future(client(semaphore, counter, connected)) for _ in range(n)]
+        while connected[0] < n:
+            await asyncio.sleep(0.1)
+        ready.set()
+        await asyncio.sleep(WARMUP)
+        start_count = counter[0]
+        await asyncio.sleep(seconds)
+        results.put((counter[0] - start_count, counter[1]))
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(main())
+
+
+def _rss():
+    """当前进程的常驻内存 (MB), 仅 linux"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def naive_app(hub):
+    """每个客户端一个 handler, 每条消息单独编码发送"""
+
+    async def handle(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        async def forward(ctx):
+            if ws.closed:
+                return
+            data = json.dumps({"room_id": ctx.bliver.room_id, "data": ctx.body})
+            try:
+                await ws.send_str(data)
+            except ConnectionError:
+                pass
+
+        for cmd in (Events.DANMU_MSG, Events.SEND_GIFT, Events.INTERACT_WORD):
+            hub.on(cmd, forward)
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            for cmd in (Events.DANMU_MSG, Events.SEND_GIFT, Events.INTERACT_WORD):
+                hub.remove_listener(cmd, forward)
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/ws", handle)
+    return app
+
+
+async def run(mode, n, args, slow=0):
+    rooms = list(range(1, args.rooms + 1))
+    hub = BLiveHub(ssl=False, api_host=f"http://127.0.0.1:{SERVER_PORT}")
+    gateway = None
+    if mode == "naive":
+        await hub.add_rooms(rooms)
+        app = naive_app(hub)
+    else:
+        gateway = Gateway(
+            hub,
+            cmds=[Events.DANMU_MSG, Events.SEND_GIFT, Events.INTERACT_WORD],
+            batch_delay=args.batch_delay,
+            max_buffer=256 * 1024,
+        )
+        app = gateway.app()
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", GATEWAY_PORT, backlog=4096).start()
+
+    path = f"/ws?rooms={','.join(map(str, rooms))}"
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    groups = [(n, False)] + ([(slow, True)] if slow else [])
+    procs = []
+    for count, is_slow in groups:
+        ready = ctx.Event()
+        p = ctx.Process(target=clients_main, args=(count, path, args.seconds, ready, results, is_slow))
+        p.start()
+        procs.append((p, ready))
+    loop = asyncio.get_event_loop()
+    # 等待所有客户端连接并预热后开始统计
+    for _, ready in procs:
+        await loop.run_in_executor(None, ready.wait)
+    await asyncio.sleep(WARMUP)
+    start_cpu, start = time.process_time(), time.monotonic()
+    outputs = [await loop.run_in_executor(None, results.get) for _ in procs]
+    cpu = (time.process_time() - start_cpu) / (time.monotonic() - start)
+    rss = _rss()
+    for p, _ in procs:
+        p.join()
+    slow_clients = gateway.slow_clients if gateway else 0
+    await runner.cleanup()
+    if mode == "naive":
+        await hub.close()
+    received = max(o[0] for o in outputs)  # 不读取数据的客户端收到的消息数为 0
+    return received / args.seconds, cpu, slow_clients, rss
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", default="1000,10000")
+    parser.add_argument("--naive-clients", type=int, default=200)
+    parser.add_argument("--rooms", type=int, default=2)
+    parser.add_argument("--rate", type=int, default=50, help="模拟服务器每个房间每秒推送的消息数")
+    parser.add_argument("--batch-delay", type=float, default=0.25)
+    parser.add_argument("--slow", type=int, default=20)
+    parser.add_argument("--slow-rate", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    def start_server(rate):
+        server = subprocess.Popen(
+            [sys.executable, "-m", "blive.mockserver", "--port", str(SERVER_PORT), "--rate", str(rate), "--batch", "10"],
+            stdout=subprocess.PIPE,
+        )
+        server.stdout.readline()
+        return server
+
+    server = start_server(args.rate)
+    try:
+        print(f"{args.rooms} rooms x {args.rate} msg/s, batch delay {args.batch_delay}s, {os.cpu_count()} CPUs")
+        print(f"{'mode':>8} {'clients':>8} {'delivered/s':>12} {'per client':>11} {'gateway cpu':>12} {'rss':>9} {'slow':>6}")
+        runs = [("naive", args.naive_clients)] + [("gateway", int(n)) for n in args.clients.split(",")]
+        for mode, n in runs:
+            delivered, cpu, slow_clients, rss = await run(mode, n, args)
+            print(
+                f"{mode:>8} {n:>8} {delivered:>12.0f} {delivered / n:>11.1f} {cpu:>11.0%} {rss:>8.0f}M {slow_clients:>6}"
+            )
+    finally:
+        server.terminate()
+        server.wait()
+
+    server = start_server(args.slow_rate)
+    try:
+        print(f"\n{args.slow} clients stop reading, {args.rooms} rooms x {args.slow_rate} msg/s")
+        args.seconds = 15
+        _, _, slow_clients, rss = await run("gateway", 100, args, slow=args.slow)
+        print(f"  disconnected slow clients: {slow_clients}/{args.slow}, rss {rss:.0f}M")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+多直播间内存 / CPU 对比
+
+连接本地 mock server, 对比每个房间一个 BLiver (独立 session + scheduler) 与 BLiveHub 管理所有房间
+
+    python -m benchmark.bench_hub [--rooms 100 1000 5000] [--window 10]
+"""
+import argparse
+import asyncio
+import resource
+import sys
+import time
+
+from blive import BLiver
+from blive.hub import BLiveHub
+from blive.mockserver import MockBLiveServer
+
+HEARTBEAT_INTERVAL = 5  # 缩短心跳间隔, 让统计窗口内每个房间都发送几次心跳
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 1024 / 1024
+
+
+async def wait_connected(rooms, timeout=300):
+    deadline = time.monotonic() + timeout
+    while any(r.ws is None for r in rooms):
+        if time.monotonic() > deadline:
+            raise TimeoutError("rooms not connected")
+        await asyncio.sleep(0.1)
+
+
+async def worker(mode, n, api_host, window):
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    if mode == "bliver":
+        rooms = []
+        for i in range(n):
+            b = BLiver(i + 1, ssl=False, api_host=api_host)
+            b.heartbeat_interval = HEARTBEAT_INTERVAL
+            b.run_as_task()
+            rooms.append(b)
+    else:
+        hub = BLiveHub(ssl=False, api_host=api_host, heartbeat_interval=HEARTBEAT_INTERVAL)
+        rooms = [hub.add_room(i + 1) for i in range(n)]
+    await wait_connected(rooms)
+    connect_time = time.perf_counter() - start
+
+    cpu_start = time.process_time()
+    await asyncio.sleep(window)
+    cpu = time.process_time() - cpu_start
+    print(f"{mode:>7} {n:>6} {connect_time:>10.2f} {rss_mb() - base_rss:>9.1f} {cpu / window * 100:>8.1f}%")
+    sys.stdout.flush()
+    # 直接退出进程, 不等待逐个关闭
+
+
+async def run_server(rooms, window):
+    server = await MockBLiveServer().start()
+    print(f"{'mode':>7} {'rooms':>6} {'connect(s)':>10} {'rss(MB)':>9} {'cpu':>9}")
+    for n in rooms:
+        for mode in ("bliver", "hub"):
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "benchmark.bench_hub",
+                "--worker", mode, str(n), server.api_host, str(window),
+            )
+            await proc.wait()
+    await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--window", type=float, default=10)
+    parser.add_argument("--worker", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if args.worker:
+        mode, n, api_host, window = args.worker
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(worker(mode, int(n), api_host, float(window)))
+        sys.exit(0)
+    asyncio.run(run_server(args.rooms, args.window))
+
+
+if __name__ == "__main__":
+    main()
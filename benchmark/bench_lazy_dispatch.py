@@ -0,0 +1,52 @@
+"""
+按需解析 benchmark
+
+1 个 DANMU_MSG handler, 混合 cmd 分布的数据帧, 对比每个包都解析 json 与先取 cmd 再按需解析的吞吐
+
+    python -m benchmark.bench_lazy_dispatch
+"""
+import asyncio
+import time
+
+from blive import BLiver, BLiverCtx, Events
+
+from .samples import mixed_messages, packed_frame
+
+
+def eager_handle_frame(bliver, data):
+    # 旧实现: 每个包都做 utf-8 解码 + json 解析 + 构建 ctx
+    mq = bliver.packman.unpack(data)
+    ctxs = filter(lambda ctx: ctx.body.get("cmd", None), [BLiverCtx(bliver, m) for m in mq])
+    for ctx in ctxs:
+        bliver.emit(ctx.body["cmd"], ctx)
+
+
+def run(handle, bliver, frames, seconds=1.0):
+    packets = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for frame, n in frames:
+            handle(frame)
+            packets += n
+    return packets / (time.perf_counter() - start)
+
+
+async def main():
+    bliver = BLiver(510)
+    received = []
+    bliver.on(Events.DANMU_MSG, lambda ctx: received.append(ctx.body["cmd"]))
+
+    frames = []
+    for i in range(50):
+        msgs = mixed_messages(100, seed=i)
+        frames.append((packed_frame(msgs), len(msgs)))
+
+    eager = run(lambda f: eager_handle_frame(bliver, f), bliver, frames)
+    lazy = run(bliver._handle_frame, bliver, frames)
+    print(f"eager: {eager:>12,.0f} packets/s")
+    print(f"lazy : {lazy:>12,.0f} packets/s ({lazy / eager:.2f}x)")
+    await bliver.aio_session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
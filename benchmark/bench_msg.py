@@ -0,0 +1,129 @@
+"""
+消息操作类的构造与属性访问开销
+
+旧实现: 每次访问都重新切分路径字符串, sender 每次访问都新建 Sender + Medal
+新实现: 路径在类定义时解析, sender 等属性缓存, __slots__
+
+    python -m benchmark.bench_msg
+"""
+from blive.msg import DanMuMsg, SendGiftMsg, SuperChatMsg
+
+from .samples import bench, danmu_msg, send_gift_msg, super_chat_msg
+
+
+def old_chain_get(dic, chain, default=None):
+    chain = tuple(chain.split("."))
+    try:
+        for k in chain:
+            dic = dic[k]
+        return dic
+    except (TypeError, KeyError):
+        return default
+
+
+class OldMedal:
+    def __init__(self, medal_name, medal_level) -> None:
+        self.medal_name = medal_name
+        self.medal_level = medal_level
+
+
+class OldSender:
+    def __init__(self, id, name, medal_name, medal_level) -> None:
+        self.id = id
+        self.name = name
+        self.medal = OldMedal(medal_name, medal_level)
+
+
+class OldDanMuMsg:
+    def __init__(self, body) -> None:
+        self.body = body
+
+    @property
+    def content(self):
+        return self.body["info"][1]
+
+    @property
+    def sender(self):
+        return OldSender(
+            id=self.body["info"][2][0],
+            name=self.body["info"][2][1],
+            medal_name=self.body["info"][3][1] if self.body["info"][3] else "",
+            medal_level=self.body["info"][3][0] if self.body["info"][3] else 0,
+        )
+
+
+class OldSendGiftMsg:
+    def __init__(self, body) -> None:
+        self.body = body
+
+    @property
+    def sender(self):
+        return OldSender(
+            id=old_chain_get(self.body, "data.uid"),
+            name=old_chain_get(self.body, "data.uname"),
+            medal_name=old_chain_get(self.body, "data.medal_info.medal_name"),
+            medal_level=old_chain_get(self.body, "data.medal_info.medal_level"),
+        )
+
+    @property
+    def gift(self):
+        return {
+            "gift_id": old_chain_get(self.body, "data.giftId"),
+            "gift_name": old_chain_get(self.body, "data.giftName"),
+            "gift_type": old_chain_get(self.body, "data.giftType"),
+        }
+
+
+class OldSuperChatMsg:
+    def __init__(self, body) -> None:
+        self.body = body
+
+    @property
+    def content(self):
+        return old_chain_get(self.body, "data.message")
+
+    @property
+    def price(self):
+        return old_chain_get(self.body, "data.price")
+
+    @property
+    def sender(self):
+        return OldSender(
+            id=old_chain_get(self.body, "data.uid"),
+            name=old_chain_get(self.body, "data.user_info.uname"),
+            medal_name=old_chain_get(self.body, "data.medal_info.medal_name"),
+            medal_level=old_chain_get(self.body, "data.medal_info.medal_level"),
+        )
+
+
+def danmu_handler(cls, body):
+    # 与 example/app.py 中的 handler 相同的访问方式
+    danmu = cls(body)
+    return f"{danmu.sender.name} ({danmu.sender.medal.medal_name}:{danmu.sender.medal.medal_level}): {danmu.content}"
+
+
+def gift_handler(cls, body):
+    msg = cls(body)
+    return f"{msg.sender.name} ({msg.sender.medal.medal_name}:{msg.sender.medal.medal_level}) {msg.gift['gift_name']}"
+
+
+def sc_handler(cls, body):
+    msg = cls(body)
+    return f"{msg.sender.name} ({msg.sender.medal.medal_name}:{msg.sender.medal.medal_level}) {msg.price} {msg.content}"
+
+
+def main():
+    print(f"{'message':>20} {'old(us)':>9} {'new(us)':>9} {'speedup':>8}")
+    for name, handler, old_cls, new_cls, body in (
+        ("DANMU_MSG", danmu_handler, OldDanMuMsg, DanMuMsg, danmu_msg()),
+        ("SEND_GIFT", gift_handler, OldSendGiftMsg, SendGiftMsg, send_gift_msg()),
+        ("SUPER_CHAT_MESSAGE", sc_handler, OldSuperChatMsg, SuperChatMsg, super_chat_msg()),
+    ):
+        assert handler(old_cls, body) == handler(new_cls, body)
+        old = bench(handler, old_cls, body)
+        new = bench(handler, new_cls, body)
+        print(f"{name:>20} {old * 1e6:>9.2f} {new * 1e6:>9.2f} {old / new:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+大数据帧对事件循环的阻塞
+
+处理 BROTLI 大数据帧 (每帧 2000 条消息) 时, 用一个 1ms 定时器统计事件循环的最大延迟,
+对比在事件循环中直接解包, 线程池解包, 进程池解包+解析
+
+    python -m benchmark.bench_offload
+"""
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from blive import BLiver, Events
+from blive.core import ProtocolVersion
+from blive.offload import FrameOffloader
+
+from .samples import mixed_messages, packed_frame
+
+
+async def measure(name, offloader, frames):
+    bliver = BLiver(510, offloader=offloader)
+    received = 0
+
+    def handler(ctx):
+        nonlocal received
+        received += 1
+
+    for cmd in (Events.DANMU_MSG, Events.SEND_GIFT, Events.INTERACT_WORD):
+        bliver.on(cmd, handler)
+
+    max_lag = 0.0
+    running = True
+
+    async def ticker():
+        nonlocal max_lag
+        loop = asyncio.get_event_loop()
+        while running:
+            t = loop.time()
+            await asyncio.sleep(0.001)
+            max_lag = max(max_lag, loop.time() - t - 0.001)
+
+    tick = asyncio.ensure_future(ticker())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    for frame in frames:
+        await bliver._dispatch_frame(frame)
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    running = False
+    await tick
+    print(f"{name:>16} {elapsed:>8.2f}s {received / elapsed:>12,.0f} {max_lag * 1e3:>12.1f}")
+    await bliver.aio_session.close()
+
+
+async def main():
+    frames = [packed_frame(mixed_messages(2000, seed=i), version=ProtocolVersion.BROTLI) for i in range(20)]
+    print(f"frame size ~{sum(map(len, frames)) // len(frames)} bytes")
+    print(f"{'mode':>16} {'time':>9} {'msgs/s':>12} {'max lag(ms)':>12}")
+    await measure("inline", None, frames)
+    await measure("thread", FrameOffloader(threshold=1024), frames)
+    with ProcessPoolExecutor(2) as pool:
+        await measure("process+parse", FrameOffloader(pool, threshold=1024, parse=True), frames)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+"""
+Parquet 导出 benchmark
+
+1. 在线: 逐帧送入同一份录制中的弹幕, 对比 ParquetSink (事件循环中只提取行, 写文件在线程中)
+   与在 handler 中同步写 Parquet 时事件循环的最长阻塞时间
+2. 离线: 录制文件转换为 Parquet 的吞吐, 对比不同的子进程数
+
+    python -m benchmark.bench_parquet [--segments 8] [--workers 1 2 4]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from blive import BLiver, Events
+from blive.parquet import ParquetSink, convert_recordings, schema_for
+from blive.record import FrameRecorder, ReplaySource
+from blive.rows import extract_row
+
+from .samples import mixed_messages, packed_frame
+
+
+def make_recording(tmp, segments, frames_per_segment=500, batch=50):
+    """生成 segments 个录制分段, 每个分段对应一个房间"""
+    for s in range(segments):
+        recorder = FrameRecorder(os.path.join(tmp, f"frames.{s:04d}.rec"))
+        for i in range(frames_per_segment):
+            frame = packed_frame(mixed_messages(batch, seed=s * 1000 + i))
+            recorder.write(510 + s, frame, ts=1653220000 + i)
+        recorder.close()
+
+
+class StallMonitor:
+    """记录事件循环的最长阻塞时间"""
+
+    def __init__(self, interval=0.001) -> None:
+        self.interval = interval
+        self.max_stall = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.max_stall = max(self.max_stall, loop.time() - start - self.interval)
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        self._task.cancel()
+
+
+async def online(recording, root, mode, max_rows=20000):
+    bliver = BLiver(510)
+    monitor = StallMonitor()
+    use_sink = mode == "ParquetSink"
+    if use_sink:
+        sink = ParquetSink(root, cmds=[Events.DANMU_MSG], max_rows=max_rows, flush_interval=1.0)
+        sink.attach(bliver)
+    else:
+        # 对照: 在 handler 中攒够 max_rows 行后同步写入, baseline 只提取行不写入
+        rows = []
+
+        def handler(ctx):
+            rows.append(extract_row(Events.DANMU_MSG, ctx.message, 510, time.time()))
+            if mode == "sync write" and len(rows) >= max_rows:
+                schema = schema_for(Events.DANMU_MSG)
+                columns = list(zip(*rows))[1:]
+                columns[0] = [int(ts * 1000) for ts in columns[0]]
+                table = pa.Table.from_arrays(
+                    [pa.array(v, type=f.type) for v, f in zip(columns, schema)], schema=schema
+                )
+                pq.write_table(table, os.path.join(root, f"sync-{time.time()}.parquet"), compression="zstd")
+                rows.clear()
+
+        bliver.on(Events.DANMU_MSG, handler)
+    monitor.start()
+    start = time.perf_counter()
+    for _, _, data in ReplaySource(recording):
+        await bliver._dispatch_frame(data)
+        await asyncio.sleep(0)  # 模拟在线时逐帧接收
+    if use_sink:
+        await sink.close()
+    elapsed = time.perf_counter() - start
+    monitor.stop()
+    await bliver.graceful_close()
+    return elapsed, monitor.max_stall
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_recording(tmp, args.segments)
+        print(f"{args.segments} segments, {args.segments * 500 * 50} messages")
+
+        print(f"{'online':>12} {'time':>9} {'max stall(ms)':>12}")
+        recording = os.path.join(tmp, "frames.*.rec")
+        for mode in ("baseline", "sync write", "ParquetSink"):
+            root = os.path.join(tmp, mode.replace(" ", "_"))
+            os.makedirs(root)
+            await online(os.path.join(tmp, "frames.0000.rec"), root, mode, max_rows=1000)  # 预热
+            elapsed, stall = await online(recording, root, mode)
+            print(f"{mode:>12} {elapsed:>8.2f}s {stall * 1000:>12.1f}")
+
+        print(f"{'workers':>12} {'time':>9} {'msg/s':>12}")
+        for workers in args.workers:
+            start = time.perf_counter()
+            out = os.path.join(tmp, f"out{workers}")
+            count = convert_recordings([os.path.join(tmp, "frames.*.rec")], out, workers)
+            elapsed = time.perf_counter() - start
+            print(f"{workers:>12} {elapsed:>8.2f}s {count / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
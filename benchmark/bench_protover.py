@@ -0,0 +1,76 @@
+"""
+zlib (protover=2) 与 brotli (protover=3) 对比: 传输字节数 vs 解压 CPU
+
+使用录制的流量时, 先把录制帧解压还原为原始粘包数据, 再分别用两种算法压缩
+
+    python -m benchmark.bench_protover [--recording frames.rec]
+"""
+import argparse
+import time
+import zlib
+
+import brotli
+
+from blive.core import BLiveMsgPackage, HeaderStruct, Operation, PackageHeader, ProtocolVersion
+
+from .samples import mixed_messages, packed_frame, recorded_frames
+
+
+def raw_batches(frames):
+    """把数据帧还原为解压后的粘包数据"""
+    batches = []
+    for frame in frames:
+        header = PackageHeader(*HeaderStruct.unpack_from(frame))
+        if header.operation != Operation.NOTIFY:
+            continue
+        body = frame[header.header_size :]
+        if header.version == ProtocolVersion.DEFLATE:
+            batches.append(zlib.decompress(body))
+        elif header.version == ProtocolVersion.BROTLI:
+            batches.append(brotli.decompress(body))
+        else:
+            batches.append(bytes(frame))
+    return batches
+
+
+def timed(fn, items, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recording")
+    args = parser.parse_args()
+
+    if args.recording:
+        frames = recorded_frames(args.recording)
+    else:
+        frames = [packed_frame(mixed_messages(n, seed=i)) for i, n in enumerate([5, 20, 50, 100] * 50)]
+    batches = raw_batches(frames)
+    raw = sum(map(len, batches))
+    packman = BLiveMsgPackage()
+    messages = sum(len(packman.unpack_raw(f)) for f in frames)
+
+    print(f"{len(batches)} frames, {messages} messages, {raw} bytes uncompressed")
+    print(f"{'algorithm':>10} {'wire bytes':>12} {'ratio':>7} {'decompress(us/frame)':>21} {'MB/s':>8}")
+    for name, compress, decompress in (
+        ("zlib", zlib.compress, zlib.decompress),
+        ("brotli", brotli.compress, brotli.decompress),
+    ):
+        compressed = [compress(b) for b in batches]
+        wire = sum(map(len, compressed)) + HeaderStruct.size * len(compressed)
+        cost = timed(decompress, compressed)
+        print(
+            f"{name:>10} {wire:>12} {wire / raw:>7.3f} {cost / len(compressed) * 1e6:>21.1f}"
+            f" {raw / cost / 1e6:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
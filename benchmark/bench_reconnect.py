@@ -0,0 +1,82 @@
+"""
+大量房间同时断线重连 benchmark
+
+在本地模拟服务器上连接 --rooms 个房间, 服务器同时断开所有连接, 统计所有房间重新连上的时间,
+重连期间的 getConf 请求数, 每秒最多的接口请求数和 websocket 连接数, CPU 时间 (模拟服务器在同一进程内, CPU 时间包含服务器)
+
+对比两种设置:
+    limited: 共用令牌桶 (--rate 次/秒) + getConf 缓存
+    eager:   不限速, 不缓存, 每次重连都请求 getConf (相当于改动前的行为)
+
+    python -m benchmark.bench_reconnect [--rooms 2000] [--rate 200]
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+from blive.hub import BLiveHub
+from blive.mockserver import MockBLiveServer
+from blive.reconnect import ConfCache, Reconnector, TokenBucket
+
+
+async def wait_for(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+def peak_rate(requests, since, api):
+    per_second = Counter(int(t - since) for t, path in requests if t >= since and (path != "/sub") == api)
+    return max(per_second.values(), default=0)
+
+
+async def run(name, rooms, rate):
+    server = await MockBLiveServer(rate=0).start()
+    if name == "limited":
+        limiter, cache = TokenBucket(rate=rate, burst=rate), ConfCache()
+        factory = lambda: Reconnector(base=0.5, cap=10, retries=20, limiter=limiter, cache=cache)
+    else:
+        limiter = TokenBucket(rate=1e9, burst=1e9)
+        factory = lambda: Reconnector(base=0.5, cap=10, retries=20, limiter=limiter, cache=ConfCache(ttl=0))
+    hub = BLiveHub(ssl=False, api_host=server.api_host, reconnector=factory)
+    for room_id in range(1, rooms + 1):
+        hub.add_room(room_id)
+    await wait_for(lambda: len(server.connections) == rooms, 600)
+    await asyncio.sleep(1)
+
+    server.requests.clear()
+    cpu = time.process_time()
+    start = time.monotonic()
+    for ws in list(server.connections):
+        await ws.close()
+    ok = await wait_for(lambda: len(server.connections) == rooms, 600)
+    elapsed = time.monotonic() - start
+    cpu = time.process_time() - cpu
+    conf_calls = sum(1 for _, path in server.requests if path.endswith("getConf"))
+    api_peak = peak_rate(server.requests, start, api=True)
+    ws_peak = peak_rate(server.requests, start, api=False)
+    print(
+        f"{name:>8} {elapsed:>9.2f}s {conf_calls:>8} {api_peak:>8} {ws_peak:>8} {cpu:>8.2f}s"
+        + ("" if ok else "  (timed out)")
+    )
+    await hub.close()
+    await server.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=200, help="limited 模式下每秒的连接/接口请求数")
+    args = parser.parse_args()
+    print(f"{args.rooms} rooms dropped at once")
+    print(f"{'mode':>8} {'reconnect':>10} {'getConf':>8} {'api/s':>8} {'ws/s':>8} {'cpu':>9}")
+    for name in ("limited", "eager"):
+        await run(name, args.rooms, args.rate)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
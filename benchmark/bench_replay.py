@@ -0,0 +1,57 @@
+"""
+录制回放吞吐 benchmark
+
+不指定 --recording 时先生成一份合成的录制文件, 然后尽可能快地回放到 BLiver
+
+    python -m benchmark.bench_replay [--recording frames.rec]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from blive import BLiver, Events
+from blive.record import FrameRecorder, ReplaySource
+
+from .samples import mixed_messages, packed_frame
+
+
+def make_recording(path, frames=2000, batch=50):
+    recorder = FrameRecorder(path)
+    for i in range(frames):
+        recorder.write(510, packed_frame(mixed_messages(batch, seed=i)), ts=i * 0.01)
+    recorder.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--recording")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.recording
+        if path is None:
+            path = os.path.join(tmp, "frames.rec")
+            make_recording(path)
+
+        bliver = BLiver(510)
+        received = 0
+
+        def handler(ctx):
+            nonlocal received
+            received += 1
+
+        bliver.on(Events.DANMU_MSG, handler)
+        bliver.on(Events.SEND_GIFT, handler)
+
+        source = ReplaySource(path)
+        start = time.perf_counter()
+        frames = await source.replay(bliver)
+        elapsed = time.perf_counter() - start
+        print(f"{frames} frames in {elapsed:.2f}s: {frames / elapsed:,.0f} frames/s, {received / elapsed:,.0f} handled msgs/s")
+        await bliver.aio_session.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+弹幕规则匹配 benchmark
+
+10000 条规则 (默认 9500 条关键词 + 500 条正则), 对比逐条检查规则与 RuleEngine 的单条弹幕耗时,
+并按 5000 条/秒的速率送入弹幕, 统计处理耗时占用的 CPU 比例, 以及热更新规则时事件循环的最长阻塞时间
+
+    python -m benchmark.bench_rules [--keywords 9500] [--regexes 500] [--rate 5000]
+"""
+import argparse
+import asyncio
+import random
+import re
+import time
+
+from blive import BLiver, Events
+from blive.rules import Rule, RuleEngine, RuleSet
+
+from .samples import bench, danmu_msg, packed_frame
+
+CHARS = [chr(c) for c in range(0x4E00, 0x4E00 + 2500)]  # 常用汉字范围内的 2500 个字
+
+
+def make_rules(keywords, regexes, seed=0):
+    random.seed(seed)
+    rules = []
+    for i in range(keywords):
+        rules.append(Rule(f"kw{i}", "".join(random.choices(CHARS, k=random.randint(2, 4)))))
+    for i in range(regexes):
+        a, b = random.choices(CHARS, k=2)
+        rules.append(Rule(f"re{i}", f"{a}\\s*{b}\\d{{{random.randint(2, 5)},}}", regex=True))
+    return rules
+
+
+def make_texts(n, seed=1):
+    random.seed(seed)
+    return ["".join(random.choices(CHARS, k=random.randint(4, 30))) for _ in range(n)]
+
+
+def naive_match(rules, compiled, text):
+    folded = text.casefold()
+    return [
+        rule.id
+        for rule in rules
+        if (compiled[rule.id].search(text) if rule.regex else rule.pattern in folded)
+    ]
+
+
+async def sustained(rules, texts, rate, seconds):
+    bliver = BLiver(510)
+    engine = RuleEngine(rules)
+    engine.attach(bliver)
+    matched = []
+    bliver.on(Events.RULE_MATCHED, matched.append)
+    batch = 50
+    frames = [
+        packed_frame([danmu_msg(uid=i, content=texts[(i * batch + j) % len(texts)]) for j in range(batch)])
+        for i in range(int(rate * seconds / batch))
+    ]
+    loop = asyncio.get_event_loop()
+    busy = 0.0
+    max_stall = 0.0
+    start = loop.time()
+    reloaded = False
+    for i, frame in enumerate(frames):
+        at = start + i * batch / rate
+        delay = at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            max_stall = max(max_stall, -delay)
+        t = time.perf_counter()
+        await bliver._dispatch_frame(frame)
+        busy += time.perf_counter() - t
+        if not reloaded and i >= len(frames) // 2:
+            # 运行中热更新一次规则
+            reloaded = True
+            reload_task = asyncio.ensure_future(engine.reload(make_rules(len(rules) - 500, 500, seed=2)))
+    await reload_task
+    elapsed = loop.time() - start
+    await bliver.graceful_close()
+    return len(frames) * batch / elapsed, busy / elapsed, max_stall, engine.matched
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keywords", type=int, default=9500)
+    parser.add_argument("--regexes", type=int, default=500)
+    parser.add_argument("--rate", type=int, default=5000)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    rules = make_rules(args.keywords, args.regexes)
+    texts = make_texts(2000)
+
+    start = time.perf_counter()
+    ruleset = RuleSet(rules)
+    print(f"{len(rules)} rules compiled in {time.perf_counter() - start:.2f}s")
+
+    compiled = {r.id: re.compile(r.pattern, re.IGNORECASE) for r in rules if r.regex}
+    for text in texts[:200]:
+        assert ruleset.match(text) == naive_match(rules, compiled, text), text
+
+    sample = texts[:200]
+    naive = bench(lambda: [naive_match(rules, compiled, t) for t in sample], repeat=3) / len(sample)
+    engine = bench(lambda: [ruleset.match(t) for t in sample], repeat=3) / len(sample)
+    print(f"per message: naive {naive * 1e6:.0f} us, engine {engine * 1e6:.1f} us ({naive / engine:.0f}x)")
+    print(f"naive capacity: {1 / naive:.0f} msg/s, engine capacity: {1 / engine:.0f} msg/s")
+
+    rate, cpu, stall, matched = await sustained(rules, texts, args.rate, args.seconds)
+    print(
+        f"sustained {rate:.0f} msg/s (target {args.rate}), loop busy {cpu * 100:.0f}%,"
+        f" max lag {stall * 1000:.0f} ms (one hot reload), {matched} matched"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
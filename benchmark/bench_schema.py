@@ -0,0 +1,77 @@
+"""
+dict 解码与 schema (msgspec Struct) 解码对比
+
+1. 解码 + 消息操作类访问常用字段的耗时
+2. 在内存中保留 10000 条解码后的消息 (例如在分发队列中排队) 占用的内存
+
+    python -m benchmark.bench_schema
+"""
+import json
+import tracemalloc
+
+from blive.codec import get_codec
+from blive.msg import DanMuMsg, InteractWordMsg, SendGiftMsg, SuperChatMsg
+from blive.schema import TypedDecoder
+
+from .samples import bench, danmu_msg, interact_word_msg, send_gift_msg, super_chat_msg
+
+HOLD = 10000
+
+
+def danmu_handler(body):
+    danmu = DanMuMsg(body)
+    return f"{danmu.sender.name} ({danmu.sender.medal.medal_name}:{danmu.sender.medal.medal_level}): {danmu.content}"
+
+
+def gift_handler(body):
+    msg = SendGiftMsg(body)
+    return f"{msg.sender.name} ({msg.sender.medal.medal_name}:{msg.sender.medal.medal_level}) {msg.gift['gift_name']}"
+
+
+def sc_handler(body):
+    msg = SuperChatMsg(body)
+    return f"{msg.sender.name} ({msg.sender.medal.medal_name}:{msg.sender.medal.medal_level}) {msg.price} {msg.content}"
+
+
+def interact_handler(body):
+    msg = InteractWordMsg(body)
+    return f"{msg.user.name} ({msg.user.medal.medal_name}:{msg.user.medal.medal_level}) {msg.timestamp}"
+
+
+def held_memory(decode, payload):
+    tracemalloc.start()
+    held = [decode(payload) for _ in range(HOLD)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return size
+
+
+def main():
+    typed = TypedDecoder()
+    codecs = [get_codec("json"), get_codec()]
+    print(f"dict codec: {codecs[1].name}, {HOLD} messages held in memory")
+    print(
+        f"{'message':>20} {'json(us)':>9} {codecs[1].name + '(us)':>12} {'typed(us)':>10}"
+        f" {'json(KB)':>9} {codecs[1].name + '(KB)':>12} {'typed(KB)':>10}"
+    )
+    for name, handler, body in (
+        ("DANMU_MSG", danmu_handler, danmu_msg()),
+        ("SEND_GIFT", gift_handler, send_gift_msg()),
+        ("SUPER_CHAT_MESSAGE", sc_handler, super_chat_msg()),
+        ("INTERACT_WORD", interact_handler, interact_word_msg()),
+    ):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        decoders = [c.loads for c in codecs] + [lambda p, cmd=name: typed.decode(cmd, p)]
+        results = {handler(d(payload)) for d in decoders}
+        assert len(results) == 1, results
+        times = [bench(lambda d=d: handler(d(payload))) for d in decoders]
+        sizes = [held_memory(d, payload) for d in decoders]
+        print(
+            f"{name:>20} {times[0] * 1e6:>9.2f} {times[1] * 1e6:>12.2f} {times[2] * 1e6:>10.2f}"
+            f" {sizes[0] / 1024:>9.0f} {sizes[1] / 1024:>12.0f} {sizes[2] / 1024:>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+多进程分片 benchmark
+
+1. 房间迁移: --rooms 个房间从 n 个工作进程扩容到 n + 1 个时需要迁移的房间比例, 一致性哈希对比取模
+2. 吞吐: 在子进程中运行模拟服务器 (每个连接 --rate 条/秒), 分别用 1 个和 --workers 个工作进程接收,
+   工作进程中的 handler 读取每条弹幕的内容, 弹幕转发到主进程计数, 统计每秒处理的弹幕数
+
+    python -m benchmark.bench_shard [--rooms 10000] [--live-rooms 40] [--rate 2000] [--workers 4] [--seconds 10]
+
+注意: 吞吐随核数增长的前提是机器有足够的 CPU, 模拟服务器本身也会占用 CPU
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from blive import Events
+from blive.shard import HashRing, ShardSupervisor
+
+PORT = 18931
+
+
+def setup(hub):
+    def touch(ctx):
+        ctx.message.content
+
+    hub.on(Events.DANMU_MSG, touch)
+    hub.on(Events.SUPER_CHAT_MESSAGE, touch)
+
+
+def movement(rooms, n):
+    before, after = HashRing(range(n)), HashRing(range(n + 1))
+    ring = sum(1 for r in range(rooms) if before.node_for(r) != after.node_for(r))
+    modulo = sum(1 for r in range(rooms) if r % n != r % (n + 1))
+    return ring / rooms, modulo / rooms
+
+
+async def throughput(workers, rooms, seconds):
+    sup = ShardSupervisor(
+        workers=workers,
+        setup=setup,
+        forward=[Events.DANMU_MSG],
+        hub_kwargs={"ssl": False, "api_host": f"http://127.0.0.1:{PORT}"},
+    )
+    count = [0]
+    sup.on(Events.DANMU_MSG, lambda event: count.__setitem__(0, count[0] + 1))
+    await sup.start(range(1, rooms + 1))
+    await asyncio.sleep(3)  # 等待所有房间连上
+    start_count, start = count[0], time.monotonic()
+    await asyncio.sleep(seconds)
+    rate = (count[0] - start_count) / (time.monotonic() - start)
+    await sup.close()
+    return rate
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=10000)
+    parser.add_argument("--live-rooms", type=int, default=40)
+    parser.add_argument("--rate", type=int, default=2000, help="模拟服务器每个连接每秒推送的消息数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"rooms moved when scaling n -> n+1 ({args.rooms} rooms)")
+    print(f"{'n':>4} {'ring':>8} {'modulo':>8} {'ideal':>8}")
+    for n in (2, 4, 8, 16):
+        ring, modulo = movement(args.rooms, n)
+        print(f"{n:>4} {ring:>8.1%} {modulo:>8.1%} {1 / (n + 1):>8.1%}")
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "blive.mockserver", "--port", str(PORT), "--rate", str(args.rate), "--batch", "20"],
+        stdout=subprocess.PIPE,
+    )
+    server.stdout.readline()
+    try:
+        print(f"\n{args.live_rooms} rooms x {args.rate} msg/s, {os.cpu_count()} CPUs")
+        print(f"{'workers':>8} {'danmu/s':>10}")
+        for workers in sorted({1, args.workers}):
+            rate = await throughput(workers, args.live_rooms, args.seconds)
+            print(f"{workers:>8} {rate:>10.0f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,177 @@
+"""
+共享内存扇出 benchmark
+
+--consumers 个消费者进程监听同样的 --rooms 个房间, handler 读取每条弹幕的内容:
+    direct: 每个消费者各自用 BLiveHub 连接服务器, 各自解压, 拆包
+    ring:   一个接收进程用 RingPublisher 写入共享内存, 消费者使用 RingSubscriber
+统计服务器连接数, 每个消费者收到的弹幕数, 以及所有进程 (不含模拟服务器) 的 CPU 时间
+
+之后用一个很小的缓冲区和一个每条弹幕 sleep 的消费者演示慢读者的发现和丢失,
+最后比较消费者反序列化每条消息的耗时: 共享内存中保存原始 json, 或保存解析后的对象 (pickle)
+
+    python -m benchmark.bench_shmring [--rooms 20] [--rate 200] [--consumers 3] [--seconds 10]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import pickle
+import subprocess
+import sys
+import time
+
+from blive import Events
+from blive.hub import BLiveHub
+from blive.codec import get_codec
+from blive.shmring import RingPublisher, RingSubscriber
+
+from .samples import bench, mixed_messages
+
+PORT = 18941
+API_HOST = f"http://127.0.0.1:{PORT}"
+WARMUP = 3
+
+
+async def _measure(hub, count, seconds, stop=None):
+    """等待 WARMUP 秒后统计 seconds 秒内的消息数和 CPU 时间"""
+    await asyncio.sleep(WARMUP)
+    start_count, start_cpu = count[0], time.process_time()
+    await asyncio.sleep(seconds)
+    result = (count[0] - start_count, time.process_time() - start_cpu)
+    if stop is not None:
+        while not stop.is_set():
+            await asyncio.sleep(0.1)
+    return result
+
+
+def consumer(mode, rooms, seconds, results, name=None, delay=0.0):
+    async def main():
+        if mode == "direct":
+            hub = BLiveHub(ssl=False, api_host=API_HOST)
+        else:
+            hub = RingSubscriber(name)
+        count = [0]
+
+        def handler(ctx):
+            ctx.message.content
+            count[0] += 1
+            if delay:
+                time.sleep(delay)
+
+        hub.on(Events.DANMU_MSG, handler)
+        if mode == "direct":
+            await hub.add_rooms(rooms)
+        else:
+            asyncio.ensure_future(hub.listen())
+        messages, cpu = await _measure(hub, count, seconds)
+        lost = hub.reader.lost if mode == "ring" else 0
+        await hub.close()
+        results.put((messages, cpu, lost, delay))
+
+    asyncio.run(main())
+
+
+def ingest(name, size, rooms, seconds, ready, stop, results, watch=False):
+    async def main():
+        publisher = RingPublisher(name, size=size)
+        hub = BLiveHub(ssl=False, api_host=API_HOST, publisher=publisher)
+        ready.set()
+        await hub.add_rooms(rooms)
+        if watch:
+            for _ in range(int(WARMUP + seconds)):
+                await asyncio.sleep(1)
+                lags = ", ".join(f"{lag / size:.0%}" for _, lag in publisher.readers())
+                print(f"  reader lag: [{lags}]  slow readers: {len(publisher.slow_readers())}")
+        _, cpu = await _measure(hub, [0], 0 if watch else seconds, stop)
+        await hub.close()
+        publisher.close()
+        results.put((0, cpu, 0, 0.0))
+
+    asyncio.run(main())
+
+
+def run(mode, args, size=64 * 1024 * 1024, delays=None, watch=False):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    rooms = list(range(1, args.rooms + 1))
+    delays = delays or [0.0] * args.consumers
+    name = f"blive-bench-{mode}"
+    procs = []
+    if mode == "ring":
+        ready, stop = ctx.Event(), ctx.Event()
+        ingest_proc = ctx.Process(target=ingest, args=(name, size, rooms, args.seconds, ready, stop, results, watch))
+        ingest_proc.start()
+        ready.wait()
+    for delay in delays:
+        p = ctx.Process(target=consumer, args=(mode, rooms, args.seconds, results, name, delay))
+        p.start()
+        procs.append(p)
+    consumer_results = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    if mode == "ring":
+        stop.set()
+        ingest_cpu = results.get()[1]
+        ingest_proc.join()
+    else:
+        ingest_cpu = 0.0
+    return consumer_results, ingest_cpu
+
+
+def decode_costs(n=1000):
+    """[(格式, 每条消息的字节数, 每条消息的反序列化耗时 us)]"""
+    messages = mixed_messages(n)
+    raw = [json.dumps(m, ensure_ascii=False, separators=(",", ":")).encode() for m in messages]
+    pickled = [pickle.dumps(m, protocol=pickle.HIGHEST_PROTOCOL) for m in messages]
+    formats = [("json (stdlib)", raw, json.loads)]
+    try:
+        formats.append(("json (orjson)", raw, get_codec("orjson").loads))
+    except ImportError:
+        pass
+    formats.append(("pickle (decoded)", pickled, pickle.loads))
+    results = []
+    for name, payloads, loads in formats:
+        seconds = bench(lambda: [loads(p) for p in payloads])
+        results.append((name, sum(map(len, payloads)) / n, seconds / n * 1e6))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=20)
+    parser.add_argument("--rate", type=int, default=200, help="模拟服务器每个连接每秒推送的消息数")
+    parser.add_argument("--consumers", type=int, default=3)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "blive.mockserver", "--port", str(PORT), "--rate", str(args.rate), "--batch", "20"],
+        stdout=subprocess.PIPE,
+    )
+    server.stdout.readline()
+    try:
+        print(f"{args.rooms} rooms x {args.rate} msg/s, {args.consumers} consumers, {args.seconds:.0f}s")
+        print(f"{'mode':>8} {'conns':>6} {'danmu/consumer':>15} {'cpu s':>7} {'cpu us/danmu':>13}")
+        for mode in ("direct", "ring"):
+            consumer_results, ingest_cpu = run(mode, args)
+            conns = args.rooms * (args.consumers if mode == "direct" else 1)
+            messages = [r[0] for r in consumer_results]
+            cpu = sum(r[1] for r in consumer_results) + ingest_cpu
+            per_message = cpu / max(1, sum(messages)) * 1e6
+            print(f"{mode:>8} {conns:>6} {min(messages):>15} {cpu:>7.2f} {per_message:>13.1f}")
+
+        print("\nslow reader: 1MB ring, the second consumer sleeps 2ms per danmu")
+        consumer_results, _ = run("ring", args, size=1024 * 1024, delays=[0.0, 0.002], watch=True)
+        for messages, _, lost, delay in sorted(consumer_results, key=lambda r: r[3]):
+            print(f"  consumer (sleep {delay * 1000:.0f}ms): {messages} danmu, skipped {lost} times")
+
+        print("\nconsumer decode cost per message")
+        for name, size, us in decode_costs():
+            print(f"  {name:>16}: {size:6.0f} bytes, {us:5.2f} us")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
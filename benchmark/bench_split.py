@@ -0,0 +1,38 @@
+"""
+粘包拆分 micro-benchmark
+
+对比旧的反复切片拆包与基于 memoryview 偏移量的 split_packages
+
+    python -m benchmark.bench_split
+"""
+from blive.core import HeaderStruct, PackageHeader, split_packages
+
+from .samples import bench, mixed_messages, packed_frame, ProtocolVersion
+
+
+def split_by_slicing(data):
+    # 旧实现: 每拆一个包都会复制剩余数据, O(N^2)
+    packages = []
+    while data:
+        header = PackageHeader(*HeaderStruct.unpack(data[:16]))
+        packages.append((header, data[16 : header.package_size]))
+        data = data[header.package_size :]
+    return packages
+
+
+def split_by_offset(data):
+    return list(split_packages(data))
+
+
+def main():
+    print(f"{'packets':>8} {'bytes':>10} {'slicing(us)':>12} {'offset(us)':>12} {'speedup':>8}")
+    for n in (1, 10, 100, 1000):
+        data = packed_frame(mixed_messages(n), version=ProtocolVersion.NORMAL)
+        assert len(split_by_slicing(data)) == len(split_by_offset(data)) == n
+        old = bench(split_by_slicing, data)
+        new = bench(split_by_offset, data)
+        print(f"{n:>8} {len(data):>10} {old * 1e6:>12.1f} {new * 1e6:>12.1f} {old / new:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
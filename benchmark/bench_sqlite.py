@@ -0,0 +1,99 @@
+"""
+SQLite 持续写入 benchmark
+
+按固定速率 (默认 10000 条/秒, 常见 cmd 混合分布) 送入消息, 对比每条消息一个事务的写法与 SQLiteSink,
+统计实际达到的速率, 结束时落后于计划的时间, 以及写入的行数
+
+    python -m benchmark.bench_sqlite [--rate 10000] [--seconds 5] [--dir .]
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+from blive import BLiver
+from blive.rows import COLUMNS, columns_for, extract_row
+from blive.sqlite import SQLiteSink, table_for
+
+from .samples import mixed_messages, packed_frame
+
+BATCH = 100  # 每帧消息数
+
+
+def naive_handler(db):
+    def listener_for(cmd):
+        sql = f"INSERT INTO {table_for(cmd)} VALUES ({', '.join('?' * len(columns_for(cmd)))})"
+
+        def listener(ctx):
+            db.execute(sql, extract_row(cmd, ctx.message, 510, time.time()))
+            db.commit()
+
+        return listener
+
+    return listener_for
+
+
+async def feed(bliver, frames, rate):
+    """按 rate 条/秒送入数据帧, 返回结束时落后于计划的秒数"""
+    loop = asyncio.get_event_loop()
+    interval = BATCH / rate
+    start = loop.time()
+    for i, frame in enumerate(frames):
+        delay = start + i * interval - loop.time()
+        await asyncio.sleep(max(0, delay))
+        await bliver._dispatch_frame(frame)
+    return loop.time() - (start + len(frames) * interval)
+
+
+def count_rows(path):
+    db = sqlite3.connect(path)
+    total = sum(db.execute(f"SELECT count(*) FROM {table_for(cmd)}").fetchone()[0] for cmd in COLUMNS)
+    db.close()
+    return total
+
+
+async def run(name, path, frames, rate):
+    bliver = BLiver(510)
+    sink = None
+    if name == "naive":
+        SQLiteSink(path, flush_interval=0.01)  # 只用来建表
+        db = sqlite3.connect(path)
+        listener_for = naive_handler(db)
+        for cmd in COLUMNS:
+            bliver.on(cmd, listener_for(cmd))
+    else:
+        sink = SQLiteSink(path)
+        sink.attach(bliver)
+    start = time.perf_counter()
+    lag = await feed(bliver, frames, rate)
+    if sink is not None:
+        await sink.close()
+    else:
+        db.close()
+    elapsed = time.perf_counter() - start
+    await bliver.graceful_close()
+    rows = count_rows(path)
+    sent = len(frames) * BATCH
+    blocked = sink.blocked if sink is not None else "-"
+    print(f"{name:>8} {sent / elapsed:>10.0f} {lag:>8.2f}s {rows:>9} {blocked:>8}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=int, default=10000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--dir", default=None, help="数据库文件所在目录, 默认为临时目录 (可能在内存文件系统中)")
+    args = parser.parse_args()
+    n = int(args.rate * args.seconds / BATCH)
+    frames = [packed_frame(mixed_messages(BATCH, seed=i)) for i in range(n)]
+    print(f"{n * BATCH} messages at {args.rate} msg/s")
+    print(f"{'writer':>8} {'msg/s':>10} {'lag':>9} {'rows':>9} {'blocked':>8}")
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        await run("sink", os.path.join(tmp, "sink.db"), frames, args.rate)
+        await run("naive", os.path.join(tmp, "naive.db"), frames, args.rate)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+大量直播间冷启动 benchmark
+
+模拟服务器的接口有 --api-delay 秒延迟, 统计 --rooms 个房间从启动到全部连上的时间和接口请求数:
+    sequential: 逐个房间获取房间信息和 getConf (改动前单个 BLiver 依次启动的做法)
+    no-cache:   BLiveHub 并发启动, 不使用 RoomResolver
+    cold:       RoomResolver 缓存文件为空
+    warm:       使用 cold 写入的缓存文件重启, 房间信息和 getConf 都从缓存读取
+    limit-first: 同 no-cache, 但第一次连接也按默认令牌桶 (每秒 50 次, 最多积攒 100 次) 排队
+除 sequential 外都使用默认参数的令牌桶, 默认只限制重连, 不限制第一次连接
+
+    python -m benchmark.bench_startup [--rooms 1000] [--api-delay 0.05]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import aiohttp
+
+from blive.core import get_blive_room_info, get_blive_ws_url
+from blive.hub import BLiveHub
+from blive.mockserver import MockBLiveServer
+from blive.reconnect import ConfCache, Reconnector, TokenBucket
+from blive.resolver import RoomResolver
+
+
+async def wait_for(predicate, timeout=600):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+async def sequential(server, rooms):
+    start = time.monotonic()
+    async with aiohttp.ClientSession() as session:
+        for room_id in rooms:
+            real_room_id, _ = await get_blive_room_info(room_id, session, api_host=server.api_host)
+            await get_blive_ws_url(real_room_id, session, ssl=False, api_host=server.api_host)
+    return time.monotonic() - start
+
+
+async def hub_startup(server, rooms, path, limit_first):
+    # 与 default_limiter 参数相同, 每次单独创建, 避免前一次运行消耗的令牌影响结果
+    limiter = TokenBucket()
+    conf_cache = ConfCache()
+    resolver = RoomResolver(path, conf_cache=conf_cache) if path else None
+    hub = BLiveHub(
+        ssl=False,
+        api_host=server.api_host,
+        resolver=resolver,
+        reconnector=lambda: Reconnector(limiter=limiter, cache=conf_cache, limit_first=limit_first),
+    )
+    start = time.monotonic()
+    await hub.add_rooms(rooms)
+    await wait_for(lambda: len(server.connections) == len(rooms))
+    elapsed = time.monotonic() - start
+    await hub.close()
+    return elapsed
+
+
+async def run(name, server, rooms, path=None, limit_first=False):
+    server.requests.clear()
+    elapsed = await hub_startup(server, rooms, path, limit_first)
+    calls = sum(1 for _, p in server.requests if p != "/sub")
+    print(f"{name:>11} {elapsed:>9.2f}s {calls:>9}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rooms", type=int, default=1000)
+    parser.add_argument("--api-delay", type=float, default=0.05)
+    parser.add_argument("--sequential-rooms", type=int, default=100, help="sequential 只测试前 N 个房间, 结果按比例换算")
+    args = parser.parse_args()
+    rooms = list(range(1, args.rooms + 1))
+    print(f"{args.rooms} rooms, api delay {args.api_delay * 1000:.0f}ms")
+    print(f"{'mode':>11} {'startup':>10} {'api calls':>9}")
+    # 所有模式使用同一个服务器, 缓存的服务器地址在重启后仍然可用
+    server = await MockBLiveServer(api_delay=args.api_delay).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rooms.json")
+        elapsed = await sequential(server, rooms[: args.sequential_rooms])
+        estimate = elapsed * args.rooms / args.sequential_rooms
+        print(f"{'sequential':>11} {estimate:>9.2f}s {args.rooms * 2:>9}  (estimated from {args.sequential_rooms} rooms)")
+        await run("no-cache", server, rooms)
+        await run("cold", server, rooms, path)
+        await run("warm", server, rooms, path)
+        await run("limit-first", server, rooms, limit_first=True)
+    await server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
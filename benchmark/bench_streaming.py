@@ -0,0 +1,57 @@
+"""
+一次性解压 vs 流式解压拆包
+
+对比 unpack_raw (一次性解压整个数据帧) 与 iter_unpack_raw (StreamingDecoder 分块解压) 的
+耗时, 单帧内存峰值, 以及拿到第一个包所需的时间
+
+    python -m benchmark.bench_streaming
+"""
+import time
+import tracemalloc
+
+from blive.core import BLiveMsgPackage, ProtocolVersion
+
+from .samples import bench, mixed_messages, packed_frame
+
+
+def peak_memory(fn, frame):
+    tracemalloc.start()
+    fn(frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def first_package(fn, frame):
+    start = time.perf_counter()
+    next(iter(fn(frame)))
+    return time.perf_counter() - start
+
+
+def main():
+    packman = BLiveMsgPackage()
+
+    def oneshot(frame):
+        for _ in packman.unpack_raw(frame):
+            pass
+
+    def streaming(frame):
+        for _ in packman.iter_unpack_raw(frame):
+            pass
+
+    print(f"{'version':>8} {'packets':>8} {'oneshot(us)':>12} {'stream(us)':>11} {'oneshot peak':>13} {'stream peak':>12} {'1st oneshot':>12} {'1st stream':>11}")
+    for version in (ProtocolVersion.DEFLATE, ProtocolVersion.BROTLI):
+        for n in (10, 100, 1000):
+            frame = packed_frame(mixed_messages(n), version=version)
+            t1, t2 = bench(oneshot, frame), bench(streaming, frame)
+            m1, m2 = peak_memory(oneshot, frame), peak_memory(streaming, frame)
+            f1 = min(first_package(packman.unpack_raw, frame) for _ in range(5))
+            f2 = min(first_package(packman.iter_unpack_raw, frame) for _ in range(5))
+            print(
+                f"{version.name:>8} {n:>8} {t1 * 1e6:>12.1f} {t2 * 1e6:>11.1f} {m1 / 1024:>11.1f}KB {m2 / 1024:>10.1f}KB"
+                f" {f1 * 1e6:>10.1f}us {f2 * 1e6:>9.1f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+benchmark 公用的样例消息与合成数据帧
+
+消息内容按线上抓包的结构裁剪, 只用于性能测试
+"""
+import json
+import random
+import time
+import zlib
+
+import brotli
+
+from blive.core import HeaderStruct, Operation, ProtocolVersion
+
+
+def danmu_msg(uid=1, content="好耶", ts=None):
+    ts = ts or int(time.time() * 1000)
+    return {
+        "cmd": "DANMU_MSG",
+        "info": [
+            [0, 1, 25, 16777215, ts, 1653200000, 0, "d3f1a2b7", 0, 0, 0, "", 0, "{}", "{}",
+             {"mode": 0, "show_player_type": 0, "extra": "{\"send_from_me\":false}"}],
+            content,
+            [uid, f"用户{uid}", 0, 0, 0, 10000, 1, ""],
+            [21, "小孩梓", "阿梓从小就很可爱", 510, 1725515, "", 0, 6809855, 1725515, 5414290, 0, 1, 7706705],
+            [12, 0, 6406234, ">50000", 0],
+            ["", ""],
+            0,
+            0,
+            None,
+            {"ts": ts // 1000, "ct": "6A1F82C3"},
+            0,
+            0,
+            None,
+            None,
+            0,
+            105,
+        ],
+    }
+
+
+def interact_word_msg(uid=2):
+    return {
+        "cmd": "INTERACT_WORD",
+        "data": {
+            "contribution": {"grade": 0},
+            "dmscore": 12,
+            "fans_medal": {
+                "anchor_roomid": 510,
+                "guard_level": 0,
+                "icon_id": 0,
+                "is_lighted": 1,
+                "medal_color": 6067854,
+                "medal_level": 12,
+                "medal_name": "小孩梓",
+                "score": 24430,
+                "special": "",
+                "target_id": 7706705,
+            },
+            "identities": [3, 1],
+            "is_spread": 0,
+            "msg_type": 1,
+            "roomid": 80397,
+            "score": 1653212300000,
+            "spread_desc": "",
+            "spread_info": "",
+            "tail_icon": 0,
+            "timestamp": int(time.time()),
+            "trigger_time": 1653212285000000000,
+            "uid": uid,
+            "uname": f"用户{uid}",
+            "uname_color": "",
+        },
+    }
+
+
+def online_rank_count_msg():
+    return {"cmd": "ONLINE_RANK_COUNT", "data": {"count": random.randint(100, 9999)}}
+
+
+def widget_banner_msg():
+    return {
+        "cmd": "WIDGET_BANNER",
+        "data": {
+            "timestamp": int(time.time()),
+            "widget_list": {
+                "290": {
+                    "id": 290,
+                    "title": "打call",
+                    "cover": "",
+                    "web_cover": "",
+                    "tip_text": "",
+                    "tip_text_color": "",
+                    "tip_bottom_color": "",
+                    "jump_url": "https://live.bilibili.com/activity/live-activity-battle/index.html",
+                    "url": "",
+                    "stay_time": 5,
+                    "site": 1,
+                    "platform_in": ["live", "blink"],
+                    "type": 1,
+                    "band_id": 0,
+                    "sub_key": "",
+                    "sub_data": "%7B%22config%22%3A%7B%22source%22%3A%22live%22%7D%7D",
+                    "is_add": True,
+                }
+            },
+        },
+    }
+
+
+def send_gift_msg(uid=3, combo_id="batch:gift:combo_id:3:7706705:30607:1653212300.1", num=1):
+    return {
+        "cmd": "SEND_GIFT",
+        "data": {
+            "action": "投喂",
+            "batch_combo_id": combo_id,
+            "batch_combo_send": None,
+            "coin_type": "gold",
+            "combo_resources_id": 1,
+            "combo_send": None,
+            "combo_stay_time": 3,
+            "combo_total_coin": 100 * num,
+            "giftId": 30607,
+            "giftName": "小心心",
+            "giftType": 0,
+            "num": num,
+            "price": 100,
+            "medal_info": {
+                "anchor_roomid": 0,
+                "anchor_uname": "",
+                "guard_level": 0,
+                "medal_level": 21,
+                "medal_name": "小孩梓",
+                "target_id": 7706705,
+            },
+            "tid": str(random.randint(10 ** 18, 10 ** 19)),
+            "timestamp": int(time.time()),
+            "total_coin": 100 * num,
+            "uid": uid,
+            "uname": f"用户{uid}",
+        },
+    }
+
+
+def combo_send_msg(uid=3, combo_id="batch:gift:combo_id:3:7706705:30607:1653212300.1", total_num=1):
+    return {
+        "cmd": "COMBO_SEND",
+        "data": {
+            "action": "投喂",
+            "batch_combo_id": combo_id,
+            "batch_combo_num": total_num,
+            "combo_id": combo_id.replace("batch:", ""),
+            "combo_num": total_num,
+            "combo_total_coin": 100 * total_num,
+            "gift_id": 30607,
+            "gift_name": "小心心",
+            "gift_num": 1,
+            "medal_info": {"medal_level": 21, "medal_name": "小孩梓", "target_id": 7706705},
+            "r_uname": "阿梓从小就很可爱",
+            "ruid": 7706705,
+            "total_num": total_num,
+            "uid": uid,
+            "uname": f"用户{uid}",
+        },
+    }
+
+
+def super_chat_msg(uid=4, price=30):
+    return {
+        "cmd": "SUPER_CHAT_MESSAGE",
+        "data": {
+            "background_bottom_color": "#2A60B2",
+            "id": random.randint(1, 10 ** 8),
+            "medal_info": {
+                "anchor_roomid": 510,
+                "anchor_uname": "阿梓从小就很可爱",
+                "medal_level": 21,
+                "medal_name": "小孩梓",
+            },
+            "message": "主播晚上好",
+            "price": price,
+            "start_time": int(time.time()),
+            "time": 60,
+            "uid": uid,
+            "user_info": {"face": "http://i0.hdslb.com/bfs/face/member/noface.jpg", "uname": f"用户{uid}"},
+        },
+    }
+
+
+# 按线上热门直播间的大致 cmd 占比
+MIXED_DISTRIBUTION = [
+    (interact_word_msg, 45),
+    (online_rank_count_msg, 15),
+    (widget_banner_msg, 10),
+    (danmu_msg, 22),
+    (send_gift_msg, 7),
+    (super_chat_msg, 1),
+]
+
+
+def mixed_messages(n, seed=0):
+    random.seed(seed)
+    factories = [f for f, _ in MIXED_DISTRIBUTION]
+    weights = [w for _, w in MIXED_DISTRIBUTION]
+    return [f() for f in random.choices(factories, weights=weights, k=n)]
+
+
+def pack_package(body: bytes, operation=Operation.NOTIFY, version=ProtocolVersion.NORMAL):
+    return (
+        HeaderStruct.pack(HeaderStruct.size + len(body), HeaderStruct.size, version, operation, 0)
+        + body
+    )
+
+
+def packed_frame(messages, version=ProtocolVersion.DEFLATE):
+    """把多条消息打包为一个 NOTIFY 粘包数据帧"""
+    inner = b"".join(
+        pack_package(json.dumps(m, ensure_ascii=False).encode("utf-8")) for m in messages
+    )
+    if version == ProtocolVersion.DEFLATE:
+        inner = zlib.compress(inner)
+    elif version == ProtocolVersion.BROTLI:
+        inner = brotli.compress(inner)
+    else:
+        return inner
+    return pack_package(inner, version=version)
+
+
+def bench(fn, *args, repeat=5, number=None, min_time=0.2):
+    """简单计时, 返回单次调用最优耗时(秒)"""
+    if number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn(*args)
+            if time.perf_counter() - start >= min_time:
+                break
+            number *= 2
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn(*args)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def recorded_frames(path, limit=None):
+    """读取 blive.record 录制文件中的原始数据帧"""
+    from blive.record import ReplaySource
+
+    frames = []
+    for _, _, data in ReplaySource(path):
+        frames.append(data)
+        if limit is not None and len(frames) >= limit:
+            break
+    return frames
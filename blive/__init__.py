@@ -1,3 +1,4 @@
 from .eeframework import *
 from .core import *
-from .msg import *
\ No newline at end of file
+from .msg import *
+from .codec import *
@@ -0,0 +1,93 @@
+"""
+批量 handler: 把同一 cmd 的多条消息攒成 list 后一次性交给 handler, 适合批量写入数据库等场景
+
+    @app.on_batch(Events.DANMU_MSG, max_size=500, max_delay=0.2)
+    async def save(ctxs):
+        await db.executemany("INSERT ...", [(ctx.message.sender.id, ctx.message.content) for ctx in ctxs])
+
+攒够 max_size 条, 或第一条消息等待超过 max_delay 秒时交给 handler, graceful_close 时交出剩余的消息
+"""
+import asyncio
+import inspect
+
+
+class Batcher:
+    """
+    handler: 参数为 ctx 列表的函数或协程函数
+    max_size: 每批的最大消息数
+    max_delay: 每批第一条消息最多等待的秒数
+    on_error: handler 抛出异常时的回调, 默认交给事件循环的 exception handler
+    """
+
+    def __init__(self, handler, max_size=500, max_delay=0.2, on_error=None) -> None:
+        self.handler = handler
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.on_error = on_error or self._default_error
+        self.items = []
+        self.batches = 0  # 已交给 handler 的批数
+        self._timer = None
+        self._tasks = set()
+
+    @staticmethod
+    def _default_error(error):
+        asyncio.get_event_loop().call_exception_handler(
+            {"message": "unhandled error in blive batch handler", "exception": error}
+        )
+
+    def add(self, ctx):
+        """作为普通 listener 注册到 emitter 上"""
+        self.items.append(ctx)
+        if len(self.items) >= self.max_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_event_loop().call_later(self.max_delay, self.flush)
+
+    def flush(self):
+        """立即把已攒下的消息交给 handler"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self.items:
+            return
+        items, self.items = self.items, []
+        self.batches += 1
+        try:
+            ret = self.handler(items)
+        except Exception as e:
+            self.on_error(e)
+            return
+        if inspect.isawaitable(ret):
+            task = asyncio.ensure_future(ret)
+            self._tasks.add(task)
+            task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Future):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.on_error(task.exception())
+
+    async def close(self):
+        """交出剩余的消息, 并等待所有正在执行的 handler 完成"""
+        self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def on_batch(emitter, event, f=None, max_size=500, max_delay=0.2, on_error=None):
+    """为 emitter 注册批量 handler, 返回创建的 Batcher (作为装饰器使用时返回 handler 本身)"""
+
+    def _on(f):
+        batcher = Batcher(f, max_size=max_size, max_delay=max_delay, on_error=on_error)
+        emitter.on(event, batcher.add)
+        emitter._batchers.append(batcher)
+        return batcher
+
+    if f is None:
+
+        def decorator(f):
+            _on(f)
+            return f
+
+        return decorator
+    return _on(f)
@@ -0,0 +1,126 @@
+"""
+json 编解码后端
+
+默认按 orjson > msgspec > ujson > json 的顺序选择已安装的库,
+也可以通过 set_default_codec 全局指定, 或在 BLiver(codec=...) 中单独指定
+
+loads 可以直接接收 bytes / memoryview, 解压后的数据不需要先 decode 为 str
+"""
+import json
+from typing import Union
+
+__all__ = ["JSONCodec", "get_codec", "set_default_codec", "available_codecs"]
+
+
+class JSONCodec:
+    name = "json"
+
+    def loads(self, data):
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+
+class OrjsonCodec(JSONCodec):
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson
+
+        self._orjson = orjson
+
+    def loads(self, data):
+        try:
+            return self._orjson.loads(data)
+        except self._orjson.JSONDecodeError:
+            # orjson 拒绝的输入 (NaN, 旧版本遇到超过 64 位的整数等) 退回标准库
+            return super().loads(data)
+
+    def dumps(self, obj) -> bytes:
+        return self._orjson.dumps(obj)
+
+
+class MsgspecCodec(JSONCodec):
+    name = "msgspec"
+
+    def __init__(self) -> None:
+        import msgspec
+
+        self._decoder = msgspec.json.Decoder()
+        self._encoder = msgspec.json.Encoder()
+
+    def loads(self, data):
+        return self._decoder.decode(data)
+
+    def dumps(self, obj) -> bytes:
+        return self._encoder.encode(obj)
+
+
+class UjsonCodec(JSONCodec):
+    name = "ujson"
+
+    def __init__(self) -> None:
+        import ujson
+
+        self._ujson = ujson
+
+    def loads(self, data):
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return self._ujson.loads(data)
+
+    def dumps(self, obj) -> bytes:
+        return self._ujson.dumps(obj, escape_forward_slashes=False).encode("utf-8")
+
+
+_CODECS = {
+    "orjson": OrjsonCodec,
+    "msgspec": MsgspecCodec,
+    "ujson": UjsonCodec,
+    "json": JSONCodec,
+}
+_instances = {}
+_default = None
+
+
+def _load(name) -> Union[JSONCodec, None]:
+    if name not in _instances:
+        try:
+            _instances[name] = _CODECS[name]()
+        except ImportError:
+            _instances[name] = None
+    return _instances[name]
+
+
+def available_codecs():
+    return [name for name in _CODECS if _load(name) is not None]
+
+
+def get_codec(codec: Union[str, JSONCodec, None] = None) -> JSONCodec:
+    """
+    codec 为 None 时返回全局默认后端, "auto" 为已安装的最快后端, 也可以直接传入 JSONCodec 实例
+    """
+    global _default
+    if isinstance(codec, JSONCodec):
+        return codec
+    if codec is None:
+        if _default is None:
+            _default = get_codec("auto")
+        return _default
+    if codec == "auto":
+        return _load(available_codecs()[0])
+    if codec not in _CODECS:
+        raise ValueError(f"unknown json codec: {codec}")
+    instance = _load(codec)
+    if instance is None:
+        hint = "pip install blive[fast]" if codec in ("orjson", "msgspec") else f"pip install {codec}"
+        raise ImportError(f"json codec `{codec}` is not installed, install it with `{hint}`")
+    return instance
+
+
+def set_default_codec(codec: Union[str, JSONCodec, None]):
+    global _default
+    _default = None if codec is None else get_codec(codec)
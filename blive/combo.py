@@ -0,0 +1,189 @@
+"""
+礼物连击合并
+
+一次连击 (同一房间, 同一用户, 同一 batch_combo_id) 会下发几十条 SEND_GIFT 和 COMBO_SEND,
+ComboAggregator 把它们合并为一个 GiftCombo, 连击结束 (combo_stay_time 内没有新消息) 后触发一次 Events.GIFT_SETTLED
+
+    aggregator = ComboAggregator()
+    aggregator.attach(app)  # BLiver 或 BLiveHub
+
+    @app.on(Events.GIFT_SETTLED)
+    async def settled(combo: GiftCombo):
+        print(combo.uname, combo.gift_name, combo.num, combo.total_coin)
+
+所有连击的超时由一个时间轮驱动, 不会为每个连击创建 timer
+"""
+import asyncio
+
+from .core import Events
+from .timewheel import TimingWheel
+
+
+class GiftCombo:
+    """合并后的一次礼物连击"""
+
+    __slots__ = (
+        "room_id",
+        "uid",
+        "uname",
+        "medal_name",
+        "medal_level",
+        "batch_combo_id",
+        "gift_id",
+        "gift_name",
+        "coin_type",
+        "action",
+        "gift_num",  # SEND_GIFT 的 num 之和
+        "combo_num",  # COMBO_SEND 中最大的 total_num
+        "gift_coin",  # SEND_GIFT 的 total_coin 之和
+        "combo_coin",  # COMBO_SEND / SEND_GIFT 中最大的 combo_total_coin
+        "messages",  # 合并的消息数
+        "first_ts",
+        "last_ts",
+        "deadline",  # loop.time() 超过该值时连击结束
+        "bliver",
+    )
+
+    def __init__(self, room_id, uid, batch_combo_id, bliver=None) -> None:
+        self.room_id = room_id
+        self.uid = uid
+        self.uname = None
+        self.medal_name = None
+        self.medal_level = None
+        self.batch_combo_id = batch_combo_id
+        self.gift_id = None
+        self.gift_name = None
+        self.coin_type = None
+        self.action = None
+        self.gift_num = 0
+        self.combo_num = 0
+        self.gift_coin = 0
+        self.combo_coin = 0
+        self.messages = 0
+        self.first_ts = self.last_ts = None
+        self.deadline = 0.0
+        self.bliver = bliver
+
+    @property
+    def num(self) -> int:
+        """礼物总数"""
+        return max(self.gift_num, self.combo_num)
+
+    @property
+    def total_coin(self) -> int:
+        """礼物总价值 (金瓜子/银瓜子)"""
+        return max(self.gift_coin, self.combo_coin)
+
+    def to_dict(self) -> dict:
+        d = {k: getattr(self, k) for k in self.__slots__ if k not in ("deadline", "bliver")}
+        d["num"] = self.num
+        d["total_coin"] = self.total_coin
+        return d
+
+    def __repr__(self) -> str:
+        return f"GiftCombo({self.to_dict()})"
+
+
+class ComboAggregator:
+    """
+    wheel: 驱动超时的时间轮, 默认创建一个 0.5 秒精度的时间轮 (BLiveHub 可以传入 hub.wheel)
+    stay_time: 消息中没有 combo_stay_time 时使用的连击保持时间 (秒)
+    grace: 在 combo_stay_time 之外额外等待的秒数, 用于容忍消息延迟
+    """
+
+    def __init__(self, wheel: TimingWheel = None, stay_time=3.0, grace=1.0) -> None:
+        self._own_wheel = wheel is None
+        self.wheel = wheel if wheel is not None else TimingWheel(tick=0.5, slots=32)
+        self.stay_time = stay_time
+        self.grace = grace
+        self.combos = {}  # (room_id, uid, batch_combo_id) -> GiftCombo
+        self.emitter = None
+        self.received = 0  # 收到的 SEND_GIFT / COMBO_SEND 数
+        self.settled = 0  # 触发的 GIFT_SETTLED 数
+
+    def attach(self, emitter):
+        """监听 emitter 上的 SEND_GIFT / COMBO_SEND, 并在 emitter 上触发 GIFT_SETTLED"""
+        self.emitter = emitter
+        emitter.on(Events.SEND_GIFT, self._on_gift)
+        emitter.on(Events.COMBO_SEND, self._on_combo)
+        return emitter
+
+    def _combo_for(self, ctx, uid, batch_combo_id, stay_time):
+        bliver = ctx.bliver
+        room_id = getattr(bliver, "real_room_id", None) or bliver.room_id
+        key = (room_id, uid, batch_combo_id)
+        combo = self.combos.get(key)
+        now = asyncio.get_event_loop().time()
+        stay = (stay_time or self.stay_time) + self.grace
+        if combo is None:
+            combo = self.combos[key] = GiftCombo(room_id, uid, batch_combo_id, bliver)
+            combo.first_ts = now
+            if self._own_wheel:
+                self.wheel.start()
+            self.wheel.call_later(stay, self._expire, key)
+        combo.last_ts = now
+        combo.deadline = now + stay  # 只推迟截止时间, 到期时再检查, 不重新创建定时器
+        combo.messages += 1
+        self.received += 1
+        return combo
+
+    def _on_gift(self, ctx):
+        msg = ctx.message
+        sender = msg.sender
+        gift = msg.gift
+        combo = self._combo_for(
+            ctx,
+            sender.id,
+            msg.combo["batch_combo_id"] or f"gift:{gift['gift_id']}",
+            msg.combo["combo_stay_time"],
+        )
+        combo.uname = sender.name
+        combo.medal_name = sender.medal.medal_name
+        combo.medal_level = sender.medal.medal_level
+        combo.gift_id = gift["gift_id"]
+        combo.gift_name = gift["gift_name"]
+        combo.coin_type = msg.coin_type
+        combo.action = msg.action
+        combo.gift_num += msg.num or 0
+        combo.gift_coin += msg.total_coin or 0
+        combo.combo_coin = max(combo.combo_coin, msg.combo["combo_total_coin"] or 0)
+
+    def _on_combo(self, ctx):
+        msg = ctx.message
+        sender = msg.sender
+        combo = self._combo_for(ctx, sender.id, msg.batch_combo_id or f"gift:{msg.gift_id}", None)
+        combo.uname = sender.name
+        if combo.gift_id is None:
+            combo.gift_id = msg.gift_id
+            combo.gift_name = msg.gift_name
+            combo.action = msg.action
+            combo.medal_name = sender.medal.medal_name
+            combo.medal_level = sender.medal.medal_level
+        combo.combo_num = max(combo.combo_num, msg.total_num or msg.batch_combo_num or 0)
+        combo.combo_coin = max(combo.combo_coin, msg.combo_total_coin or 0)
+
+    def _expire(self, key):
+        combo = self.combos.get(key)
+        if combo is None:
+            return
+        remaining = combo.deadline - asyncio.get_event_loop().time()
+        if remaining > 0:
+            self.wheel.call_later(remaining, self._expire, key)
+            return
+        self._settle(key)
+
+    def _settle(self, key):
+        combo = self.combos.pop(key)
+        self.settled += 1
+        if self.emitter is not None:
+            self.emitter.emit(Events.GIFT_SETTLED, combo)
+
+    def flush(self):
+        """立即结束所有未结束的连击, 例如关闭程序前调用"""
+        for key in list(self.combos):
+            self._settle(key)
+
+    def close(self):
+        self.flush()
+        if self._own_wheel:
+            self.wheel.stop()
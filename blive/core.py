@@ -1,36 +1,56 @@
 from collections import namedtuple
-import json
+import re
 from random import randint
 import struct
 import enum
-import brotli
 import zlib
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
 from aiohttp import ClientSession
+from .codec import get_codec
+
+API_HOST = "https://api.live.bilibili.com"
 
 
-async def get_blive_ws_url(roomid,aio_session:ClientSession,ssl=True, platform="pc", player="web"):
+async def get_blive_conf(roomid, aio_session: ClientSession, platform="pc", player="web", api_host=API_HOST):
+    """
+    获取弹幕服务器列表和认证 token
+
+    Return: token, host_server_list
+    """
     async with aio_session.get(
-        f"https://api.live.bilibili.com/room/v1/Danmu/getConf",
+        f"{api_host}/room/v1/Danmu/getConf",
         params={"room_id": roomid, "platform": platform, "player": player},
     ) as resp:
         data = await resp.json()
-        lens = len(data["data"]["host_server_list"])
-        url_obj = data["data"]["host_server_list"][randint(0, lens - 1)]
-        if ssl:
-            url = f"wss://{url_obj['host']}:{url_obj['wss_port']}/sub"
-        else:
-            url = f"ws://{url_obj['host']}:{url_obj['ws_port']}/sub"
-        return url, data["data"]["token"]
+        conf = data.get("data")
+        if not conf or not conf.get("host_server_list"):
+            raise ConnectionError(f"getConf failed for room {roomid}: {data.get('message')}")
+        return conf["token"], conf["host_server_list"]
+
 
+def ws_url(host, ssl=True):
+    if ssl:
+        return f"wss://{host['host']}:{host['wss_port']}/sub"
+    return f"ws://{host['host']}:{host['ws_port']}/sub"
 
-async def get_blive_room_info(roomid,aio_session:ClientSession):
+
+async def get_blive_ws_url(roomid,aio_session:ClientSession,ssl=True, platform="pc", player="web", api_host=API_HOST):
+    token, hosts = await get_blive_conf(roomid, aio_session, platform=platform, player=player, api_host=api_host)
+    return ws_url(hosts[randint(0, len(hosts) - 1)], ssl=ssl), token
+
+
+async def get_blive_room_info(roomid,aio_session:ClientSession, api_host=API_HOST):
     """
     得到b站直播间id,(短id不是真实的id)
 
     Return: true_room_id,up_name
     """
     async with aio_session.get(
-        "https://api.live.bilibili.com/xlive/web-room/v1/index/getInfoByRoom",
+        f"{api_host}/xlive/web-room/v1/index/getInfoByRoom",
         params={"room_id": roomid},
     ) as resp:
         data = await resp.json()
@@ -56,6 +76,21 @@ def heartbeat():
     return {}
 
 
+def resolve_protover(protover="auto"):
+    """
+    认证包中的 protover, 决定服务器推送粘包时的压缩方式: 2 为 zlib, 3 为 brotli
+
+    auto: 选择 brotli, 解压开销与 zlib 相当而传输字节数更少 (见 benchmark/bench_protover.py),
+    未安装 brotli 时选择 zlib
+    """
+    if protover == "auto":
+        protover = ProtocolVersion.BROTLI if brotli is not None else ProtocolVersion.DEFLATE
+    protover = int(protover)
+    if protover == ProtocolVersion.BROTLI and brotli is None:
+        raise ImportError("protover=3 requires brotli, install it with `pip install blive[brotli]`")
+    return protover
+
+
 class AuthReplyCode(enum.IntEnum):
     OK = 0
     TOKEN_ERROR = -101
@@ -85,6 +120,43 @@ PackageHeader = namedtuple(
 HeaderStruct = struct.Struct(">I2H2I")
 
 
+def split_packages(data):
+    """
+    拆分解压后的粘包数据
+
+    用 memoryview 按偏移量遍历, 不复制中间数据, 逐个 yield (header, payload),
+    payload 为指向原始数据的 memoryview
+    """
+    buf = memoryview(data)
+    unpack_from = HeaderStruct.unpack_from
+    make_header = PackageHeader._make
+    limit = len(buf) - HeaderStruct.size
+    offset = 0
+    while offset <= limit:
+        header = make_header(unpack_from(buf, offset))
+        package_size, header_size = header[0], header[1]
+        if package_size < header_size:
+            break  # 包头损坏, 丢弃剩余数据, 避免死循环
+        end = offset + package_size
+        yield header, buf[offset + header_size : end]  # 切片越界时自动截断到末尾
+        offset = end
+
+
+_CMD_PREFIX = re.compile(rb'\A\s*\{\s*"cmd"\s*:\s*"([^"\\]*)"')
+
+
+def peek_cmd(payload, limit=64):
+    """
+    不解析整个 json, 只从数据开头扫描出 cmd
+
+    只识别 cmd 为第一个字段的情况, 找不到时返回 None, 调用者需要退回完整解析
+    """
+    m = _CMD_PREFIX.match(bytes(payload[:limit]))
+    if m is None:
+        return None
+    return m.group(1).decode("utf-8")
+
+
 def counter(start=1):
     while True:
         yield start
@@ -93,14 +165,90 @@ def counter(start=1):
 
 
 
+def _zlib_chunks(data, chunk_size):
+    d = zlib.decompressobj()
+    out = d.decompress(data, chunk_size)
+    while out:
+        yield out
+        if d.eof:
+            return
+        out = d.decompress(d.unconsumed_tail, chunk_size)
+    yield d.flush()
+
+
+def _brotli_chunks(data, chunk_size):
+    d = brotli.Decompressor()
+    try:
+        out = d.process(data, output_buffer_limit=chunk_size)
+    except TypeError:
+        # 旧版本 brotli 不支持 output_buffer_limit, 只能一次性解压
+        yield d.process(data)
+        return
+    while out:
+        yield out
+        if d.is_finished():
+            return
+        out = d.process(b"", output_buffer_limit=chunk_size)
+
+
+class StreamingDecoder:
+    """
+    流式解压拆包, 每个连接一个
+
+    按 chunk_size 分块解压到缓冲区中, 缓冲区中一凑齐完整的包就立即 yield,
+    不需要先得到整个解压后的数据, 单帧的内存峰值约为 chunk_size + 最大单包大小.
+    每次调用 iter_packages 使用自己的缓冲区, 多个没有迭代完的生成器互不影响
+    """
+
+    def __init__(self, chunk_size=16 * 1024) -> None:
+        self.chunk_size = chunk_size
+
+    def iter_packages(self, data, version):
+        if version == ProtocolVersion.DEFLATE:
+            chunks = _zlib_chunks(data, self.chunk_size)
+        else:
+            chunks = _brotli_chunks(data, self.chunk_size)
+
+        buf = bytearray()
+        unpack_from = HeaderStruct.unpack_from
+        make_header = PackageHeader._make
+        offset = 0
+        for chunk in chunks:
+            buf += chunk
+            while len(buf) - offset >= HeaderStruct.size:
+                header = make_header(unpack_from(buf, offset))
+                if header.package_size < header.header_size:
+                    return  # 包头损坏, 丢弃剩余数据
+                end = offset + header.package_size
+                if end > len(buf):
+                    break  # 包还没有解压完整
+                with memoryview(buf) as view:
+                    payload = bytes(view[offset + header.header_size : end])
+                yield header, payload
+                offset = end
+            # 已经取出的包从缓冲区中移除
+            del buf[:offset]
+            offset = 0
+        if len(buf) > HeaderStruct.size:
+            # 最后一个包比声明的大小短, 与 split_packages 一样截断到末尾
+            header = make_header(unpack_from(buf, 0))
+            yield header, bytes(buf[header.header_size :])
+
+
 class BLiveMsgPackage:
     """bilibili websocket message package"""
 
-    def __init__(self) -> None:
+    def __init__(self, codec=None) -> None:
         self.sequence = counter(0)
+        self._codec = codec
+        self._decoder = None
+
+    @property
+    def codec(self):
+        return get_codec(self._codec)
 
     def pack(self, data, operation, version=ProtocolVersion.NORMAL):
-        body = json.dumps(data).encode("utf-8")
+        body = self.codec.dumps(data)
         header = HeaderStruct.pack(
             *PackageHeader(
                 package_size=HeaderStruct.size + len(body),
@@ -115,38 +263,27 @@ class BLiveMsgPackage:
     def zipped_notify_pkg_process(
         self, packages: list, data
     ):  # 解压后的包处理代码 ,抽取为公共函数, data: 解压后的原始数据
-        header = PackageHeader(*HeaderStruct.unpack(data[:16]))  # 读取包头
-        if len(data) > header.package_size:  # 如果数据大小大于包头声明的大小，说明是粘包
-            while True:
-                # 先把第一个包放进去 / 放入包
-                packages.append(
-                    (header, data[16 : header.package_size].decode("utf-8"))
-                )
-                # 移动到下一个包
-                data = data[header.package_size :]
-                # 读取下一个包的包头
-                header = PackageHeader(*HeaderStruct.unpack(data[:16]))
-                if len(data) > header.package_size:
-                    # 如果数据还大于声明的package_size，说明还有1个以上的包
-                    continue
-                else:
-                    # 剩下的数据刚好就是一个包,直接放，然后退出循环
-                    packages.append((header, data[16:].decode("utf-8")))  # 直接放第二个包
-                    break
-        else:
-            # 如果数据大小不大于包头声明的大小,说明是单个包太大压缩的。直接放入
-            packages.append((header, data[16:].decode("utf-8")))
+        for header, payload in split_packages(data):
+            packages.append((header, str(payload, "utf-8")))
 
-    def unpack(self, data) -> list:
+    def unpack_raw(self, data) -> list:
+        """
+        与 unpack 相同, 但不做 utf-8 解码, 返回 [(header, bytes-like), ...]
+
+        payload 可能是指向解压数据的 memoryview, 需要时再解码
+        """
         packages = []  # 装处理好的数据包用
-        header = PackageHeader(*HeaderStruct.unpack(data[:16]))  # 读取数据包的头部
-        data = data[16:]  # 读取数据包的数据段
+        header = PackageHeader(*HeaderStruct.unpack_from(data))  # 读取数据包的头部
+        data = memoryview(data)[HeaderStruct.size :]  # 读取数据包的数据段
 
         # 心跳包处理
         if header.operation == Operation.HEARTBEAT_REPLY:
-            popularity = struct.unpack("!I", data[:4])[0]
-            payload = data[4:].decode("utf-8")
-            plain_text = "{"+"\"cmd\":\"HEARTBEAT_REPLY\",\"popularity\":{},\"payload\":{}".format(popularity,payload)+"}"
+            popularity = struct.unpack_from("!I", data)[0]
+            payload = bytes(data[4:]) or b"null"
+            plain_text = b'{"cmd":"HEARTBEAT_REPLY","popularity":%d,"payload":%s}' % (
+                popularity,
+                payload,
+            )
             packages.append((header, plain_text))
 
         # 通知包处理
@@ -155,26 +292,42 @@ class BLiveMsgPackage:
             # NOTIFY 消息可能会粘包
             if header.version == ProtocolVersion.DEFLATE:
                 # 先zlib解码，拆包
-                data = zlib.decompress(data)
-                self.zipped_notify_pkg_process(packages, data)
+                packages.extend(split_packages(zlib.decompress(data)))
 
             elif header.version == ProtocolVersion.BROTLI:
                 # 与 zlib 逻辑相同，先解码，然后数据可能要拆包
-                data = brotli.decompress(data)
-                self.zipped_notify_pkg_process(packages, data)
+                packages.extend(split_packages(brotli.decompress(data)))
 
             elif header.version == ProtocolVersion.NORMAL:
-                # normal 直接decode
-                packages.append((header, data.decode("utf-8")))
+                packages.append((header, data))
             else:
                 # TODO 抛出错误或者打印日志
                 pass
 
         elif header.operation == Operation.AUTH_REPLY:
-            packages.append((header, data.decode("utf-8")))
+            packages.append((header, data))
 
         return packages
 
+    def iter_unpack_raw(self, data):
+        """
+        与 unpack_raw 相同, 但压缩的 NOTIFY 包使用 StreamingDecoder 边解压边 yield
+        """
+        header = PackageHeader(*HeaderStruct.unpack_from(data))
+        if header.operation == Operation.NOTIFY and header.version in (
+            ProtocolVersion.DEFLATE,
+            ProtocolVersion.BROTLI,
+        ):
+            if self._decoder is None:
+                self._decoder = StreamingDecoder()
+            body = memoryview(data)[HeaderStruct.size :]
+            yield from self._decoder.iter_packages(body, header.version)
+        else:
+            yield from self.unpack_raw(data)
+
+    def unpack(self, data) -> list:
+        return [(header, str(payload, "utf-8")) for header, payload in self.unpack_raw(data)]
+
 
 packman = BLiveMsgPackage()
 
@@ -235,3 +388,7 @@ class Events(str, enum.Enum):
     PK_BATTLE_SETTLE = "PK_BATTLE_SETTLE"  # pk结果
     PK_BATTLE_PRE_NEW = "PK_BATTLE_PRE_NEW"  # pk预创建
     LIVE_INTERACTIVE_GAME = "LIVE_INTERACTIVE_GAME"  # 在线互动游戏 送礼物参与
+
+    # 以下为 blive 合成的事件, 不是 B 站下发的 cmd
+    GIFT_SETTLED = "GIFT_SETTLED"  # 一次礼物连击结束, 见 blive.combo.ComboAggregator
+    RULE_MATCHED = "RULE_MATCHED"  # 消息命中了关键词/正则规则, 见 blive.rules.RuleEngine
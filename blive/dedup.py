@@ -0,0 +1,108 @@
+"""
+断线重连后的重复消息过滤
+
+重连后服务器经常会重新下发最近的醒目留言, 上舰等消息, 直接统计会重复计算. 传入 Deduplicator 后,
+有稳定 id 的消息在 ttl 秒内再次出现时直接丢弃, 不会触发 handler
+
+    app = BLiver(510, dedup=Deduplicator(ttl=600))
+    hub = BLiveHub(dedup=Deduplicator())  # 所有房间共用, key 中包含房间号
+
+    app.dedup.stats()  # {"checked": ..., "suppressed": {"SUPER_CHAT_MESSAGE": 3}, "size": ...}
+
+记录按首次出现的时间顺序保存, 超过 ttl 或超过 max_size 条时从最旧的开始淘汰, 长时间运行内存也不会增长
+"""
+import time
+from collections import Counter, OrderedDict
+
+
+def _danmu_key(body):
+    info = body["info"]
+    # 发送时间(毫秒) + uid + 内容
+    return (info[0][4], info[2][0], info[1])
+
+
+def _gift_key(body):
+    data = body["data"]
+    tid = data.get("tid")
+    if tid:
+        return tid
+    return (data["uid"], data["timestamp"], data["giftId"], data["batch_combo_id"], data["num"])
+
+
+def _combo_key(body):
+    data = body["data"]
+    return (data["uid"], data["batch_combo_id"], data["total_num"], data["batch_combo_num"])
+
+
+def _guard_key(body):
+    data = body["data"]
+    return (data["uid"], data["guard_level"], data["num"], data["start_time"])
+
+
+# cmd -> 从消息体取出稳定 id 的函数, 没有列出的 cmd 不做过滤
+# 排行榜, 在线人数等是状态快照, 重复收到不影响结果
+KEYS = {
+    "DANMU_MSG": _danmu_key,
+    "SEND_GIFT": _gift_key,
+    "COMBO_SEND": _combo_key,
+    "SUPER_CHAT_MESSAGE": lambda body: body["data"]["id"],
+    "SUPER_CHAT_MESSAGE_JPN": lambda body: body["data"]["id"],
+    "GUARD_BUY": _guard_key,
+    "USER_TOAST_MSG": lambda body: body["data"]["payflow_id"],
+}
+
+
+class Deduplicator:
+    """
+    ttl: 记住一条消息的秒数, 应大于重连后重新下发的时间范围
+    max_size: 最多记住的消息数, 超过时淘汰最旧的记录
+    keys: cmd -> 取 id 函数, 默认为 KEYS
+    """
+
+    def __init__(self, ttl=300.0, max_size=100000, keys=None) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self.keys = KEYS if keys is None else keys
+        self.seen = OrderedDict()  # key -> 首次出现的时间
+        self.checked = 0
+        self.suppressed = Counter()  # cmd -> 丢弃的重复消息数
+
+    def is_duplicate(self, room_id, cmd, body) -> bool:
+        """body 为消息体 (dict 或 schema 中的 Struct), 第一次出现返回 False 并记住, 再次出现返回 True"""
+        get_key = self.keys.get(cmd)
+        if get_key is None:
+            return False
+        try:
+            key = (room_id, cmd, get_key(body))
+        except (TypeError, KeyError, IndexError, AttributeError):
+            return False  # 格式不对的消息不做过滤
+        now = time.monotonic()
+        self.checked += 1
+        seen = self.seen
+        first = seen.get(key)
+        if first is not None and now - first < self.ttl:
+            self.suppressed[cmd] += 1
+            return True
+        if first is not None:
+            del seen[key]  # 过期后重新出现, 当作新消息
+        seen[key] = now
+        self._evict(now)
+        return False
+
+    def _evict(self, now):
+        seen = self.seen
+        while seen:
+            key, first = next(iter(seen.items()))
+            if len(seen) <= self.max_size and now - first < self.ttl:
+                break
+            del seen[key]
+
+    def stats(self) -> dict:
+        return {
+            "checked": self.checked,
+            "suppressed": dict(self.suppressed),
+            "size": len(self.seen),
+        }
+
+    def clear(self):
+        self.seen.clear()
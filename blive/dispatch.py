@@ -0,0 +1,131 @@
+"""
+有界的消息分发队列
+
+默认情况下 BLiver 每收到一条消息就为每个协程 handler 创建一个 task, handler 处理慢时 task 会无限堆积.
+使用 BoundedDispatcher 后消息先进入有界队列, 由固定数量的 worker 依次调用 handler, 队列满时按溢出策略处理
+
+    app = BLiver(510, dispatcher=BoundedDispatcher(maxsize=1000, workers=4, policy=OverflowPolicy.DROP_OLDEST))
+"""
+import asyncio
+import enum
+import inspect
+from collections import deque
+
+
+class OverflowPolicy(str, enum.Enum):
+    DROP_OLDEST = "drop_oldest"  # 丢弃队列中最旧的消息
+    DROP_NEWEST = "drop_newest"  # 丢弃新到的消息
+    BLOCK = "block"  # 阻塞读取 websocket, 直到队列有空位
+    COALESCE = "coalesce"  # 队列中已有同一直播间同 cmd 的消息时用新消息替换它, 否则丢弃最旧的消息
+
+
+class _Queue:
+    __slots__ = ("items", "latest", "not_empty", "not_full", "workers")
+
+    def __init__(self) -> None:
+        self.items = deque()  # [cmd, bliver, ctx]
+        # (id(bliver), cmd) -> 队列中该直播间该 cmd 最新的一项, 用于 COALESCE. 多个直播间可以共用一个队列
+        self.latest = {}
+        self.not_empty = asyncio.Event()
+        self.not_full = asyncio.Event()
+        self.workers = []
+
+    def popleft(self):
+        item = self.items.popleft()
+        key = (id(item[1]), item[0])
+        if self.latest.get(key) is item:
+            del self.latest[key]
+        return item
+
+
+class BoundedDispatcher:
+    """
+    maxsize: 每个队列的最大长度
+    workers: 每个队列的 worker 数量, 大于 1 时同一队列中的消息不保证按顺序处理完成
+    policy: 队列满时的处理策略, 见 OverflowPolicy
+    per_event: True 时每个 cmd 单独一个队列和一组 worker, 慢 handler 不会阻塞其他 cmd 的消息
+    """
+
+    def __init__(self, maxsize=1000, workers=1, policy=OverflowPolicy.DROP_OLDEST, per_event=False) -> None:
+        self.maxsize = maxsize
+        self.workers = workers
+        self.policy = OverflowPolicy(policy)
+        self.per_event = per_event
+        self.queues = {}
+        self.processed = 0  # 已处理的消息数
+        self.dropped = 0  # 因队列满丢弃的消息数
+        self.coalesced = 0  # 被同一直播间同 cmd 新消息替换的消息数
+        self.closed = False
+
+    @property
+    def depth(self) -> int:
+        """当前所有队列中等待处理的消息数"""
+        return sum(len(q.items) for q in self.queues.values())
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
+
+    def _queue_for(self, cmd) -> _Queue:
+        key = cmd if self.per_event else None
+        q = self.queues.get(key)
+        if q is None:
+            q = self.queues[key] = _Queue()
+            loop = asyncio.get_event_loop()
+            q.workers = [loop.create_task(self._worker(q)) for _ in range(self.workers)]
+        return q
+
+    async def put(self, bliver, cmd, ctx) -> bool:
+        """放入一条消息, 返回 False 表示消息被丢弃"""
+        q = self._queue_for(cmd)
+        key = (id(bliver), cmd)
+        while len(q.items) >= self.maxsize:
+            if self.policy == OverflowPolicy.BLOCK:
+                q.not_full.clear()
+                await q.not_full.wait()
+                continue
+            if self.policy == OverflowPolicy.DROP_NEWEST:
+                self.dropped += 1
+                return False
+            if self.policy == OverflowPolicy.COALESCE and key in q.latest:
+                q.latest[key][2] = ctx
+                self.coalesced += 1
+                return True
+            q.popleft()
+            self.dropped += 1
+        item = [cmd, bliver, ctx]
+        q.items.append(item)
+        q.latest[key] = item
+        q.not_empty.set()
+        return True
+
+    async def _worker(self, q: _Queue):
+        while True:
+            while not q.items:
+                q.not_empty.clear()
+                await q.not_empty.wait()
+            cmd, bliver, ctx = q.popleft()
+            q.not_full.set()
+            for f in bliver._listeners_for(cmd):
+                try:
+                    ret = f(ctx)
+                    if inspect.isawaitable(ret):
+                        await ret
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    bliver._handle_error(e)
+            self.processed += 1
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for q in self.queues.values():
+            for w in q.workers:
+                w.cancel()
+            await asyncio.gather(*q.workers, return_exceptions=True)
@@ -1,44 +1,134 @@
 import warnings
-import json
 import asyncio
 from typing import List, Union
 import aiohttp
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from pyee import AsyncIOEventEmitter
+from .batch import on_batch
+from .filters import on_filtered, rejects_room
+from .reconnect import Reconnector
+from .codec import get_codec
+from .msg import BaseMsg, msg_class_for
 from .core import (
     BLiveMsgPackage,
     PackageHeader,
     Events,
     Operation,
+    AuthReplyCode,
+    HeaderStruct,
+    API_HOST,
     get_blive_room_info,
-    get_blive_ws_url,
     certification,
     heartbeat,
+    peek_cmd,
+    resolve_protover,
 )
 
 
 class BLiverCtx:
-    def __init__(self, bliver, msg) -> None:
+    def __init__(self, bliver, msg, body=None) -> None:
         self.ws = bliver.ws
         self.bliver: BLiver = bliver
-        self.msg: tuple[PackageHeader, dict] = msg  # 原始消息
+        self.msg: tuple[PackageHeader, bytes] = msg  # 原始消息
         self.header: PackageHeader = self.msg[0]  # 消息头部
-        self.body: dict = json.loads(msg[1])
+        # body 已经在其他地方解析过时 (例如进程池中, 或按 schema 解码为 Struct) 直接使用
+        self.body: dict = bliver.codec.loads(msg[1]) if body is None else body
+        self._message = None
+
+    @property
+    def message(self) -> BaseMsg:
+        """按 cmd 包装好的消息操作类对象 (见 blive.msg.register_msg_class), 第一次访问时创建, 同一条消息的所有 handler 共用"""
+        if self._message is None:
+            self._message = msg_class_for(self.body.get("cmd"))(self.body)
+        return self._message
 
 
 class BLiver(AsyncIOEventEmitter):
     real_room_id: Union[None, int]
     uname: Union[None, str]
 
-    def __init__(self, room_id, uid=0):
+    heartbeat_interval = 30  # 心跳间隔(秒)
+    streaming_threshold = 16 * 1024  # 大于该字节数的压缩数据帧边解压边分发, 见 core.StreamingDecoder
+
+    def __init__(
+        self,
+        room_id,
+        uid=0,
+        codec=None,
+        aio_session: Union[None, aiohttp.ClientSession] = None,
+        ssl=True,
+        api_host=API_HOST,
+        recorder=None,
+        dispatcher=None,
+        offloader=None,
+        protover=1,
+        typed=False,
+        dedup=None,
+        reconnector=None,
+        resolver=None,
+        publisher=None,
+    ):
         super().__init__()
         self.running = False
         
         self.room_id = room_id
         self.uid = uid
-        self.aio_session = aiohttp.ClientSession()
-        self.packman = BLiveMsgPackage()
-        self.scheduler = AsyncIOScheduler(timezone="Asia/ShangHai")
+        self.ws = None
+        self.ssl = ssl
+        self.api_host = api_host
+        self.recorder = recorder  # 录制原始数据帧, 见 blive.record.FrameRecorder
+        self.dispatcher = dispatcher  # 有界分发队列, 见 blive.dispatch.BoundedDispatcher
+        self._own_dispatcher = True
+        self.offloader = offloader  # 大数据帧交给线程池/进程池解包, 见 blive.offload.FrameOffloader
+        self.protover = protover  # 2 为 zlib, 3 为 brotli, "auto" 自动选择, 见 core.resolve_protover
+        # 传入共享的 session 时由外部负责关闭
+        self._own_session = aio_session is None
+        self.aio_session = aio_session or self._create_session()
+        self.codec = get_codec(codec)  # json 编解码后端, 默认使用全局设置
+        self.packman = BLiveMsgPackage(codec=self.codec)
+        # 按 schema 把常用消息直接解码为 Struct, 见 blive.schema (需要安装 msgspec)
+        self.typed_decoder = self._create_typed_decoder(typed)
+        self.dedup = dedup  # 过滤重连后重复下发的消息, 见 blive.dedup.Deduplicator
+        self.reconnector = reconnector or Reconnector()  # 重连的退避, 限速和 getConf 缓存, 见 blive.reconnect
+        self._connecting = None
+        self.resolver = resolver  # 房间信息的持久化缓存, 见 blive.resolver.RoomResolver
+        self.publisher = publisher  # 把解包后的消息写入共享内存, 供其他进程消费, 见 blive.shmring.RingPublisher
+        self.scheduler = self._create_scheduler()
+        self._batchers = []  # on_batch 注册的 Batcher
+        self._filter_indexes = {}  # 带条件的 handler, cmd -> filters.FilterIndex
+
+    def _create_session(self):
+        return aiohttp.ClientSession()
+
+    @staticmethod
+    def _create_typed_decoder(typed):
+        if not typed:
+            return None
+        from .schema import TypedDecoder
+
+        return typed if isinstance(typed, TypedDecoder) else TypedDecoder()
+
+    def on(self, event, f=None, **filters):
+        """
+        注册 handler, 可以附带对消息字段的过滤条件, 只有满足所有条件的消息才会调用 handler, 见 blive.filters
+
+        @app.on(Events.DANMU_MSG, uid={1, 2, 3}, medal_level=Ge(20))
+        async def watch(ctx):
+            ...
+        """
+        if not filters:
+            return super().on(event, f)
+        return on_filtered(self, event, f, filters, on_error=self._handle_error)
+
+    def on_batch(self, event, f=None, max_size=500, max_delay=0.2):
+        """
+        注册批量 handler, handler 的参数为 ctx 列表, 见 blive.batch
+
+        @app.on_batch(Events.DANMU_MSG, max_size=500, max_delay=0.2)
+        async def save(ctxs):
+            ...
+        """
+        return on_batch(self, event, f, max_size=max_size, max_delay=max_delay, on_error=self._handle_error)
 
     def register_handler(self, event: Union[Events, List[Events]], handler):
         warnings.warn(
@@ -60,42 +150,84 @@ class BLiver(AsyncIOEventEmitter):
             ConnectionError,
             ConnectionResetError,
         ):
-            await self.connect()  # 重新连接
+            try:
+                await self.connect()  # 重新连接
+            except aiohttp.ClientConnectionError:
+                pass  # 由 listen 继续重试
+
+    async def _reconnect(self) -> bool:
+        """
+        一直重试到连接成功或停止监听, 返回是否连接成功
 
-    async def connect(self, retries=5):
-        for i in range(retries):
+        每用完一轮 reconnector.retries 次尝试报告一次错误, 退避时间在达到 cap 后不再增加
+        """
+        while self.running:
+            try:
+                await self.connect()
+                return True
+            except aiohttp.ClientConnectionError as e:
+                self._handle_error(e)
+        return False
+
+    async def connect(self, retries=None):
+        """连接弹幕服务器, 失败时按 reconnector 的退避策略重试, 超过重试次数抛出 ClientConnectionError"""
+        # 心跳失败和接收失败可能同时触发重连, 只建立一个连接
+        if self._connecting is not None and not self._connecting.done():
+            return await asyncio.shield(self._connecting)
+        self._connecting = asyncio.ensure_future(self._connect(retries))
+        return await self._connecting
+
+    async def _connect(self, retries):
+        reconnector = self.reconnector
+        error = None
+        for i in range(retries or reconnector.retries):
+            await reconnector.wait()
             try:
                 if not hasattr(self,"real_room_id") or not hasattr(self,"uname"):
-                    self.real_room_id, self.uname = await get_blive_room_info(
-                        self.room_id, self.aio_session
-                    )
-                url, token = await get_blive_ws_url(self.real_room_id, self.aio_session)
+                    if self.resolver is not None:
+                        self.real_room_id, self.uname = await self.resolver.resolve(
+                            self.room_id, self.aio_session, api_host=self.api_host
+                        )
+                    else:
+                        self.real_room_id, self.uname = await get_blive_room_info(
+                            self.room_id, self.aio_session, api_host=self.api_host
+                        )
+                url, token = await reconnector.endpoint(
+                    self.real_room_id, self.aio_session, ssl=self.ssl, api_host=self.api_host
+                )
+                if self.ws is not None and not self.ws.closed:
+                    await self.ws.close()
                 self.ws = await self.aio_session.ws_connect(url)
                 # 发送认证
                 await self.ws.send_bytes(
                     self.packman.pack(
-                        certification(self.real_room_id, token, uid=self.uid),
+                        certification(
+                            self.real_room_id,
+                            token,
+                            uid=self.uid,
+                            protover=resolve_protover(self.protover),
+                        ),
                         Operation.AUTH,
                     )
                 )
                 return
             except (
-                aiohttp.ClientConnectionError,
+                aiohttp.ClientError,
                 asyncio.TimeoutError,
                 ConnectionError,
                 ConnectionResetError,
-            ):            
-                await asyncio.sleep(1)
-        # raise aiohttp.ClientConnectionError("与服务器连接失败")
+            ) as e:
+                error = e
+                reconnector.failed(getattr(self, "real_room_id", None))
+        raise aiohttp.ClientConnectionError(f"与服务器连接失败 (room {self.room_id})") from error
 
     async def listen(self):
         self.running = True
         # start listening
-        await self.connect()
+        if not await self._reconnect():
+            return 0
 
-        # 开始30s发送心跳包的定时任务
-        self.scheduler.add_job(self.heartbeat, trigger="interval", seconds=30)
-        self.scheduler.start()
+        self._start_heartbeat()
 
         # 开始监听
         while self.running:
@@ -107,28 +239,142 @@ class BLiver(AsyncIOEventEmitter):
                     aiohttp.WSMsgType.ERROR,
                 ):
                     if self.running:
-                        await self.connect()  # reconnect
+                        await self._reconnect()
                         continue
                     else:
                         return 0
                 if msg.type != aiohttp.WSMsgType.BINARY:
                     continue
-                mq = self.packman.unpack(msg.data)
-                ctxs = filter(lambda ctx: ctx.body.get("cmd", None), [BLiverCtx(self, m) for m in mq])
-                for ctx in ctxs:
-                    self.emit(ctx.body["cmd"], ctx)
+                operation = HeaderStruct.unpack_from(msg.data)[3]
+                if operation == Operation.AUTH_REPLY:
+                    if not self._auth_succeeded(msg.data):
+                        await self._reconnect()
+                        continue
+                    self.reconnector.succeeded(self.real_room_id)
+                elif operation == Operation.NOTIFY:
+                    self.reconnector.succeeded(self.real_room_id)
+                if self.recorder is not None:
+                    self.recorder.write(self.real_room_id, msg.data)
+                await self._dispatch_frame(msg.data)
             except (
                 aiohttp.ClientConnectionError,
                 ConnectionResetError,
                 asyncio.TimeoutError,
             ):
-                await self.connect()
+                await self._reconnect()
+        return 0
+
+    def _auth_succeeded(self, data) -> bool:
+        """检查 AUTH_REPLY 的 code, 认证失败时缓存的 token 可能已经过期, 换服务器并清除缓存后重连"""
+        _, body = self.packman.unpack_raw(data)[0]
+        code = self.codec.loads(bytes(body)).get("code", AuthReplyCode.OK)
+        if code == AuthReplyCode.OK:
+            return True
+        self.reconnector.failed(self.real_room_id)
+        self.reconnector.cache.invalidate(self.real_room_id)
+        self._handle_error(aiohttp.ClientConnectionError(f"认证失败 (room {self.room_id}, code {code})"))
+        return False
+
+    def _has_listener(self, cmd) -> bool:
+        return cmd in self._events
+
+    def _wanted_cmds(self) -> set:
+        return set(self._events)
+
+    def _filtered_out(self, cmd) -> bool:
+        """cmd 只有带条件的 handler, 且只看 room_id 条件就都不会命中时返回 True, 其他条件在创建 ctx 之后判断"""
+        return rejects_room(self, cmd, getattr(self, "real_room_id", None) or self.room_id)
+
+    def _listeners_for(self, cmd) -> list:
+        return self.listeners(cmd)
+
+    def _handle_error(self, error):
+        if self._has_listener("error"):
+            self.emit("error", error)
+        else:
+            asyncio.get_event_loop().call_exception_handler(
+                {"message": "unhandled error in blive handler", "exception": error}
+            )
+
+    def _iter_ctxs(self, data):
+        if self.publisher is not None:
+            packages = self.packman.unpack_raw(data)
+            self.publisher.publish(getattr(self, "real_room_id", None) or self.room_id, packages)
+            return self._ctxs_from_packages(packages)
+        if len(data) > self.streaming_threshold:
+            return self._ctxs_from_packages(self.packman.iter_unpack_raw(data))
+        return self._ctxs_from_packages(self.packman.unpack_raw(data))
+
+    def _ctxs_from_packages(self, packages):
+        for header, payload in packages:
+            # 先从原始数据中取出 cmd, 没有 handler 监听的消息直接跳过, 不做 json 解析
+            cmd = peek_cmd(payload)
+            if cmd is not None and (not self._has_listener(cmd) or self._filtered_out(cmd)):
+                continue
+            body = None
+            if cmd is not None and self.typed_decoder is not None:
+                body = self.typed_decoder.decode(cmd, payload)
+            ctx = BLiverCtx(self, (header, payload), body=body)
+            cmd = ctx.body.get("cmd", None)
+            if cmd and not self._is_duplicate(cmd, ctx.body):
+                yield cmd, ctx
+
+    def _is_duplicate(self, cmd, body):
+        if self.dedup is None:
+            return False
+        return self.dedup.is_duplicate(getattr(self, "real_room_id", None) or self.room_id, cmd, body)
+
+    def _handle_frame(self, data):
+        for cmd, ctx in self._iter_ctxs(data):
+            self.emit(cmd, ctx)
+
+    def _ctxs_from_bodies(self, bodies):
+        for header, body in bodies:
+            cmd = body.get("cmd", None) if isinstance(body, dict) else None
+            if cmd and self._has_listener(cmd) and not self._is_duplicate(cmd, body):
+                yield cmd, BLiverCtx(self, (header, None), body=body)
+
+    async def _dispatch_frame(self, data):
+        # 发布到共享内存时需要在事件循环中拿到拆好的包, 不使用 offloader
+        if self.offloader is not None and self.publisher is None and self.offloader.accepts(data):
+            ctxs = await self.offloader.unpack(self, data)
+        elif self.dispatcher is None:
+            self._handle_frame(data)
+            return
+        else:
+            ctxs = self._iter_ctxs(data)
+
+        if self.dispatcher is None:
+            for cmd, ctx in ctxs:
+                self.emit(cmd, ctx)
+        else:
+            for cmd, ctx in ctxs:
+                await self.dispatcher.put(self, cmd, ctx)
+
+    def _create_scheduler(self):
+        return AsyncIOScheduler(timezone="Asia/Shanghai")
+
+    def _start_heartbeat(self):
+        # 开始30s发送心跳包的定时任务
+        self.scheduler.add_job(self.heartbeat, trigger="interval", seconds=self.heartbeat_interval)
+        self.scheduler.start()
+
+    def _stop_heartbeat(self):
+        if self.scheduler.running:
+            self.scheduler.shutdown()
 
     async def graceful_close(self):
         self.running = False
-        self.scheduler.shutdown()
-        await self.aio_session.close()
-        await self.ws.close()
+        self._stop_heartbeat()
+        if self._own_session:
+            await self.aio_session.close()
+        if self.ws is not None:
+            await self.ws.close()
+        if self.dispatcher is not None and self._own_dispatcher:
+            await self.dispatcher.close()
+        await asyncio.gather(*[b.close() for b in self._batchers])
+        if self.resolver is not None:
+            await self.resolver.flush()
 
     def run(self):
         loop = asyncio.get_event_loop()
@@ -0,0 +1,251 @@
+"""
+声明式的 handler 过滤条件
+
+    @app.on(Events.DANMU_MSG, uid={1, 2, 3})  # 只处理这几个用户的弹幕
+    async def watch(ctx):
+        ...
+
+    @app.on(Events.SUPER_CHAT_MESSAGE, price=Ge(100), medal_level=Ge(20))
+    async def big_sc(ctx):
+        ...
+
+条件的写法: set / list / tuple 为 "在其中", 其他普通值为 "等于", Ge / Gt / Le / Lt / Ne 为比较, 函数为自定义判断.
+可以使用的字段见 FIELDS (与 blive.rows 的列相同, 另有 room_id 和 medal_anchor_id)
+
+同一 cmd 的所有带条件的 handler 由一个 listener 统一判断: "等于" / "在其中" 条件按字段建立哈希索引,
+每条消息每个字段只取一次值, 查一次索引, 不满足条件的 handler 不会被调用 (也不会为其创建 task).
+某个 cmd 只有带条件的 handler, 且按 room_id 条件没有一个能命中当前房间时, 消息在解析 json 之前就被跳过
+"""
+import asyncio
+import inspect
+
+from .core import Events
+from .rows import COLUMNS
+
+
+class Predicate:
+    __slots__ = ("value",)
+
+    def __init__(self, value) -> None:
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.value!r})"
+
+
+class Eq(Predicate):
+    __slots__ = ()
+
+    def __call__(self, v):
+        return v == self.value
+
+
+class Ne(Predicate):
+    __slots__ = ()
+
+    def __call__(self, v):
+        return v != self.value
+
+
+class In(Predicate):
+    __slots__ = ()
+
+    def __init__(self, values) -> None:
+        super().__init__(frozenset(values))
+
+    def __call__(self, v):
+        return v in self.value
+
+
+class Ge(Predicate):
+    __slots__ = ()
+
+    def __call__(self, v):
+        return v is not None and v >= self.value
+
+
+class Gt(Predicate):
+    __slots__ = ()
+
+    def __call__(self, v):
+        return v is not None and v > self.value
+
+
+class Le(Predicate):
+    __slots__ = ()
+
+    def __call__(self, v):
+        return v is not None and v <= self.value
+
+
+class Lt(Predicate):
+    __slots__ = ()
+
+    def __call__(self, v):
+        return v is not None and v < self.value
+
+
+def as_predicate(cond):
+    if isinstance(cond, Predicate) or callable(cond):
+        return cond
+    if isinstance(cond, (set, frozenset, list, tuple)):
+        return In(cond)
+    return Eq(cond)
+
+
+def _safe(getter):
+    def get(msg):
+        try:
+            return getter(msg)
+        except (TypeError, KeyError, IndexError, AttributeError):
+            return None
+
+    return get
+
+
+_MEDAL_ANCHOR = {
+    Events.DANMU_MSG: lambda m: m.body["info"][3][12],
+    Events.SEND_GIFT: lambda m: m.chain_get("data.medal_info.target_id"),
+    Events.SUPER_CHAT_MESSAGE: lambda m: m.chain_get("data.medal_info.target_id"),
+    Events.INTERACT_WORD: lambda m: m.chain_get("data.fans_medal.target_id"),
+}
+
+# cmd -> {字段名: 从消息操作类对象取值的函数}
+FIELDS = {
+    cmd: dict(
+        {c.name: _safe(c.getter) for c in columns},
+        **({"medal_anchor_id": _safe(_MEDAL_ANCHOR[cmd])} if cmd in _MEDAL_ANCHOR else {}),
+    )
+    for cmd, columns in COLUMNS.items()
+}
+
+
+class _Entry:
+    __slots__ = ("seq", "handler", "predicates")
+
+    def __init__(self, seq, handler, predicates) -> None:
+        self.seq = seq
+        self.handler = handler
+        self.predicates = predicates  # [(field, predicate)]
+
+
+class FilterIndex:
+    """一个 cmd 的所有带条件的 handler"""
+
+    def __init__(self, cmd, on_error=None) -> None:
+        if cmd not in FIELDS:
+            raise ValueError(f"filters are not supported for {cmd}, supported: {', '.join(FIELDS)}")
+        self.cmd = cmd
+        self.fields = FIELDS[cmd]
+        self.on_error = on_error or self._default_error
+        self.index = {}  # field -> {value: [_Entry]}
+        self.scan = []  # 没有可索引条件的 _Entry
+        self.room_conds = []  # 每个 handler 的 room_id 条件, 用于在解析消息之前判断
+        self._room_cache = {}  # room_id -> may_match 的结果
+        self.seq = 0
+
+    @staticmethod
+    def _default_error(error):
+        asyncio.get_event_loop().call_exception_handler(
+            {"message": "unhandled error in blive handler", "exception": error}
+        )
+
+    def _get(self, field, ctx, values):
+        if field == "room_id":
+            bliver = ctx.bliver
+            return getattr(bliver, "real_room_id", None) or bliver.room_id
+        v = values.get(field, values)
+        if v is values:
+            v = values[field] = self.fields[field](ctx.message)
+        return v
+
+    def add(self, handler, filters: dict):
+        predicates = []
+        for field, cond in filters.items():
+            if field != "room_id" and field not in self.fields:
+                raise ValueError(f"unknown field {field!r} for {self.cmd}, available: room_id, {', '.join(self.fields)}")
+            predicates.append((field, as_predicate(cond)))
+        self.seq += 1
+        self.room_conds.append([pred for field, pred in predicates if field == "room_id"])
+        self._room_cache.clear()
+        # 优先用 "等于" / "在其中" 条件建立索引, 其余条件在索引命中后再判断
+        for i, (field, pred) in enumerate(predicates):
+            if isinstance(pred, (Eq, In)):
+                keys = pred.value if isinstance(pred, In) else (pred.value,)
+                entry = _Entry(self.seq, handler, predicates[:i] + predicates[i + 1 :])
+                table = self.index.setdefault(field, {})
+                for key in keys:
+                    table.setdefault(key, []).append(entry)
+                return
+        self.scan.append(_Entry(self.seq, handler, predicates))
+
+    def may_match(self, room_id) -> bool:
+        """只看 room_id 条件, 是否有 handler 可能命中该房间的消息"""
+        result = self._room_cache.get(room_id)
+        if result is None:
+            result = self._room_cache[room_id] = any(
+                all(pred(room_id) for pred in conds) for conds in self.room_conds
+            )
+        return result
+
+    def match(self, ctx) -> list:
+        """返回满足条件的 handler, 按注册顺序排列"""
+        values = {}
+        matched = []
+        for field, table in self.index.items():
+            candidates = table.get(self._get(field, ctx, values))
+            if candidates:
+                matched.extend(e for e in candidates if self._check(e, ctx, values))
+        matched.extend(e for e in self.scan if self._check(e, ctx, values))
+        if len(matched) > 1:
+            matched.sort(key=lambda e: e.seq)
+        return [e.handler for e in matched]
+
+    def _check(self, entry, ctx, values):
+        for field, pred in entry.predicates:
+            if not pred(self._get(field, ctx, values)):
+                return False
+        return True
+
+    def __call__(self, ctx):
+        """作为普通 listener 注册, 有协程 handler 命中时返回一个协程 (由 emitter / 分发队列等待)"""
+        coros = []
+        for handler in self.match(ctx):
+            try:
+                ret = handler(ctx)
+                if inspect.isawaitable(ret):
+                    coros.append(ret)
+            except Exception as e:
+                self.on_error(e)
+        if coros:
+            return self._await_all(coros)
+
+    async def _await_all(self, coros):
+        for ret in await asyncio.gather(*coros, return_exceptions=True):
+            if isinstance(ret, Exception):
+                self.on_error(ret)
+
+
+def rejects_room(emitter, cmd, room_id) -> bool:
+    """emitter 上 cmd 的 listener 只有 FilterIndex, 且按 room_id 条件都不会命中该房间时返回 True"""
+    listeners = emitter._events.get(cmd)
+    if not listeners:
+        return True
+    index = emitter._filter_indexes.get(cmd)
+    if index is None or len(listeners) > 1:
+        return False
+    return not index.may_match(room_id)
+
+
+def on_filtered(emitter, event, f, filters, on_error=None):
+    """为 emitter 注册带条件的 handler, 用法同 emitter.on"""
+    index = emitter._filter_indexes.get(event)
+    if index is None:
+        index = emitter._filter_indexes[event] = FilterIndex(event, on_error=on_error)
+        emitter.add_listener(event, index)
+
+    def _on(f):
+        index.add(f, filters)
+        return f
+
+    return _on if f is None else _on(f)
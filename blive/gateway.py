@@ -0,0 +1,301 @@
+"""
+弹幕转发网关: 每个房间只连接一次服务器, 通过 websocket / SSE 把消息转发给任意数量的客户端 (例如浏览器叠加层)
+
+    gateway = Gateway(cmds=[Events.DANMU_MSG, Events.SEND_GIFT, Events.SUPER_CHAT_MESSAGE])
+    gateway.run(port=8080)
+
+    // 浏览器
+    const ws = new WebSocket("ws://127.0.0.1:8080/ws?rooms=510,605&cmds=DANMU_MSG")
+    ws.onmessage = (e) => JSON.parse(e.data).forEach(({room_id, data}) => ...)
+    const sse = new EventSource("http://127.0.0.1:8080/sse?rooms=510")
+
+订阅相同 (房间, cmd) 的客户端属于同一组, 每组每批消息只拼接一次 json, 再发送给组内所有客户端.
+每个数据帧是一个 json 数组, 元素为 {"room_id": 房间号, "data": 原始消息}.
+客户端连接的发送缓冲区超过 max_buffer 字节时直接断开, 不为慢客户端无限缓存
+"""
+import asyncio
+
+from aiohttp import WSCloseCode, web
+
+from .batch import Batcher
+from .codec import get_codec
+from .core import Events
+from .hub import BLiveHub
+
+# 叠加层常用的消息, 客户端不指定 cmds 时订阅这些
+DEFAULT_CMDS = (
+    Events.DANMU_MSG,
+    Events.SEND_GIFT,
+    Events.COMBO_SEND,
+    Events.SUPER_CHAT_MESSAGE,
+    Events.GUARD_BUY,
+    Events.INTERACT_WORD,
+    Events.LIVE,
+    Events.PREPARING,
+)
+
+_SSE_PING = b": ping\n\n"
+
+
+def _cmd_name(cmd) -> str:
+    return getattr(cmd, "value", cmd)
+
+
+class _Group:
+    """订阅相同房间和 cmd 的客户端"""
+
+    def __init__(self, gateway: "Gateway", key) -> None:
+        self.gateway = gateway
+        self.key = key
+        self.ws_clients = {}  # WebSocketResponse -> transport
+        self.sse_clients = {}  # StreamResponse -> transport
+        self.batcher = Batcher(self._send, max_size=gateway.batch_size, max_delay=gateway.batch_delay)
+
+    def __len__(self):
+        return len(self.ws_clients) + len(self.sse_clients)
+
+    async def _send(self, items):
+        payload = b"[" + b",".join(items) + b"]"
+        gateway = self.gateway
+        gateway.frames += 1
+        sends = []
+        if self.ws_clients:
+            text = payload.decode()
+            sends.extend((ws.send_str, text, transport) for ws, transport in self.ws_clients.items())
+        if self.sse_clients:
+            event = b"data: " + payload + b"\n\n"
+            sends.extend((resp.write, event, transport) for resp, transport in self.sse_clients.items())
+        # 发送后缓冲区仍低于 high-water 时不会等待 drain, 逐个发送; 其余的客户端并发等待, 不阻塞同组的其他客户端
+        blocking = []
+        for send, data, transport in sends:
+            if transport is not None and transport.get_write_buffer_size() + len(data) > gateway._high_water:
+                blocking.append(gateway._send(send, data, transport))
+            else:
+                await gateway._send(send, data, transport)
+        if blocking:
+            await asyncio.gather(*blocking)
+
+
+class Gateway:
+    """
+    hub: 接收消息的 BLiveHub (也可以是 blive.shmring.RingSubscriber), 默认新建一个
+    cmds: 允许订阅的 cmd, 客户端不指定时订阅全部
+    batch_size / batch_delay: 每个数据帧最多的消息数 / 第一条消息最多等待的秒数
+    max_buffer: 单个客户端发送缓冲区的上限 (字节), 超过时断开该客户端
+    max_rooms: 单个客户端最多订阅的房间数
+    room_linger: 房间没有客户端订阅后, 再等待多少秒断开该房间, 避免叠加层刷新时反复连接
+    manage_rooms: 是否按客户端的订阅添加 / 移除 hub 中的房间, hub 自己管理房间时设为 False
+    keepalive: SSE 连接发送注释行的间隔 (秒), 同时用于发现已断开的 SSE 客户端
+    heartbeat: websocket 连接的 ping 间隔 (秒)
+    """
+
+    def __init__(
+        self,
+        hub: BLiveHub = None,
+        cmds=DEFAULT_CMDS,
+        batch_size=200,
+        batch_delay=0.05,
+        max_buffer=1024 * 1024,
+        max_rooms=16,
+        room_linger=60.0,
+        manage_rooms=True,
+        keepalive=15.0,
+        heartbeat=30.0,
+    ) -> None:
+        self.hub = hub if hub is not None else BLiveHub()
+        self.cmds = frozenset(_cmd_name(cmd) for cmd in cmds)
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_buffer = max_buffer
+        self.max_rooms = max_rooms
+        self.room_linger = room_linger
+        self.manage_rooms = manage_rooms
+        self.keepalive = keepalive
+        self.heartbeat = heartbeat
+        self.codec = get_codec(self.hub.codec)
+        self.groups = {}  # (rooms, cmds) -> _Group
+        self.routes = {}  # (room_id, cmd) -> {_Group}
+        self.room_refs = {}  # room_id -> 订阅该房间的组数
+        self._linger_timers = {}
+        # 慢客户端由 max_buffer 判断, 连接的 high-water 设得更高, 正常的客户端发送时不用等待 drain
+        self._high_water = 2 * max(max_buffer, 64 * 1024)
+        self._closing = None  # asyncio.Event, 在事件循环中第一次使用时创建
+        self.messages = 0  # 转发的消息数 (每条消息只计一次)
+        self.frames = 0  # 编码的数据帧数
+        self.slow_clients = 0  # 因为发送缓冲区超限被断开的客户端数
+        for cmd in self.cmds:
+            self.hub.on(cmd, self._listener(cmd))
+
+    def _listener(self, cmd):
+        def listener(ctx):
+            room_id = ctx.bliver.room_id
+            groups = self.routes.get((room_id, cmd))
+            if not groups:
+                return
+            payload = ctx.msg[1]
+            if payload is None:  # 在进程池中解析的消息没有原始数据
+                payload = self.codec.dumps(ctx.body)
+            item = b'{"room_id":%d,"data":%b}' % (room_id, payload)
+            self.messages += 1
+            for group in groups:
+                group.batcher.add(item)
+
+        return listener
+
+    async def _send(self, send, data, transport):
+        """发送前检查连接的发送缓冲区, 超过 max_buffer 时断开该客户端"""
+        if transport is None or transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > self.max_buffer:
+            self.slow_clients += 1
+            transport.abort()
+            return
+        try:
+            await send(data)
+        except ConnectionError:
+            pass  # 客户端已断开, 由 handle_ws / handle_sse 清理
+
+    def _closing_event(self) -> asyncio.Event:
+        if self._closing is None:
+            self._closing = asyncio.Event()
+        return self._closing
+
+    def _parse(self, request):
+        """从 ?rooms=510,605&cmds=DANMU_MSG,SEND_GIFT 中取出订阅的 (房间, cmd)"""
+        try:
+            rooms = frozenset(int(r) for r in request.query.get("rooms", "").split(",") if r.strip())
+        except ValueError:
+            raise web.HTTPBadRequest(text="rooms must be comma separated room ids")
+        if not rooms or len(rooms) > self.max_rooms:
+            raise web.HTTPBadRequest(text=f"subscribe to 1 - {self.max_rooms} rooms")
+        cmds = frozenset(c for c in request.query.get("cmds", "").split(",") if c.strip()) or self.cmds
+        if not cmds <= self.cmds:
+            raise web.HTTPBadRequest(text=f"unsupported cmds: {','.join(sorted(cmds - self.cmds))}")
+        return rooms, cmds
+
+    def _join(self, key) -> _Group:
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = _Group(self, key)
+            rooms, cmds = key
+            for room_id in rooms:
+                self._acquire(room_id)
+                for cmd in cmds:
+                    self.routes.setdefault((room_id, cmd), set()).add(group)
+        return group
+
+    def _leave(self, group: _Group):
+        if len(group) or self.groups.get(group.key) is not group:
+            return
+        del self.groups[group.key]
+        group.batcher.items.clear()
+        group.batcher.flush()  # 只取消定时器, 组内已没有客户端
+        rooms, cmds = group.key
+        for room_id in rooms:
+            for cmd in cmds:
+                routes = self.routes[(room_id, cmd)]
+                routes.discard(group)
+                if not routes:
+                    del self.routes[(room_id, cmd)]
+            self._release(room_id)
+
+    def _acquire(self, room_id):
+        self.room_refs[room_id] = self.room_refs.get(room_id, 0) + 1
+        timer = self._linger_timers.pop(room_id, None)
+        if timer is not None:
+            timer.cancel()
+        if self.manage_rooms:
+            self.hub.add_room(room_id)
+
+    def _release(self, room_id):
+        self.room_refs[room_id] -= 1
+        if self.room_refs[room_id] > 0:
+            return
+        del self.room_refs[room_id]
+        if self.manage_rooms:
+            loop = asyncio.get_event_loop()
+            self._linger_timers[room_id] = loop.call_later(self.room_linger, self._drop_room, room_id)
+
+    def _drop_room(self, room_id):
+        self._linger_timers.pop(room_id, None)
+        if room_id not in self.room_refs:
+            asyncio.ensure_future(self.hub.remove_room(room_id))
+
+    async def handle_ws(self, request):
+        """websocket 客户端, 客户端发送的消息被忽略"""
+        key = self._parse(request)
+        # 不启用压缩, 所有客户端可以共用同一个数据帧
+        ws = web.WebSocketResponse(heartbeat=self.heartbeat, compress=False)
+        await ws.prepare(request)
+        request.transport.set_write_buffer_limits(high=self._high_water)
+        group = self._join(key)
+        group.ws_clients[ws] = request.transport
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            group.ws_clients.pop(ws, None)
+            self._leave(group)
+        return ws
+
+    async def handle_sse(self, request):
+        """SSE 客户端"""
+        key = self._parse(request)
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await resp.prepare(request)
+        request.transport.set_write_buffer_limits(high=self._high_water)
+        transport = request.transport
+        closing = self._closing_event()
+        group = self._join(key)
+        group.sse_clients[resp] = transport
+        try:
+            while not transport.is_closing():
+                try:
+                    await asyncio.wait_for(closing.wait(), self.keepalive)
+                    break
+                except asyncio.TimeoutError:
+                    await self._send(resp.write, _SSE_PING, transport)
+        except ConnectionError:
+            pass  # 客户端已断开
+        finally:
+            group.sse_clients.pop(resp, None)
+            self._leave(group)
+        return resp
+
+    def app(self, ws_path="/ws", sse_path="/sse") -> web.Application:
+        """返回包含 websocket 和 SSE 两个路由的 aiohttp Application"""
+        app = web.Application()
+        app.router.add_get(ws_path, self.handle_ws)
+        app.router.add_get(sse_path, self.handle_sse)
+        app.on_shutdown.append(lambda _: self.disconnect_all())
+        app.on_cleanup.append(lambda _: self.close())
+        return app
+
+    def stats(self) -> dict:
+        return {
+            "clients": sum(len(g) for g in self.groups.values()),
+            "groups": len(self.groups),
+            "rooms": len(self.room_refs),
+            "messages": self.messages,
+            "frames": self.frames,
+            "slow_clients": self.slow_clients,
+        }
+
+    async def disconnect_all(self):
+        """断开所有客户端, 在服务器关闭前调用"""
+        self._closing_event().set()
+        closes = []
+        for group in list(self.groups.values()):
+            closes.extend(ws.close(code=WSCloseCode.GOING_AWAY) for ws in list(group.ws_clients))
+        await asyncio.gather(*closes, return_exceptions=True)
+
+    async def close(self):
+        await self.disconnect_all()
+        for timer in self._linger_timers.values():
+            timer.cancel()
+        self._linger_timers.clear()
+        await asyncio.gather(*[group.batcher.close() for group in self.groups.values()])
+        await self.hub.close()
+
+    def run(self, host="0.0.0.0", port=8080):
+        web.run_app(self.app(), host=host, port=port)
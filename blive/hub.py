@@ -0,0 +1,263 @@
+"""
+多直播间管理
+
+所有直播间共用一个 aiohttp session 和一个时间轮发送心跳, handler 注册在 hub 上对所有直播间生效
+"""
+import asyncio
+import random
+from typing import Dict, Union
+
+import aiohttp
+from pyee import AsyncIOEventEmitter
+
+from .batch import on_batch
+from .core import API_HOST
+from .dispatch import BoundedDispatcher
+from .eeframework import BLiver
+from .filters import on_filtered, rejects_room
+from .timewheel import TimingWheel
+
+
+class HubRoom(BLiver):
+    """由 BLiveHub 管理的直播间, 心跳由 hub 的时间轮发送, 消息同时分发给 hub 上的 handler"""
+
+    def __init__(self, hub: "BLiveHub", room_id, **kwargs):
+        self.hub = hub
+        super().__init__(room_id, **kwargs)
+        self._own_session = False
+        self._heartbeat_timer = None
+
+    def _create_session(self):
+        return None  # 使用 hub 的 session
+
+    @property
+    def aio_session(self):
+        return self.hub.aio_session
+
+    @aio_session.setter
+    def aio_session(self, value):
+        pass  # hub 的 session 在事件循环中第一次需要时创建
+
+    def _create_scheduler(self):
+        return None  # 不创建独立的 scheduler
+
+    def _has_listener(self, cmd) -> bool:
+        return cmd in self._events or cmd in self.hub._events
+
+    def _wanted_cmds(self) -> set:
+        return set(self._events) | set(self.hub._events)
+
+    def _filtered_out(self, cmd) -> bool:
+        room_id = getattr(self, "real_room_id", None) or self.room_id
+        return rejects_room(self, cmd, room_id) and rejects_room(self.hub, cmd, room_id)
+
+    def _listeners_for(self, cmd) -> list:
+        return self.listeners(cmd) + self.hub.listeners(cmd)
+
+    def emit(self, event, *args, **kwargs) -> bool:
+        handled = False
+        if event in self._events:
+            handled = super().emit(event, *args, **kwargs)
+        return self.hub.emit(event, *args, **kwargs) or handled
+
+    def _start_heartbeat(self):
+        self._schedule_heartbeat(random.uniform(0, self.heartbeat_interval))
+
+    def _schedule_heartbeat(self, delay):
+        self._heartbeat_timer = self.hub.wheel.call_later(delay, self._heartbeat_tick)
+
+    async def _heartbeat_tick(self):
+        if not self.running:
+            return
+        jitter = self.heartbeat_interval * self.hub.heartbeat_jitter
+        self._schedule_heartbeat(self.heartbeat_interval + random.uniform(-jitter, jitter))
+        await self.heartbeat()
+
+    def _stop_heartbeat(self):
+        if self._heartbeat_timer is not None:
+            self._heartbeat_timer.cancel()
+            self._heartbeat_timer = None
+
+
+class BLiveHub(AsyncIOEventEmitter):
+    """
+    多直播间管理器
+
+    hub = BLiveHub()
+
+    @hub.on(Events.DANMU_MSG)
+    async def handler(ctx):
+        ...
+
+    hub.add_room(510)  # 在事件循环启动前添加的房间在 run() 时开始监听
+    hub.add_room(605)
+    hub.run()
+    """
+
+    def __init__(
+        self,
+        uid=0,
+        codec=None,
+        ssl=True,
+        api_host=API_HOST,
+        heartbeat_interval=30,
+        heartbeat_jitter=0.1,
+        connector_limit=0,
+        dns_cache_ttl=300,
+        recorder=None,
+        dispatcher=None,
+        offloader=None,
+        protover=1,
+        typed=False,
+        dedup=None,
+        reconnector=None,
+        resolver=None,
+        publisher=None,
+        restart_delay=1.0,
+    ):
+        super().__init__()
+        self.uid = uid
+        self.codec = codec
+        self.ssl = ssl
+        self.api_host = api_host
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_jitter = heartbeat_jitter  # 心跳间隔的随机抖动比例, 避免所有房间同时发送
+        self.connector_limit = connector_limit  # 0 为不限制连接数
+        self.dns_cache_ttl = dns_cache_ttl
+        self.recorder = recorder  # 所有房间共用一个录制文件
+        # BoundedDispatcher 实例为所有房间共用一个分发队列, 传入无参函数时为每个房间创建一个
+        self.dispatcher = dispatcher
+        self.offloader = offloader  # 所有房间共用一个解包线程池/进程池
+        self.protover = protover
+        self.typed = BLiver._create_typed_decoder(typed)  # 所有房间共用一个 TypedDecoder
+        self.dedup = dedup  # 所有房间共用一个 Deduplicator
+        # 无参函数, 为每个房间创建 Reconnector, 默认所有房间共用进程内的限速令牌桶和 getConf 缓存
+        self.reconnector = reconnector
+        self.resolver = resolver  # 所有房间共用一个 RoomResolver
+        self.publisher = publisher  # 所有房间的消息写入同一个共享内存环形缓冲区
+        self.restart_delay = restart_delay  # 房间的监听任务因异常退出后, 等待多少秒重新开始监听
+        self.aio_session: Union[None, aiohttp.ClientSession] = None
+        self.wheel = TimingWheel(tick=1.0, slots=max(2, int(heartbeat_interval * 2)))
+        self.rooms: Dict[int, HubRoom] = {}
+        self.tasks: Dict[int, asyncio.Task] = {}
+        self._batchers = []
+        self._filter_indexes = {}
+
+    def on(self, event, f=None, **filters):
+        """注册对所有直播间生效的 handler, 过滤条件见 BLiver.on"""
+        if not filters:
+            return super().on(event, f)
+        return on_filtered(self, event, f, filters)
+
+    def on_batch(self, event, f=None, max_size=500, max_delay=0.2):
+        """注册对所有直播间生效的批量 handler, 见 BLiver.on_batch"""
+        return on_batch(self, event, f, max_size=max_size, max_delay=max_delay)
+
+    def _ensure_started(self):
+        """创建共用的 session 并启动时间轮, 需要在事件循环中调用"""
+        if self.aio_session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.connector_limit,
+                limit_per_host=0,
+                ttl_dns_cache=self.dns_cache_ttl,
+                enable_cleanup_closed=True,
+            )
+            self.aio_session = aiohttp.ClientSession(connector=connector)
+        self.wheel.start()
+
+    async def add_rooms(self, room_ids) -> list:
+        """添加多个直播间, 有 resolver 时先并发解析所有房间的信息"""
+        room_ids = list(room_ids)
+        if self.resolver is not None:
+            self._ensure_started()
+            await self.resolver.resolve_many(room_ids, self.aio_session, api_host=self.api_host)
+        return [self.add_room(room_id) for room_id in room_ids]
+
+    def add_room(self, room_id) -> HubRoom:
+        """添加并开始监听一个直播间, 已存在时直接返回. 事件循环还没有运行时, 在 run() 中开始监听"""
+        if room_id in self.rooms:
+            return self.rooms[room_id]
+        room = self._create_room(room_id)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return room
+        self._start_listen(room_id, room)
+        return room
+
+    def _start_pending(self):
+        """开始监听事件循环启动前添加的房间"""
+        for room_id, room in list(self.rooms.items()):
+            if room_id not in self.tasks:
+                self._start_listen(room_id, room)
+
+    def _start_listen(self, room_id, room: HubRoom):
+        if self.rooms.get(room_id) is not room:  # 等待重启期间房间已被移除
+            return
+        self._ensure_started()
+        task = self.tasks[room_id] = asyncio.get_event_loop().create_task(room.listen())
+        task.add_done_callback(lambda t: self._on_listen_done(room_id, room, t))
+
+    def _on_listen_done(self, room_id, room: HubRoom, task: asyncio.Task):
+        """监听任务结束: 异常退出时报告错误并在 restart_delay 秒后重启, 正常结束 (房间已关闭) 时移除房间"""
+        if task.cancelled() or self.tasks.get(room_id) is not task:
+            return
+        error = task.exception()
+        if error is None:
+            self.rooms.pop(room_id, None)
+            self.tasks.pop(room_id, None)
+            return
+        room._handle_error(error)
+        room._stop_heartbeat()
+        asyncio.get_event_loop().call_later(self.restart_delay, self._start_listen, room_id, room)
+
+    def _create_room(self, room_id) -> HubRoom:
+        room = HubRoom(
+            self,
+            room_id,
+            uid=self.uid,
+            codec=self.codec,
+            ssl=self.ssl,
+            api_host=self.api_host,
+            recorder=self.recorder,
+            offloader=self.offloader,
+            protover=self.protover,
+            typed=self.typed,
+            dedup=self.dedup,
+            reconnector=self.reconnector() if self.reconnector is not None else None,
+            resolver=self.resolver,
+            publisher=self.publisher,
+        )
+        if isinstance(self.dispatcher, BoundedDispatcher):
+            room.dispatcher = self.dispatcher
+            room._own_dispatcher = False
+        elif self.dispatcher is not None:
+            room.dispatcher = self.dispatcher()
+        room.heartbeat_interval = self.heartbeat_interval
+        self.rooms[room_id] = room
+        return room
+
+    async def remove_room(self, room_id):
+        room = self.rooms.pop(room_id, None)
+        task = self.tasks.pop(room_id, None)
+        if room is not None:
+            await room.graceful_close()
+        if task is not None:
+            task.cancel()
+
+    async def close(self):
+        await asyncio.gather(*[self.remove_room(room_id) for room_id in list(self.rooms)])
+        self.wheel.stop()
+        if isinstance(self.dispatcher, BoundedDispatcher):
+            await self.dispatcher.close()
+        await asyncio.gather(*[b.close() for b in self._batchers])
+        if self.resolver is not None:
+            await self.resolver.close()
+        if self.aio_session is not None:
+            await self.aio_session.close()
+            self.aio_session = None
+
+    def run(self):
+        loop = asyncio.get_event_loop()
+        loop.call_soon(self._start_pending)
+        loop.run_forever()
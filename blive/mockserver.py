@@ -0,0 +1,291 @@
+"""
+本地模拟的 B 站直播弹幕服务器, 用于测试和性能测试, 不需要访问真实的 B 站接口
+
+实现了 getInfoByRoom, Danmu/getConf 两个接口以及 /sub websocket 的认证和心跳,
+认证后按设定的速率向每个连接推送 NORMAL/DEFLATE/BROTLI 粘包消息
+
+    python -m blive.mockserver --port 8080 --rate 200 --batch 20 --version deflate
+
+    app = BLiver(510, ssl=False, api_host="http://127.0.0.1:8080")
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import struct
+import time
+import zlib
+
+from aiohttp import web, WSMsgType
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+from .core import BLiveMsgPackage, HeaderStruct, Operation, PackageHeader, ProtocolVersion
+
+
+def _danmu(i):
+    return {
+        "cmd": "DANMU_MSG",
+        "info": [
+            [0, 1, 25, 16777215, int(time.time() * 1000), 0, 0, "", 0, 0, 0, "", 0, "{}", "{}", {}],
+            f"弹幕 {i}",
+            [i, f"用户{i}", 0, 0, 0, 10000, 1, ""],
+            [21, "小孩梓", "阿梓从小就很可爱", 510, 1725515, "", 0],
+            [12, 0, 6406234, ">50000", 0],
+            ["", ""],
+            0, 0, None, {"ts": int(time.time()), "ct": ""}, 0, 0, None, None, 0, 105,
+        ],
+    }
+
+
+def _interact_word(i):
+    return {
+        "cmd": "INTERACT_WORD",
+        "data": {
+            "fans_medal": {"medal_level": 12, "medal_name": "小孩梓", "target_id": 7706705},
+            "msg_type": 1,
+            "timestamp": int(time.time()),
+            "uid": i,
+            "uname": f"用户{i}",
+        },
+    }
+
+
+def _send_gift(i):
+    return {
+        "cmd": "SEND_GIFT",
+        "data": {
+            "action": "投喂",
+            "batch_combo_id": f"batch:gift:combo_id:{i % 50}",
+            "combo_stay_time": 3,
+            "combo_total_coin": 100,
+            "giftId": 30607,
+            "giftName": "小心心",
+            "giftType": 0,
+            "num": 1,
+            "price": 100,
+            "medal_info": {"medal_level": 21, "medal_name": "小孩梓"},
+            "tid": str(i),
+            "timestamp": int(time.time()),
+            "uid": i % 50,
+            "uname": f"用户{i % 50}",
+        },
+    }
+
+
+def _online_rank_count(i):
+    return {"cmd": "ONLINE_RANK_COUNT", "data": {"count": i % 10000}}
+
+
+# 大致按线上热门直播间的 cmd 占比循环
+_DEFAULT_FACTORIES = [_interact_word] * 9 + [_online_rank_count] * 3 + [_danmu] * 5 + [_send_gift] * 2
+
+
+def default_message_factory():
+    factories = itertools.cycle(_DEFAULT_FACTORIES)
+    counter = itertools.count()
+    return lambda: next(factories)(next(counter))
+
+
+def pack_notify(messages, version=ProtocolVersion.DEFLATE):
+    """把多条消息打包成一个 NOTIFY 数据帧"""
+
+    def package(body, version=ProtocolVersion.NORMAL):
+        size = HeaderStruct.size + len(body)
+        return HeaderStruct.pack(size, HeaderStruct.size, version, Operation.NOTIFY, 0) + body
+
+    inner = b"".join(package(json.dumps(m, ensure_ascii=False).encode("utf-8")) for m in messages)
+    if version == ProtocolVersion.DEFLATE:
+        return package(zlib.compress(inner), version)
+    if version == ProtocolVersion.BROTLI:
+        if brotli is None:
+            raise ImportError("brotli is not installed, install it with `pip install blive[brotli]`")
+        return package(brotli.compress(inner), version)
+    return inner  # NORMAL 不压缩, 客户端每帧只解析一个包, 应当每条消息单独打包
+
+
+class MockBLiveServer:
+    """
+    rate: 每个连接每秒推送的消息数, 0 为不推送
+    batch: 每个数据帧打包的消息数
+    version: 数据帧的压缩方式, None 时按客户端认证包中的 protover 选择 (3 为 brotli, 其他为 zlib)
+    message_factory: 无参函数, 每次调用返回一条消息 dict, 默认按常见 cmd 分布生成
+    api_delay: getInfoByRoom / getConf 接口的响应延迟 (秒), 用于模拟真实接口的耗时
+
+    推送的每条消息都带有 `_mock_ts` 字段 (发送时的 time.time()), 用于统计延迟
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        token="mock-token",
+        rate=0,
+        batch=10,
+        version=None,
+        message_factory=None,
+        api_delay=0.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.token = token
+        self.rate = rate
+        self.batch = batch
+        self.version = version
+        self.message_factory = message_factory or default_message_factory()
+        self.api_delay = api_delay
+        self.sent = 0  # 已推送的消息数
+        self.requests = []  # 每次接口 / websocket 请求的 (time.monotonic(), path), 用于统计请求速率
+        self.connections = set()
+        self.app = web.Application()
+        self.app.add_routes(
+            [
+                web.get("/xlive/web-room/v1/index/getInfoByRoom", self.get_info_by_room),
+                web.get("/room/v1/Danmu/getConf", self.get_conf),
+                web.get("/sub", self.sub),
+            ]
+        )
+        self._runner = None
+
+    @property
+    def api_host(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port, backlog=4096)
+        await site.start()
+        if not self.port:
+            self.port = self._runner.addresses[0][1]
+        return self
+
+    async def close(self):
+        for ws in list(self.connections):
+            await ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def get_info_by_room(self, request: web.Request):
+        self.requests.append((time.monotonic(), request.path))
+        if self.api_delay:
+            await asyncio.sleep(self.api_delay)
+        room_id = int(request.query["room_id"])
+        return web.json_response(
+            {
+                "code": 0,
+                "data": {
+                    "room_info": {"room_id": room_id},
+                    "anchor_info": {"base_info": {"uname": f"mock-{room_id}"}},
+                },
+            }
+        )
+
+    async def get_conf(self, request: web.Request):
+        self.requests.append((time.monotonic(), request.path))
+        if self.api_delay:
+            await asyncio.sleep(self.api_delay)
+        host = {"host": self.host, "port": self.port, "wss_port": self.port, "ws_port": self.port}
+        return web.json_response(
+            {"code": 0, "data": {"token": self.token, "host_server_list": [host]}}
+        )
+
+    async def sub(self, request: web.Request):
+        self.requests.append((time.monotonic(), request.path))
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        packman = BLiveMsgPackage()
+        room_id = None
+        pusher = None
+        self.connections.add(ws)
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.BINARY:
+                    continue
+                header = PackageHeader(*HeaderStruct.unpack_from(msg.data))
+                body = msg.data[header.header_size : header.package_size]
+                if header.operation == Operation.AUTH:
+                    auth = json.loads(body)
+                    if auth.get("key") != self.token:
+                        await ws.send_bytes(packman.pack({"code": -101}, Operation.AUTH_REPLY))
+                        break
+                    room_id = auth["roomid"]
+                    await ws.send_bytes(packman.pack({"code": 0}, Operation.AUTH_REPLY))
+                    version = self.version
+                    if version is None:
+                        version = ProtocolVersion.BROTLI if auth.get("protover") == 3 else ProtocolVersion.DEFLATE
+                    pusher = asyncio.ensure_future(self.push(ws, room_id, version))
+                elif header.operation == Operation.HEARTBEAT and room_id is not None:
+                    await ws.send_bytes(self.heartbeat_reply())
+        finally:
+            if pusher is not None:
+                pusher.cancel()
+            self.connections.discard(ws)
+        return ws
+
+    async def push(self, ws: web.WebSocketResponse, room_id, version):
+        if self.rate <= 0:
+            return
+        loop = asyncio.get_event_loop()
+        interval = self.batch / self.rate
+        next_at = loop.time()
+        while not ws.closed:
+            ts = time.time()
+            messages = [self.message_factory() for _ in range(self.batch)]
+            for m in messages:
+                m["_mock_ts"] = ts
+            if version == ProtocolVersion.NORMAL:
+                frames = [pack_notify([m], version) for m in messages]
+            else:
+                frames = [pack_notify(messages, version)]
+            try:
+                for frame in frames:
+                    await ws.send_bytes(frame)
+            except ConnectionError:
+                return
+            self.sent += len(messages)
+            next_at += interval
+            await asyncio.sleep(max(0, next_at - loop.time()))
+
+    def heartbeat_reply(self, popularity=1):
+        body = struct.pack("!I", popularity)
+        return HeaderStruct.pack(
+            HeaderStruct.size + len(body),
+            HeaderStruct.size,
+            ProtocolVersion.HEARTBEAT,
+            Operation.HEARTBEAT_REPLY,
+            0,
+        ) + body
+
+
+async def serve(host, port, **kwargs):
+    server = await MockBLiveServer(host, port, **kwargs).start()
+    print(f"mock server listening on {server.api_host}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="blive mock server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--rate", type=float, default=0, help="每个连接每秒推送的消息数")
+    parser.add_argument("--batch", type=int, default=10, help="每个数据帧打包的消息数")
+    parser.add_argument(
+        "--version",
+        choices=["auto", "normal", "deflate", "brotli"],
+        default="auto",
+        help="数据帧压缩方式, auto 为按客户端的 protover 选择",
+    )
+    args = parser.parse_args(argv)
+    version = None if args.version == "auto" else ProtocolVersion[args.version.upper()]
+    asyncio.run(serve(args.host, args.port, rate=args.rate, batch=args.batch, version=version))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,86 @@
 from abc import ABC
-import json
+from functools import lru_cache
 from typing import List
+from .codec import get_codec
+from .core import Events
 
 """
 消息操作封装类,目前只封装了弹幕消息操作
 """
 
 
+@lru_cache(maxsize=1024)
+def _split_chain(chain: str) -> tuple:
+    return tuple(chain.split("."))
+
+
 def dict_chain_get(dic, chain, default=None):
     if isinstance(chain, str):
-        chain = tuple(chain.split("."))
+        chain = _split_chain(chain)
 
     try:
         for k in chain:
             dic = dic[k]
         return dic
-    except (TypeError, KeyError):
+    except (TypeError, KeyError, IndexError):
         return default
 
 
+class field:
+    """
+    消息字段, 在类定义时把 "data.x.y" 形式的路径解析一次, 之后每次访问直接按路径取值
+
+    class XxxMsg(BaseMsg):
+        uid = field("data.uid")
+    """
+
+    __slots__ = ("path", "default")
+
+    def __init__(self, chain: str, default=None) -> None:
+        self.path = _split_chain(chain)
+        self.default = default
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = obj.body
+        try:
+            for k in self.path:
+                value = value[k]
+            return value
+        except (TypeError, KeyError, IndexError):
+            return self.default
+
+
+_MISSING = object()
+
+
+class memoized:
+    """只计算一次的属性, 结果缓存在消息对象上 (适用于 __slots__ 类)"""
+
+    __slots__ = ("fn", "name")
+
+    def __init__(self, fn) -> None:
+        self.fn = fn
+        self.name = fn.__name__
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        cache = obj._cache
+        if cache is None:
+            value = self.fn(obj)
+            obj._cache = {self.name: value}
+            return value
+        value = cache.get(self.name, _MISSING)
+        if value is _MISSING:
+            value = cache[self.name] = self.fn(obj)
+        return value
+
+
 class DictObject:
+    __slots__ = ()
+
     def __getitem__(self, idx):
         return getattr(self, idx)
 
@@ -31,6 +92,9 @@ class DictObject:
 
 
 class Medal(DictObject):
+    # 保留 __dict__, 可以像以前一样添加自定义属性
+    __slots__ = ("medal_name", "medal_level", "__dict__")
+
     def __init__(self, medal_name, medal_level) -> None:
         super(DictObject, self).__init__()
         self.medal_name = medal_name
@@ -38,6 +102,8 @@ class Medal(DictObject):
 
 
 class Sender(DictObject):
+    __slots__ = ("id", "name", "medal", "__dict__")
+
     def __init__(self, id, name, medal_name, medal_level) -> None:
         super(DictObject, self).__init__()
         self.id = id
@@ -46,36 +112,50 @@ class Sender(DictObject):
 
 
 class BaseMsg(ABC):
+    """
+    消息操作类的基类, 通过 body 读取消息内容
+
+    sender / gift / combo 等属性第一次访问后会被缓存, 之后修改 body 不会反映到已缓存的属性上.
+    缓存的是同一个对象: 通过 ctx.message 访问时, 同一条消息的所有 handler 拿到的是同一个 sender / gift,
+    一个 handler 对它的修改其他 handler 也能看到 (与修改 ctx.body 相同), 需要修改时先复制
+    body 可以是 dict, 也可以是 blive.schema 中的 Struct
+    """
+
+    __slots__ = ("body", "_cache", "__dict__")
+
     def __init__(self, body) -> None:
-        super().__init__()
         self.body = body
+        self._cache = None
 
     @property
     def cmd(self):
         return self.body["cmd"]
 
     def __repr__(self) -> str:
-        return json.dumps(self.body)
+        body = self.body
+        if not isinstance(body, dict):
+            body = body.to_dict()  # blive.schema 解码得到的 Struct
+        return get_codec().dumps(body).decode("utf-8")
 
     def chain_get(self, key_chain, default=None):
         return dict_chain_get(self.body, key_chain, default=default)
 
 
 class DanMuMsg(BaseMsg):
-    def __init__(self, body) -> None:
-        super(DanMuMsg, self).__init__(body)
+    __slots__ = ()
 
     @property
     def content(self):
         return self.body["info"][1]
 
-    @property
+    @memoized
     def sender(self):
+        info = self.body["info"]
         return Sender(
-            id=self.body["info"][2][0],
-            name=self.body["info"][2][1],
-            medal_name=self.body["info"][3][1] if self.body["info"][3] else "",
-            medal_level=self.body["info"][3][0] if self.body["info"][3] else 0,
+            id=info[2][0],
+            name=info[2][1],
+            medal_name=info[3][1] if info[3] else "",
+            medal_level=info[3][0] if info[3] else 0,
         )
 
     @property
@@ -84,205 +164,256 @@ class DanMuMsg(BaseMsg):
 
 
 class InteractWordMsg(BaseMsg):
-    def __init__(self, body) -> None:
-        super().__init__(body)
+    __slots__ = ()
 
-    @property
+    _uid = field("data.uid")
+    _uname = field("data.uname")
+    _medal_name = field("data.fans_medal.medal_name")
+    _medal_level = field("data.fans_medal.medal_level")
+
+    @memoized
     def user(self):
         return Sender(
-            id=dict_chain_get(self.body, "data.uid"),
-            name=dict_chain_get(self.body, "data.uname"),
-            medal_name=dict_chain_get(self.body, "data.fans_medal.medal_name"),
-            medal_level=dict_chain_get(self.body, "data.fans_medal.medal_level"),
+            id=self._uid,
+            name=self._uname,
+            medal_name=self._medal_name,
+            medal_level=self._medal_level,
         )
 
-    @property
-    def timestamp(self):
-        return dict_chain_get(self.body, "data.timestamp")
+    msg_type = field("data.msg_type")  # 1 进入直播间 2 关注 3 分享
+    timestamp = field("data.timestamp")
 
 
 class StopLiveRoomListMsg(BaseMsg):
-    def __init__(self, body) -> None:
-        super().__init__(body)
+    __slots__ = ()
 
-    @property
-    def room_id_list(self) -> List[int]:
-        return dict_chain_get(self.body, "data.room_id_list")
+    room_id_list: List[int] = field("data.room_id_list")
 
 
 class HotRankChangeV2Msg(BaseMsg):
-    def __init__(self, body) -> None:
-        super().__init__(body)
-
-    @property
-    def area_name(self):
-        return dict_chain_get(self.body, "data.area_name")
+    __slots__ = ()
 
-    @property
-    def rank_desc(self):
-        return dict_chain_get(self.body, "data.rank_desc")
-
-    @property
-    def rank(self):
-        return dict_chain_get(self.body, "data.rank")
-
-    @property
-    def trend(self):
-        return dict_chain_get(self.body, "data.trend")
-
-    @property
-    def timestamp(self):
-        return dict_chain_get(self.body, "data.timestamp")
+    area_name = field("data.area_name")
+    rank_desc = field("data.rank_desc")
+    rank = field("data.rank")
+    trend = field("data.trend")
+    timestamp = field("data.timestamp")
 
 
 class SendGiftMsg(BaseMsg):
     # TODO 礼物逻辑复杂, 考虑更复杂的封装类
-    def __init__(self, body) -> None:
-        super().__init__(body)
+    __slots__ = ()
 
-    @property
+    _uid = field("data.uid")
+    _uname = field("data.uname")
+    _medal_name = field("data.medal_info.medal_name")
+    _medal_level = field("data.medal_info.medal_level")
+
+    @memoized
     def sender(self):
         return Sender(
-            id=dict_chain_get(self.body, "data.uid"),
-            name=dict_chain_get(self.body, "data.uname"),
-            medal_name=dict_chain_get(self.body, "data.medal_info.medal_name"),
-            medal_level=dict_chain_get(self.body, "data.medal_info.medal_level"),
+            id=self._uid,
+            name=self._uname,
+            medal_name=self._medal_name,
+            medal_level=self._medal_level,
         )
 
-    @property
-    def action(self):
-        return dict_chain_get(self.body, "data.action")
+    action = field("data.action")
+    num = field("data.num")
+    price = field("data.price")  # 单价
+    coin_type = field("data.coin_type")  # gold 为付费礼物, silver 为免费礼物
+    total_coin = field("data.total_coin")
 
-    @property
+    _gift_id = field("data.giftId")
+    _gift_name = field("data.giftName")
+    _gift_type = field("data.giftType")
+
+    @memoized
     def gift(self):
         return {
-            "gift_id": dict_chain_get(self.body, "data.giftId"),
-            "gift_name": dict_chain_get(self.body, "data.giftName"),
-            "gift_type": dict_chain_get(self.body, "data.giftType"),
+            "gift_id": self._gift_id,
+            "gift_name": self._gift_name,
+            "gift_type": self._gift_type,
         }
 
-    @property
+    _batch_combo_id = field("data.batch_combo_id")
+    _batch_combo_send = field("data.batch_combo_send")
+    _combo_resources_id = field("data.combo_resources_id")
+    _combo_send = field("data.combo_send")
+    _combo_stay_time = field("data.combo_stay_time")
+    _combo_total_coin = field("data.combo_total_coin")
+
+    @memoized
     def combo(self):
         return {
-            "batch_combo_id": dict_chain_get(self.body, "data.batch_combo_id"),
-            "batch_combo_send": dict_chain_get(self.body, "data.batch_combo_send"),
-            "combo_resources_id": dict_chain_get(self.body, "data.combo_resources_id"),
-            "combo_send": dict_chain_get(self.body, "data.combo_send"),
-            "combo_stay_time": dict_chain_get(self.body, "data.combo_stay_time"),
-            "combo_total_coin": dict_chain_get(self.body, "data.combo_total_coin"),
+            "batch_combo_id": self._batch_combo_id,
+            "batch_combo_send": self._batch_combo_send,
+            "combo_resources_id": self._combo_resources_id,
+            "combo_send": self._combo_send,
+            "combo_stay_time": self._combo_stay_time,
+            "combo_total_coin": self._combo_total_coin,
         }
 
 
 class SuperChatMsg(BaseMsg):
-    def __init__(self, body) -> None:
-        super().__init__(body)
+    __slots__ = ()
 
-    @property
-    def content(self):
-        return dict_chain_get(self.body, "data.message")
+    content = field("data.message")
 
-    @property
+    _uid = field("data.uid")
+    _uname = field("data.user_info.uname")
+    _medal_name = field("data.medal_info.medal_name")
+    _medal_level = field("data.medal_info.medal_level")
+
+    @memoized
     def sender(self):
         return Sender(
-            id=dict_chain_get(self.body, "data.uid"),
-            name=dict_chain_get(self.body, "data.user_info.uname"),
-            medal_name=dict_chain_get(self.body, "data.medal_info.medal_name"),
-            medal_level=dict_chain_get(self.body, "data.medal_info.medal_level"),
+            id=self._uid,
+            name=self._uname,
+            medal_name=self._medal_name,
+            medal_level=self._medal_level,
         )
 
-    @property
-    def price(self):
-        return dict_chain_get(self.body, "data.price")
-
-    @property
-    def start_time(self):
-        return dict_chain_get(self.body, "data.start_time")
-
-    @property
-    def time(self):
-        return dict_chain_get(self.body, "data.time")
-    
-    @property  # 头像
-    def avatar_url(self):
-        return dict_chain_get(self.body, "data.user_info.face")
-
-    @property
-    def anchor_uname(self):
-        return dict_chain_get(self.body, "data.medal_info.anchor_uname")
-
-    @property  # 背景色
-    def color(self):
-        return dict_chain_get(self.body, "data.background_bottom_color")
-
+    price = field("data.price")
+    start_time = field("data.start_time")
+    time = field("data.time")
+    avatar_url = field("data.user_info.face")  # 头像
+    anchor_uname = field("data.medal_info.anchor_uname")
+    color = field("data.background_bottom_color")  # 背景色
 
 
 class EntryEffectMsg(BaseMsg):
-    def __init__(self, body) -> None:
-        super().__init__(body)
+    __slots__ = ()
 
-    @property
-    def uid(self):
-        return dict_chain_get(self.body, "data.uid")
+    uid = field("data.uid")
+    face = field("data.face")
+    copy_writting = field("data.copy_writing")
+    web_basemap_url = field("data.web_basemap_url")
+    basemap_url = field("data.basemap_url")
 
-    @property
-    def face(self):
-        return dict_chain_get(self.body, "data.face")
 
-    @property
-    def copy_writting(self):
-        return dict_chain_get(self.body, "data.copy_writing")
+class LiveInteractiveGameMsg(BaseMsg):
+    __slots__ = ()
+
+    uid = field("data.uid")
+    uname = field("data.uname")
+    uface = field("data.uface")
+    fans_medal_level = field("data.fans_medal_level")
+    guard_level = field("data.guard_level")
+
+    _gift_id = field("data.gift_id")
+    _gift_name = field("data.gift_name")
+    _gift_num = field("data.gift_num")
+    _price = field("data.price")
+    _paid = field("data.paid")
+    _timestamp = field("data.timestamp")
+
+    @memoized
+    def gift(self):
+        return {
+            "gift_id": self._gift_id,
+            "gift_name": self._gift_name,
+            "gift_num": self._gift_num,
+            "price": self._price,
+            "paid": self._paid,
+        }
 
-    @property
-    def web_basemap_url(self):
-        return dict_chain_get(self.body, "data.web_basemap_url")
+    def timestamp(self):
+        return self._timestamp
 
-    @property
-    def basemap_url(self):
-        return dict_chain_get(self.body, "data.basemap_url")
 
+class OnlineRankCountMsg(BaseMsg):
+    __slots__ = ()
 
-class LiveInteractiveGameMsg(BaseMsg):
-    def __init__(self, body) -> None:
-        super().__init__(body)
+    count = field("data.count")
 
-    @property
-    def uid(self):
-        return dict_chain_get(self.body, "data.uid")
 
-    @property
-    def uname(self):
-        return dict_chain_get(self.body, "data.uname")
+class GuardBuyMsg(BaseMsg):
+    __slots__ = ()
 
-    @property
-    def uface(self):
-        return dict_chain_get(self.body, "data.uface")
+    _uid = field("data.uid")
+    _uname = field("data.username")
 
-    @property
-    def fans_medal_level(self):
-        return dict_chain_get(self.body, "data.fans_medal_level")
+    @memoized
+    def user(self):
+        return Sender(id=self._uid, name=self._uname, medal_name="", medal_level=0)
 
-    @property
-    def guard_level(self):
-        return dict_chain_get(self.body, "data.guard_level")
+    guard_level = field("data.guard_level")  # 1 总督 2 提督 3 舰长
+    num = field("data.num")
+    price = field("data.price")
+    gift_id = field("data.gift_id")
+    gift_name = field("data.gift_name")
+    start_time = field("data.start_time")
+    end_time = field("data.end_time")
 
-    @property
-    def gift(self):
-        return {
-            "gift_id": dict_chain_get(self.body, "data.gift_id"),
-            "gift_name": dict_chain_get(self.body, "data.gift_name"),
-            "gift_num": dict_chain_get(self.body, "data.gift_num"),
-            "price": dict_chain_get(self.body, "data.price"),
-            "paid": dict_chain_get(self.body, "data.paid"),
-        }
 
-    def timestamp(self):
-        return dict_chain_get(self.body, "data.timestamp")
+class ComboSendMsg(BaseMsg):
+    __slots__ = ()
 
+    _uid = field("data.uid")
+    _uname = field("data.uname")
+    _medal_name = field("data.medal_info.medal_name")
+    _medal_level = field("data.medal_info.medal_level")
 
-class OnlineRankCountMsg(BaseMsg):
-    def __init__(self, body) -> None:
-        super().__init__(body)
+    @memoized
+    def sender(self):
+        return Sender(
+            id=self._uid,
+            name=self._uname,
+            medal_name=self._medal_name,
+            medal_level=self._medal_level,
+        )
 
-    @property
-    def count(self):
-        return dict_chain_get(self.body, "data.count")
+    action = field("data.action")
+    gift_id = field("data.gift_id")
+    gift_name = field("data.gift_name")
+    gift_num = field("data.gift_num")
+    combo_id = field("data.combo_id")
+    combo_num = field("data.combo_num")
+    batch_combo_id = field("data.batch_combo_id")
+    batch_combo_num = field("data.batch_combo_num")
+    total_num = field("data.total_num")
+    combo_total_coin = field("data.combo_total_coin")
+
+
+# cmd -> 消息操作类, BLiverCtx.message 按此创建消息对象
+_MSG_CLASSES = {}
+
+
+def register_msg_class(cmd, cls=None):
+    """
+    注册 cmd 对应的消息操作类, 可以作为装饰器使用
+
+    @register_msg_class(Events.GUARD_BUY)
+    class MyGuardBuyMsg(BaseMsg):
+        ...
+    """
+    if cls is None:
+        return lambda cls: register_msg_class(cmd, cls)
+    _MSG_CLASSES[cmd] = cls
+    return cls
+
+
+def msg_class_for(cmd):
+    """返回 cmd 对应的消息操作类, 没有注册时返回 BaseMsg. 带参数的 cmd (例如 "DANMU_MSG:4:0:2:2:2:0") 按 ":" 前的部分查找"""
+    cls = _MSG_CLASSES.get(cmd)
+    if cls is None and cmd:
+        cls = _MSG_CLASSES.get(cmd.split(":", 1)[0])
+    return cls or BaseMsg
+
+
+for _cmd, _cls in (
+    (Events.DANMU_MSG, DanMuMsg),
+    (Events.INTERACT_WORD, InteractWordMsg),
+    (Events.STOP_LIVE_ROOM_LIST, StopLiveRoomListMsg),
+    (Events.HOT_RANK_CHANGED_V2, HotRankChangeV2Msg),
+    (Events.SEND_GIFT, SendGiftMsg),
+    (Events.SUPER_CHAT_MESSAGE, SuperChatMsg),
+    (Events.ENTRY_EFFECT, EntryEffectMsg),
+    (Events.LIVE_INTERACTIVE_GAME, LiveInteractiveGameMsg),
+    (Events.ONLINE_RANK_COUNT, OnlineRankCountMsg),
+    (Events.GUARD_BUY, GuardBuyMsg),
+    (Events.COMBO_SEND, ComboSendMsg),
+):
+    register_msg_class(_cmd, _cls)
+del _cmd, _cls
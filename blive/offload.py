@@ -0,0 +1,68 @@
+"""
+把大数据帧的解压, 拆包 (以及可选的 json 解析) 放到线程池/进程池中执行, 避免阻塞事件循环
+
+    # 线程池: 解压和拆包在线程中执行 (zlib/brotli 解压时会释放 GIL)
+    app = BLiver(510, offloader=FrameOffloader(threshold=32 * 1024))
+
+    # 进程池: 解压, 拆包和 json 解析都在子进程中执行, 适合解析负载重的场景
+    app = BLiver(510, offloader=FrameOffloader(ProcessPoolExecutor(4), parse=True))
+
+小于 threshold 的数据帧仍然在事件循环中直接处理. 同一个房间的数据帧按接收顺序处理完才会读取下一帧, 顺序不会乱
+"""
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Union
+
+from .codec import get_codec
+from .core import BLiveMsgPackage, peek_cmd
+
+_packman = BLiveMsgPackage()
+
+
+def unpack_frame(data, wanted=None, codec=None):
+    """
+    在 executor 中执行的解包函数, 返回 [(header, body)]
+
+    wanted: 需要解析的 cmd 集合, 其他 cmd 的消息直接跳过, None 为全部解析
+    """
+    json_codec = get_codec(codec)
+    bodies = []
+    for header, payload in _packman.unpack_raw(data):
+        cmd = peek_cmd(payload)
+        if cmd is not None and wanted is not None and cmd not in wanted:
+            continue
+        bodies.append((header, json_codec.loads(payload)))
+    return bodies
+
+
+class FrameOffloader:
+    """
+    executor: 执行解包的 executor, 默认为单线程的 ThreadPoolExecutor
+    threshold: 数据帧 (压缩后) 大于该字节数时才交给 executor 处理
+    parse: True 时在 executor 中同时完成 json 解析, 使用进程池时建议开启
+    """
+
+    def __init__(self, executor: Union[Executor, None] = None, threshold=64 * 1024, parse=False) -> None:
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="blive-unpack")
+        self.threshold = threshold
+        self.parse = parse
+        self.offloaded = 0  # 交给 executor 处理的数据帧数
+
+    def accepts(self, data) -> bool:
+        return len(data) > self.threshold
+
+    async def unpack(self, bliver, data):
+        """在 executor 中解包, 返回 bliver 可以直接分发的 [(cmd, ctx)]"""
+        loop = asyncio.get_event_loop()
+        self.offloaded += 1
+        if self.parse:
+            wanted = frozenset(bliver._wanted_cmds())
+            bodies = await loop.run_in_executor(
+                self.executor, unpack_frame, bytes(data), wanted, bliver.codec.name
+            )
+            return list(bliver._ctxs_from_bodies(bodies))
+        packages = await loop.run_in_executor(self.executor, bliver.packman.unpack_raw, data)
+        return list(bliver._ctxs_from_packages(packages))
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
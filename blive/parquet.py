@@ -0,0 +1,256 @@
+"""
+把弹幕, 礼物, sc 等消息按列存储为 Parquet 文件 (需要安装 pyarrow)
+
+文件按 cmd, 房间和小时 (UTC) 分区, 可以直接用 pyarrow.dataset / duckdb / spark 读取:
+
+    root/DANMU_MSG/room_id=510/date=2022-05-22/hour=20/part-xxx.parquet
+
+在线写入: 消息在事件循环中只提取为一行 tuple, 转换为 Arrow 列和写文件都在单独的线程中执行
+
+    sink = ParquetSink("data")
+    sink.attach(app)  # BLiver 或 BLiveHub
+    ...
+    await sink.close()
+
+离线转换录制文件 (见 blive.record), 每个录制文件交给一个子进程处理:
+
+    python -m blive.parquet data frames.*.rec --workers 4
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError as e:  # pragma: no cover
+    raise ImportError("blive.parquet requires pyarrow, install it with `pip install blive[parquet]`") from e
+
+from .codec import get_codec
+from .core import BLiveMsgPackage, peek_cmd
+from .msg import msg_class_for
+from .record import ReplaySource, iter_records
+from .rows import COLUMNS, columns_for, extract_row
+
+_ARROW_TYPES = {"int": pa.int64(), "str": pa.string(), "timestamp": pa.timestamp("ms", tz="UTC")}
+
+
+def schema_for(cmd) -> pa.Schema:
+    """cmd 对应的 Parquet 文件 schema, room_id 在分区路径中, 不写入文件"""
+    return pa.schema([pa.field(c.name, _ARROW_TYPES[c.type]) for c in columns_for(cmd)[1:]])
+
+
+def _hour(ts) -> int:
+    return int(ts // 3600)
+
+
+class PartitionWriter:
+    """
+    按 (cmd, room_id, hour) 分区写入 Parquet 文件, 每次 write 写入一个 row group. 不是线程安全的
+
+    prefix: 文件名前缀, 用于区分不同进程/不同来源写入的文件
+    max_open: 最多同时打开的文件数, 超过时关闭最久没有写入的文件, 该分区之后的数据写入新文件
+    """
+
+    chunk_rows = 1024
+
+    def __init__(self, root, prefix=None, compression="zstd", max_open=64) -> None:
+        self.root = root
+        self.prefix = prefix or f"{int(time.time())}-{os.getpid()}"
+        self.compression = compression
+        self.max_open = max_open
+        self.writers = {}  # key -> ParquetWriter, 按最近写入的顺序排列
+        self.rows = 0  # 已写入的行数
+        self.files = 0  # 已创建的文件数
+
+    def path_for(self, key):
+        cmd, room_id, hour = key
+        t = time.gmtime(hour * 3600)
+        return os.path.join(
+            self.root,
+            cmd,
+            f"room_id={room_id}",
+            f"date={time.strftime('%Y-%m-%d', t)}",
+            f"hour={t.tm_hour:02d}",
+            f"part-{self.prefix}-{self.files:04d}.parquet",
+        )
+
+    def _to_batch(self, schema, rows):
+        columns = list(zip(*rows))[1:]  # 去掉 room_id
+        columns[0] = [int(ts * 1000) for ts in columns[0]]
+        return pa.RecordBatch.from_arrays(
+            [pa.array(values, type=f.type) for values, f in zip(columns, schema)], schema=schema
+        )
+
+    def write(self, key, rows):
+        schema = schema_for(key[0])
+        # pa.array 转换 python 对象时不释放 GIL, 分块转换使事件循环线程有机会拿到 GIL
+        table = pa.Table.from_batches(
+            [self._to_batch(schema, rows[i : i + self.chunk_rows]) for i in range(0, len(rows), self.chunk_rows)],
+            schema=schema,
+        )
+        writer = self.writers.pop(key, None)
+        if writer is None:
+            while len(self.writers) >= self.max_open:
+                self.writers.pop(next(iter(self.writers))).close()
+            path = self.path_for(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            writer = pq.ParquetWriter(path, schema, compression=self.compression)
+            self.files += 1
+        self.writers[key] = writer
+        writer.write_table(table, row_group_size=len(rows))
+        self.rows += len(rows)
+
+    def close_before(self, hour):
+        """关闭 hour 之前的所有分区文件"""
+        for key in [k for k in self.writers if k[2] < hour]:
+            self.writers.pop(key).close()
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+
+
+class ParquetSink:
+    """
+    root: 输出目录
+    cmds: 需要保存的 cmd, 默认为 blive.rows.COLUMNS 中的全部 cmd
+    max_rows: 单个分区攒够该行数时写入一个 row group
+    flush_interval: 最多每隔多少秒写入一次, 同时关闭已经过去的小时的文件
+    max_open: 最多同时打开的文件数, 见 PartitionWriter
+    """
+
+    def __init__(
+        self, root, cmds=None, max_rows=10000, flush_interval=60.0, compression="zstd", max_open=64
+    ) -> None:
+        self.cmds = list(COLUMNS) if cmds is None else list(cmds)
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.writer = PartitionWriter(root, compression=compression, max_open=max_open)
+        # PartitionWriter 不是线程安全的, 所有写入都在同一个线程中执行
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="blive-parquet")
+        self.buffers = {}  # (cmd, room_id, hour) -> [row]
+        self.pending = set()  # 正在执行的写入
+        self._timer = None
+
+    def attach(self, emitter):
+        """在 BLiver 或 BLiveHub 上注册 listener"""
+        for cmd in self.cmds:
+            emitter.on(cmd, self._listener(cmd))
+        return emitter
+
+    def _listener(self, cmd):
+        def listener(ctx):
+            bliver = ctx.bliver
+            self.add(cmd, getattr(bliver, "real_room_id", None) or bliver.room_id, ctx.message)
+
+        return listener
+
+    def add(self, cmd, room_id, msg, ts=None):
+        """添加一条消息, msg 为消息操作类对象"""
+        ts = time.time() if ts is None else ts
+        key = (cmd, room_id, _hour(ts))
+        rows = self.buffers.get(key)
+        if rows is None:
+            rows = self.buffers[key] = []
+        rows.append(extract_row(cmd, msg, room_id, ts))
+        if len(rows) >= self.max_rows:
+            self._submit(self.writer.write, key, self.buffers.pop(key))
+        elif self._timer is None:
+            self._timer = asyncio.get_event_loop().call_later(self.flush_interval, self.flush)
+
+    def _submit(self, fn, *args):
+        fut = asyncio.get_event_loop().run_in_executor(self.executor, fn, *args)
+        self.pending.add(fut)
+        fut.add_done_callback(self._done)
+
+    def _done(self, fut):
+        self.pending.discard(fut)
+        if not fut.cancelled() and fut.exception() is not None:
+            asyncio.get_event_loop().call_exception_handler(
+                {"message": "blive parquet sink write failed", "exception": fut.exception(), "future": fut}
+            )
+
+    def flush(self):
+        """写入所有攒下的数据, 并关闭已经过去的小时的文件"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        buffers, self.buffers = self.buffers, {}
+        for key, rows in buffers.items():
+            self._submit(self.writer.write, key, rows)
+        self._submit(self.writer.close_before, _hour(time.time()))
+
+    async def close(self):
+        self.flush()
+        if self.pending:
+            await asyncio.gather(*self.pending, return_exceptions=True)
+        await asyncio.get_event_loop().run_in_executor(self.executor, self.writer.close)
+        self.executor.shutdown()
+
+
+def convert_recording(path, root, cmds=None, max_rows=100000, codec=None) -> int:
+    """把一个录制文件转换为 Parquet 文件, 返回转换的消息数. 在子进程中执行"""
+    wanted = set(COLUMNS if cmds is None else cmds)
+    json_codec = get_codec(codec)
+    packman = BLiveMsgPackage(codec=json_codec)
+    writer = PartitionWriter(root, prefix=os.path.splitext(os.path.basename(path))[0])
+    buffers = {}
+    count = 0
+    try:
+        for ts, room_id, data in iter_records(path):
+            for _, payload in packman.unpack_raw(data):
+                cmd = peek_cmd(payload)
+                if cmd is not None and cmd not in wanted:
+                    continue
+                body = json_codec.loads(payload)
+                cmd = body.get("cmd") if isinstance(body, dict) else None
+                if cmd not in wanted:
+                    continue
+                key = (cmd, room_id, _hour(ts))
+                rows = buffers.setdefault(key, [])
+                rows.append(extract_row(cmd, msg_class_for(cmd)(body), room_id, ts))
+                count += 1
+                if len(rows) >= max_rows:
+                    writer.write(key, buffers.pop(key))
+        for key, rows in buffers.items():
+            writer.write(key, rows)
+    finally:
+        writer.close()
+    return count
+
+
+def convert_recordings(paths, root, workers=None, cmds=None) -> int:
+    """
+    把录制文件转换为 Parquet 文件, 每个录制文件 (分段) 交给一个子进程处理, 返回转换的消息数
+
+    paths: 录制文件路径列表, 支持通配符
+    workers: 子进程数, 默认为 CPU 核数
+    """
+    files = ReplaySource(*paths).paths
+    if not files:
+        return 0
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    if workers == 1:
+        return sum(convert_recording(path, root, cmds) for path in files)
+    with ProcessPoolExecutor(workers) as pool:
+        return sum(pool.map(convert_recording, files, [root] * len(files), [cmds] * len(files)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把 blive 录制文件转换为 Parquet 文件")
+    parser.add_argument("root", help="输出目录")
+    parser.add_argument("paths", nargs="+", help="录制文件, 支持通配符")
+    parser.add_argument("--workers", type=int, default=None, help="子进程数, 默认为 CPU 核数")
+    parser.add_argument("--cmd", action="append", dest="cmds", help="只转换指定的 cmd, 可以指定多次")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    count = convert_recordings(args.paths, args.root, workers=args.workers, cmds=args.cmds)
+    print(f"converted {count} messages in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+断线重连
+
+- Backoff: 指数退避 + full jitter, 连续失败时等待 random(0, min(cap, base * 2 ** n)) 秒, 收到数据后清零
+- ConfCache: 缓存每个房间的 getConf 结果 (token 和服务器列表), 在 ttl 内重连不再请求接口;
+  连接失败时轮换到下一个服务器, 所有服务器都失败后丢弃缓存重新获取
+- TokenBucket: 进程内所有房间共用的令牌桶, 限制每秒的重连和接口请求次数,
+  大量房间同时断线时按速率排队重连, 不会同时请求接口. 默认不限制每个房间的第一次连接, 冷启动不排队
+
+    app = BLiver(510)  # 默认使用进程内共用的 limiter 和 cache
+    app = BLiver(510, reconnector=Reconnector(base=0.5, cap=30, limiter=TokenBucket(rate=20, burst=40)))
+    hub = BLiveHub(reconnector=lambda: Reconnector(cap=120))  # 每个房间一个 Reconnector
+"""
+import asyncio
+import random
+import time
+
+from .core import API_HOST, get_blive_conf, ws_url
+
+
+class Backoff:
+    """指数退避, 等待时间为 random(0, min(cap, base * factor ** attempt))"""
+
+    __slots__ = ("base", "cap", "factor", "attempt")
+
+    def __init__(self, base=1.0, cap=60.0, factor=2.0) -> None:
+        self.base = base
+        self.cap = cap
+        self.factor = factor
+        self.attempt = 0
+
+    def next_delay(self) -> float:
+        """第一次返回 0, 之后每次调用等待上限翻倍"""
+        attempt = self.attempt
+        self.attempt += 1
+        if attempt == 0:
+            return 0.0
+        return random.uniform(0, min(self.cap, self.base * self.factor ** (attempt - 1)))
+
+    def reset(self):
+        self.attempt = 0
+
+
+class TokenBucket:
+    """
+    令牌桶, 每秒补充 rate 个令牌, 最多积攒 burst 个
+
+    acquire 预先扣除令牌, 令牌不足时只 sleep 到轮到自己的时刻, 排队的协程不会轮询
+    """
+
+    def __init__(self, rate=50.0, burst=100) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waited = 0  # 需要排队的次数
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """扣除一个令牌, 返回需要等待的秒数"""
+        self._refill(time.monotonic())
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        self.waited += 1
+        return -self.tokens / self.rate
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class RoomConf:
+    """一个房间的 token 和弹幕服务器列表, index 为当前使用的服务器"""
+
+    __slots__ = ("token", "hosts", "index", "failed", "expires")
+
+    def __init__(self, token, hosts, expires) -> None:
+        self.token = token
+        self.hosts = hosts
+        self.index = random.randrange(len(hosts))  # 不同房间从不同的服务器开始, 分散连接
+        self.failed = 0  # 连续失败的服务器数
+        self.expires = expires
+
+    def host(self):
+        return self.hosts[self.index]
+
+    def rotate(self) -> bool:
+        """切换到下一个服务器, 所有服务器都失败过时返回 False"""
+        self.failed += 1
+        self.index = (self.index + 1) % len(self.hosts)
+        return self.failed < len(self.hosts)
+
+
+class ConfCache:
+    """房间号 -> RoomConf, 超过 ttl 秒或所有服务器都连接失败后重新获取"""
+
+    def __init__(self, ttl=600.0, max_size=100000) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self.confs = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, room_id):
+        conf = self.confs.get(room_id)
+        if conf is not None and conf.expires > time.monotonic():
+            self.hits += 1
+            return conf
+        return None
+
+    def put(self, room_id, token, hosts) -> RoomConf:
+        self.misses += 1
+        if len(self.confs) >= self.max_size:
+            now = time.monotonic()
+            self.confs = {k: c for k, c in self.confs.items() if c.expires > now}
+            if len(self.confs) >= self.max_size:
+                self.confs.clear()
+        conf = self.confs[room_id] = RoomConf(token, hosts, time.monotonic() + self.ttl)
+        return conf
+
+    def invalidate(self, room_id):
+        self.confs.pop(room_id, None)
+
+
+# 进程内所有 BLiver 默认共用
+default_limiter = TokenBucket()
+default_cache = ConfCache()
+
+
+class Reconnector:
+    """
+    一个 BLiver 的重连状态
+
+    base / cap: 退避的初始等待上限和最大等待上限 (秒)
+    retries: 每次 connect 的最大尝试次数, 超过后 connect 抛出 ClientConnectionError;
+             listen 中会一直重试, 每用完一轮 retries 报告一次错误
+    limiter: 限制连接和接口请求速率的令牌桶, 默认为进程内共用的 default_limiter
+    cache: getConf 结果缓存, 默认为进程内共用的 default_cache
+    limit_first: 第一次连接是否也从令牌桶取令牌. 默认只限制重连, 否则 N 个房间冷启动需要约 (2N - burst) / rate 秒
+    """
+
+    def __init__(
+        self,
+        base=1.0,
+        cap=60.0,
+        retries=5,
+        limiter: TokenBucket = None,
+        cache: ConfCache = None,
+        limit_first=False,
+    ) -> None:
+        self.backoff = Backoff(base, cap)
+        self.retries = retries
+        self.limiter = limiter or default_limiter
+        self.cache = cache or default_cache
+        self.limit_first = limit_first
+        self.attempts = 0  # 尝试连接的总次数
+        self._limited = limit_first
+
+    async def wait(self):
+        """每次尝试连接前调用: 按退避时间等待, 再从令牌桶取一个令牌 (第一次连接默认不取)"""
+        self.attempts += 1
+        self._limited = self.attempts > 1 or self.limit_first
+        delay = self.backoff.next_delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self._limited:
+            await self.limiter.acquire()
+
+    async def endpoint(self, room_id, aio_session, ssl=True, api_host=API_HOST):
+        """返回 (ws url, token), 缓存失效时请求 getConf (额外消耗一个令牌)"""
+        conf = self.cache.get(room_id)
+        if conf is None:
+            if self._limited:
+                await self.limiter.acquire()
+            token, hosts = await get_blive_conf(room_id, aio_session, api_host=api_host)
+            conf = self.cache.put(room_id, token, hosts)
+        return ws_url(conf.host(), ssl=ssl), conf.token
+
+    def failed(self, room_id):
+        """连接失败, 下次使用下一个服务器"""
+        conf = self.cache.confs.get(room_id)
+        if conf is not None and not conf.rotate():
+            self.cache.invalidate(room_id)  # token 可能已经失效
+
+    def succeeded(self, room_id):
+        """收到服务器的数据, 连接确认可用"""
+        if self.backoff.attempt:
+            self.backoff.reset()
+            conf = self.cache.confs.get(room_id)
+            if conf is not None:
+                conf.failed = 0
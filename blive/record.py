@@ -0,0 +1,138 @@
+"""
+录制与回放 websocket 原始数据帧
+
+录制文件为追加写入的定长头部 + 数据格式:
+
+    | magic "BLIVEREC" (仅文件开头) |
+    | length(u32) | timestamp(f64) | room_id(u64) | data(length 字节) | ...
+
+    recorder = FrameRecorder("frames.rec", segment_size=256 * 1024 * 1024)
+    app = BLiver(510, recorder=recorder)
+
+    # 离线回放
+    await ReplaySource("frames.rec").replay(app)
+"""
+import asyncio
+import glob
+import mmap
+import os
+import struct
+import time
+from typing import Union
+
+MAGIC = b"BLIVEREC"
+RecordHeader = struct.Struct(">IdQ")
+
+
+class FrameRecorder:
+    """
+    path: 录制文件路径
+    segment_size: 单个文件的最大字节数, 超过后写入新的分段文件 `name.0001.rec`, None 为不分段
+    """
+
+    def __init__(self, path, segment_size=None) -> None:
+        self.path = path
+        self.segment_size = segment_size
+        self.segment = 0
+        self._file = None
+        self._size = 0
+
+    def _segment_path(self):
+        if self.segment_size is None:
+            return self.path
+        root, ext = os.path.splitext(self.path)
+        return f"{root}.{self.segment:04d}{ext}"
+
+    def _open(self):
+        path = self._segment_path()
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+        if self._size == 0:
+            self._file.write(MAGIC)
+            self._size = len(MAGIC)
+
+    def write(self, room_id, data, ts=None):
+        if self._file is None:
+            self._open()
+        elif self.segment_size is not None and self._size >= self.segment_size:
+            self._file.close()
+            self.segment += 1
+            self._open()
+        self._file.write(RecordHeader.pack(len(data), time.time() if ts is None else ts, room_id))
+        self._file.write(data)
+        self._size += RecordHeader.size + len(data)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def iter_records(path):
+    """通过 mmap 读取一个录制文件, 逐个 yield (timestamp, room_id, data)"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size <= len(MAGIC):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a blive record file")
+            offset = len(MAGIC)
+            end = len(mm)
+            while offset + RecordHeader.size <= end:
+                length, ts, room_id = RecordHeader.unpack_from(mm, offset)
+                offset += RecordHeader.size
+                if offset + length > end:
+                    break  # 最后一条记录没有写完整
+                yield ts, room_id, mm[offset : offset + length]
+                offset += length
+
+
+class ReplaySource:
+    """
+    回放录制文件, 参数为一个或多个录制文件路径 (支持通配符, 分段文件按文件名顺序回放)
+    """
+
+    def __init__(self, *paths) -> None:
+        self.paths = []
+        for p in paths:
+            self.paths.extend(sorted(glob.glob(p)) if glob.has_magic(p) else [p])
+
+    def __iter__(self):
+        for path in self.paths:
+            yield from iter_records(path)
+
+    async def replay(self, target, realtime=False, speed=1.0) -> int:
+        """
+        把录制的数据帧送入 BLiver 的解包和分发流程, 返回回放的帧数
+
+        target: BLiver 实例 (所有帧都交给它), 或 {room_id: BLiver} (按录制时的房间号分发, 例如 hub.rooms)
+        realtime: True 时按录制时的间隔回放 (speed 为倍速), False 时尽可能快地回放
+        """
+        loop = asyncio.get_event_loop()
+        routes: Union[dict, None] = None
+        if isinstance(target, dict):
+            # 录制的是真实房间号, hub.rooms 的 key 可能是短号, 已经连接过的房间按 real_room_id 分发
+            routes = dict(target)
+            routes.update(
+                {room.real_room_id: room for room in target.values() if getattr(room, "real_room_id", None)}
+            )
+        count = 0
+        start = first_ts = None
+        for ts, room_id, data in self:
+            if realtime:
+                if first_ts is None:
+                    start, first_ts = loop.time(), ts
+                delay = start + (ts - first_ts) / speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif count % 100 == 0:
+                await asyncio.sleep(0)  # 让出事件循环, 使异步 handler 有机会运行
+            bliver = target if routes is None else routes.get(room_id)
+            if bliver is not None:
+                await bliver._dispatch_frame(data)
+                count += 1
+        return count
@@ -0,0 +1,149 @@
+"""
+直播间信息解析 (短号 -> 真实房间号, 主播名) 与持久化缓存
+
+    resolver = RoomResolver("rooms.json", ttl=86400)
+    hub = BLiveHub(resolver=resolver)  # 或 BLiver(510, resolver=resolver)
+
+    # 并发解析所有房间后再连接, 并发数由 concurrency 限制
+    await hub.add_rooms(room_ids)
+
+缓存文件中的信息在 ttl 内直接使用; 超过 ttl 的信息仍然先使用, 同时在后台重新获取.
+传入 conf_cache (blive.reconnect.ConfCache) 时一并保存各房间的 token 和服务器列表, 重启后在其有效期内不再请求 getConf
+"""
+import asyncio
+import json
+import os
+import time
+
+from .core import API_HOST, get_blive_room_info
+from .reconnect import RoomConf
+
+
+class RoomResolver:
+    """
+    path: 缓存文件路径, None 为只在内存中缓存
+    ttl: 房间信息的有效期 (秒)
+    concurrency: 同时进行的接口请求数
+    conf_cache: 需要一起持久化的 ConfCache
+    save_delay: 有新信息后延迟多少秒写入文件, 把同一批解析的结果合并为一次写入
+    """
+
+    def __init__(self, path=None, ttl=86400.0, concurrency=32, conf_cache=None, save_delay=1.0) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.conf_cache = conf_cache
+        self.save_delay = save_delay
+        self.rooms = {}  # room_id -> (real_room_id, uname, 获取时的 time.time())
+        self.semaphore = None
+        self.concurrency = concurrency
+        self.fetched = 0  # 实际请求接口的次数
+        self.hits = 0
+        self._pending = {}  # room_id -> 正在进行的请求, 同一房间只请求一次
+        self._refreshing = set()
+        self._dirty = False
+        self._save_timer = None
+        if path is not None:
+            self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for room_id, (real_room_id, uname, ts) in data.get("rooms", {}).items():
+            self.rooms[int(room_id)] = (real_room_id, uname, ts)
+        if self.conf_cache is not None:
+            # 文件中保存的是过期的时间戳, 换算为 time.monotonic()
+            offset = time.monotonic() - time.time()
+            for room_id, (token, hosts, expires) in data.get("confs", {}).items():
+                if expires > time.time() and hosts:
+                    self.conf_cache.confs[int(room_id)] = RoomConf(token, hosts, expires + offset)
+
+    def _dump(self):
+        data = {"rooms": {str(k): list(v) for k, v in self.rooms.items()}}
+        if self.conf_cache is not None:
+            offset = time.time() - time.monotonic()
+            data["confs"] = {
+                str(k): [c.token, c.hosts, c.expires + offset] for k, c in self.conf_cache.confs.items()
+            }
+        return data
+
+    @staticmethod
+    def _write(path, data):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)  # 写入过程中退出不会损坏原文件
+
+    async def save(self):
+        """立即写入缓存文件"""
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._save_timer = None
+        if self.path is None:
+            return
+        self._dirty = False
+        await asyncio.get_event_loop().run_in_executor(None, self._write, self.path, self._dump())
+
+    async def flush(self):
+        """有未保存的信息时写入缓存文件"""
+        if self._dirty:
+            await self.save()
+
+    def _mark_dirty(self):
+        self._dirty = True
+        if self.path is not None and self._save_timer is None:
+            loop = asyncio.get_event_loop()
+            self._save_timer = loop.call_later(self.save_delay, lambda: asyncio.ensure_future(self.save()))
+
+    async def _fetch(self, room_id, aio_session, api_host):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+        async with self.semaphore:
+            real_room_id, uname = await get_blive_room_info(room_id, aio_session, api_host=api_host)
+        self.fetched += 1
+        self.rooms[room_id] = (real_room_id, uname, time.time())
+        self._mark_dirty()
+        return real_room_id, uname
+
+    def _fetch_once(self, room_id, aio_session, api_host):
+        future = self._pending.get(room_id)
+        if future is None:
+            future = self._pending[room_id] = asyncio.ensure_future(self._fetch(room_id, aio_session, api_host))
+            future.add_done_callback(lambda _: self._pending.pop(room_id, None))
+        return future
+
+    def _refresh(self, room_id, aio_session, api_host):
+        if room_id in self._pending:
+            return
+        task = self._fetch_once(room_id, aio_session, api_host)
+        self._refreshing.add(task)
+        task.add_done_callback(self._refresh_done)
+
+    def _refresh_done(self, task):
+        self._refreshing.discard(task)
+        if not task.cancelled():
+            task.exception()  # 后台刷新失败时继续使用旧信息
+
+    async def resolve(self, room_id, aio_session, api_host=API_HOST):
+        """返回 (real_room_id, uname)"""
+        cached = self.rooms.get(room_id)
+        if cached is not None:
+            self.hits += 1
+            if time.time() - cached[2] > self.ttl:
+                self._refresh(room_id, aio_session, api_host)
+            return cached[0], cached[1]
+        return await asyncio.shield(self._fetch_once(room_id, aio_session, api_host))
+
+    async def resolve_many(self, room_ids, aio_session, api_host=API_HOST) -> dict:
+        """并发解析多个房间, 返回 {room_id: (real_room_id, uname)}, 解析失败的房间不在结果中"""
+        room_ids = list(room_ids)
+        results = await asyncio.gather(*[self.resolve(r, aio_session, api_host) for r in room_ids], return_exceptions=True)
+        return {r: res for r, res in zip(room_ids, results) if not isinstance(res, BaseException)}
+
+    async def close(self):
+        """取消后台刷新并写入缓存文件 (包括之后才获取的 getConf 结果)"""
+        for task in list(self._refreshing):
+            task.cancel()
+        await self.save()
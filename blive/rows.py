@@ -0,0 +1,71 @@
+"""
+把消息操作类对象展开为扁平的一行数据, 供 blive.parquet / blive.sqlite 等存储使用
+
+每种 cmd 对应一组 Column, 每行数据的前两列固定为 room_id 和 ts (接收时间, 秒)
+"""
+from collections import namedtuple
+
+from .core import Events
+
+# type 为 "int" / "str" / "timestamp" (秒, float), 由各个存储映射为自己的类型
+Column = namedtuple("Column", "name type getter")
+
+COMMON_COLUMNS = (Column("room_id", "int", None), Column("ts", "timestamp", None))
+
+
+def _sender_columns(attr="sender"):
+    return (
+        Column("uid", "int", lambda m: getattr(m, attr).id),
+        Column("uname", "str", lambda m: getattr(m, attr).name),
+        Column("medal_name", "str", lambda m: getattr(m, attr).medal.medal_name),
+        Column("medal_level", "int", lambda m: getattr(m, attr).medal.medal_level),
+    )
+
+
+COLUMNS = {
+    Events.DANMU_MSG: _sender_columns()
+    + (Column("content", "str", lambda m: m.content),),
+    Events.SEND_GIFT: _sender_columns()
+    + (
+        Column("action", "str", lambda m: m.action),
+        Column("gift_id", "int", lambda m: m.gift["gift_id"]),
+        Column("gift_name", "str", lambda m: m.gift["gift_name"]),
+        Column("num", "int", lambda m: m.num),
+        Column("price", "int", lambda m: m.price),
+        Column("coin_type", "str", lambda m: m.coin_type),
+        Column("total_coin", "int", lambda m: m.total_coin),
+        Column("batch_combo_id", "str", lambda m: m.combo["batch_combo_id"]),
+    ),
+    Events.SUPER_CHAT_MESSAGE: _sender_columns()
+    + (
+        Column("price", "int", lambda m: m.price),
+        Column("content", "str", lambda m: m.content),
+        Column("start_time", "int", lambda m: m.start_time),
+        Column("time", "int", lambda m: m.time),
+    ),
+    Events.INTERACT_WORD: _sender_columns("user")
+    + (Column("msg_type", "int", lambda m: m.msg_type),),
+    Events.GUARD_BUY: _sender_columns("user")
+    + (
+        Column("guard_level", "int", lambda m: m.guard_level),
+        Column("num", "int", lambda m: m.num),
+        Column("price", "int", lambda m: m.price),
+        Column("gift_name", "str", lambda m: m.gift_name),
+    ),
+}
+
+
+def columns_for(cmd) -> tuple:
+    """cmd 对应的全部列 (包括 room_id 和 ts)"""
+    return COMMON_COLUMNS + COLUMNS[cmd]
+
+
+def extract_row(cmd, msg, room_id, ts) -> tuple:
+    """按 COLUMNS[cmd] 的顺序从消息操作类对象中取出一行数据"""
+    row = [room_id, ts]
+    for column in COLUMNS[cmd]:
+        try:
+            row.append(column.getter(msg))
+        except (TypeError, KeyError, IndexError, AttributeError):
+            row.append(None)
+    return tuple(row)
@@ -0,0 +1,273 @@
+"""
+弹幕关键词 / 正则规则匹配
+
+关键词规则编译为一个 Aho–Corasick 自动机, 每条弹幕只需扫描一遍, 与规则数量无关;
+以固定字符串开头的正则借助自动机过滤, 其他不含分组的正则合并为一个分支正则做预过滤, 只有过滤命中时才执行正则
+
+    engine = RuleEngine([Rule("ad", "加微信"), Rule("qq", r"q+\\s*\\d{6,}", regex=True)])
+    engine.attach(app)  # BLiver 或 BLiveHub
+
+    @app.on(Events.RULE_MATCHED)
+    async def moderate(match: RuleMatch):
+        print(match.rule_ids, match.content)
+
+    # 热更新: 在线程中编译新规则, 编译完成后原子地替换, 不会暂停消息处理
+    await engine.reload(new_rules)
+
+规则文件格式 (RuleEngine.watch / load_rules), 每行一条规则, # 开头为注释:
+
+    ad 加微信
+    qq re:q+\\s*\\d{6,}
+"""
+import asyncio
+import os
+import re
+from collections import namedtuple
+from typing import Iterable, List
+
+from .core import Events
+
+try:
+    from re import _parser  # python >= 3.11
+except ImportError:  # pragma: no cover
+    import sre_parse as _parser
+
+_LITERAL = _parser.LITERAL
+
+Rule = namedtuple("Rule", "id pattern regex", defaults=(False,))
+
+
+class AhoCorasick:
+    """多模式字符串匹配自动机, 输出为命中的关键词对应的值"""
+
+    __slots__ = ("goto", "fail", "output")
+
+    def __init__(self, keywords: Iterable) -> None:
+        """keywords: [(keyword, value)]"""
+        goto = [{}]
+        output = [()]
+        for keyword, value in keywords:
+            state = 0
+            for ch in keyword:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = goto[state][ch] = len(goto)
+                    goto.append({})
+                    output.append(())
+                state = nxt
+            output[state] += (value,)
+
+        # 广度优先构建失败指针, 同时把失败路径上的输出合并到每个状态
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                output[nxt] += output[fail[nxt]]
+        self.goto = goto
+        self.fail = fail
+        self.output = output
+
+    def search(self, text) -> set:
+        """返回 text 中出现的所有关键词对应的值"""
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+def _literal_prefix(pattern, flags) -> str:
+    """正则开头的固定字符串, 例如 "加微信\\d+" 为 "加微信", 没有时返回空字符串"""
+    try:
+        parsed = _parser.parse(pattern, flags)
+    except re.error:
+        return ""
+    prefix = []
+    for op, arg in parsed:
+        if op is not _LITERAL:
+            break
+        prefix.append(chr(arg))
+    return "".join(prefix)
+
+
+class RuleSet:
+    """
+    编译好的一组规则, 创建后不再修改
+
+    ignore_case: 关键词和正则都忽略大小写
+
+    以固定字符串开头的正则把开头的字符串加入自动机, 只有文本中出现该字符串时才执行这条正则;
+    其他正则合并为一个分支正则做预过滤. 合并会改变分组编号, 含分组 (可能有反向引用) 的正则不参与合并, 每次单独执行
+    """
+
+    def __init__(self, rules: Iterable[Rule] = (), ignore_case=True) -> None:
+        self.rules: List[Rule] = list(rules)
+        self.ignore_case = ignore_case
+        self.order = {rule.id: i for i, rule in enumerate(self.rules)}
+        flags = re.IGNORECASE if ignore_case else 0
+        keywords = []
+        self.regexes = []  # 没有固定开头, 参与预过滤的正则 [(rule_id, pattern)]
+        self.standalone = []  # 没有固定开头, 含分组的正则
+        for rule in self.rules:
+            if not rule.regex:
+                if rule.pattern:
+                    keywords.append((self._fold(rule.pattern), rule.id))
+                continue
+            compiled = re.compile(rule.pattern, flags)
+            prefix = _literal_prefix(rule.pattern, flags)
+            if prefix:
+                # 自动机的输出为 (rule_id, pattern) 时表示需要再执行正则确认
+                keywords.append((self._fold(prefix), (rule.id, compiled)))
+            elif compiled.groups:
+                self.standalone.append((rule.id, compiled))
+            else:
+                self.regexes.append((rule.id, compiled))
+        self.automaton = AhoCorasick(keywords) if keywords else None
+        self.prefilter = None
+        if self.regexes:
+            try:
+                self.prefilter = re.compile("|".join(f"(?:{r.pattern})" for _, r in self.regexes), flags)
+            except re.error:  # 规则中有行内标记等无法合并的写法时不做预过滤
+                self.prefilter = None
+
+    def _fold(self, text):
+        return text.casefold() if self.ignore_case else text
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, text) -> list:
+        """返回 text 命中的规则 id, 按规则定义的顺序排列"""
+        if not text:
+            return []
+        found = set()
+        if self.automaton is not None:
+            for value in self.automaton.search(self._fold(text)):
+                if value.__class__ is tuple:
+                    if value[1].search(text):
+                        found.add(value[0])
+                else:
+                    found.add(value)
+        if self.regexes and (self.prefilter is None or self.prefilter.search(text)):
+            found.update(rule_id for rule_id, r in self.regexes if r.search(text))
+        for rule_id, r in self.standalone:
+            if r.search(text):
+                found.add(rule_id)
+        if len(found) > 1:
+            return sorted(found, key=self.order.__getitem__)
+        return list(found)
+
+
+def load_rules(path) -> List[Rule]:
+    """从规则文件读取规则, 格式见模块说明"""
+    rules = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            rule_id, _, pattern = line.partition(" ")
+            pattern = pattern.strip()
+            if pattern.startswith("re:"):
+                rules.append(Rule(rule_id, pattern[3:], regex=True))
+            else:
+                rules.append(Rule(rule_id, pattern))
+    return rules
+
+
+class RuleMatch:
+    """Events.RULE_MATCHED 的参数"""
+
+    __slots__ = ("ctx", "rule_ids", "content")
+
+    def __init__(self, ctx, rule_ids, content) -> None:
+        self.ctx = ctx
+        self.rule_ids = rule_ids
+        self.content = content
+
+    @property
+    def message(self):
+        return self.ctx.message
+
+    def __repr__(self) -> str:
+        return f"RuleMatch(rule_ids={self.rule_ids!r}, content={self.content!r})"
+
+
+class RuleEngine:
+    """
+    rules: 规则列表或 RuleSet
+    cmds: 需要匹配的 cmd, 默认只匹配弹幕
+    text: 从消息操作类对象中取出被匹配文本的函数, 默认为 msg.content
+    """
+
+    def __init__(self, rules=(), cmds=(Events.DANMU_MSG,), text=None, ignore_case=True) -> None:
+        self.ignore_case = ignore_case
+        self.ruleset = rules if isinstance(rules, RuleSet) else RuleSet(rules, ignore_case)
+        self.cmds = list(cmds)
+        self.text = text or (lambda msg: msg.content)
+        self.emitter = None
+        self.checked = 0  # 检查过的消息数
+        self.matched = 0  # 命中规则的消息数
+        self._watcher = None
+
+    def attach(self, emitter):
+        """匹配 emitter 上的消息, 命中时在 emitter 上触发 Events.RULE_MATCHED"""
+        self.emitter = emitter
+        for cmd in self.cmds:
+            emitter.on(cmd, self._on_message)
+        return emitter
+
+    def _on_message(self, ctx):
+        self.checked += 1
+        content = self.text(ctx.message)
+        rule_ids = self.ruleset.match(content)
+        if rule_ids:
+            self.matched += 1
+            self.emitter.emit(Events.RULE_MATCHED, RuleMatch(ctx, rule_ids, content))
+
+    def match(self, text) -> list:
+        return self.ruleset.match(text)
+
+    async def reload(self, rules):
+        """在线程中编译新的规则, 编译完成后替换, 替换前的消息仍然使用旧规则匹配"""
+        loop = asyncio.get_event_loop()
+        self.ruleset = await loop.run_in_executor(None, RuleSet, list(rules), self.ignore_case)
+        return self.ruleset
+
+    def watch(self, path, interval=5.0):
+        """每隔 interval 秒检查规则文件, 文件修改后自动重新加载. 返回监视任务"""
+
+        async def watcher():
+            mtime = None
+            while True:
+                try:
+                    current = os.stat(path).st_mtime
+                    if current != mtime:
+                        mtime = current  # 加载失败时等文件再次修改后重试
+                        rules = await asyncio.get_event_loop().run_in_executor(None, load_rules, path)
+                        await self.reload(rules)
+                except (OSError, re.error, UnicodeDecodeError) as e:
+                    asyncio.get_event_loop().call_exception_handler(
+                        {"message": f"failed to reload rules from {path}", "exception": e}
+                    )
+                await asyncio.sleep(interval)
+
+        if self._watcher is not None:
+            self._watcher.cancel()
+        self._watcher = asyncio.ensure_future(watcher())
+        return self._watcher
+
+    def close(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
@@ -0,0 +1,226 @@
+"""
+类型化消息解码 (需要安装 msgspec)
+
+直接从 bytes 解码为只包含声明字段的 msgspec Struct, 省去构建完整 dict 的开销, 也减少消息在队列中排队时占用的内存.
+Struct 支持 body["data"]["uid"] 形式的访问, blive.msg 中的消息操作类可以直接使用
+
+    app = BLiver(510, typed=True)
+
+    @app.on(Events.DANMU_MSG)
+    async def handler(ctx):
+        danmu = DanMuMsg(ctx.body)  # ctx.body 为 DanmuMsgBody
+        print(danmu.sender.name, danmu.content)
+
+没有声明 schema 的 cmd, 以及与 schema 不符的消息仍然解码为 dict
+"""
+from typing import Any, Dict, Optional
+
+try:
+    import msgspec
+except ImportError as e:  # pragma: no cover
+    raise ImportError("blive.schema (typed=True) requires msgspec, install it with `pip install blive[fast]`") from e
+
+__all__ = ["Node", "TypedDecoder", "SCHEMAS"]
+
+
+class Node(msgspec.Struct, gc=False):
+    """可以像 dict / list 一样按 key 或下标访问的 Struct"""
+
+    def __getitem__(self, k):
+        if k.__class__ is int:  # 按下标访问
+            k = self.__struct_fields__[k]
+        try:
+            return getattr(self, k)
+        except AttributeError:
+            raise KeyError(k) from None
+
+    def get(self, k, default=None):
+        try:
+            return self[k]
+        except (KeyError, IndexError):
+            return default
+
+    def to_dict(self):
+        return msgspec.to_builtins(self)
+
+
+class MedalInfo(Node):
+    medal_name: str = ""
+    medal_level: int = 0
+    anchor_uname: str = ""
+    anchor_roomid: int = 0
+    target_id: int = 0
+    guard_level: int = 0
+
+
+# DANMU_MSG 的 info 为数组, 按下标声明
+
+
+class DanmuUser(Node, array_like=True):
+    uid: int = 0
+    uname: str = ""
+
+
+class DanmuMedal(Node, array_like=True):
+    medal_level: int = 0
+    medal_name: str = ""
+    anchor_uname: str = ""
+    anchor_roomid: int = 0
+    medal_color: int = 0
+    special: str = ""
+    icon_id: int = 0
+    medal_color_border: int = 0
+    medal_color_start: int = 0
+    medal_color_end: int = 0
+    guard_level: int = 0
+    is_lighted: int = 0
+    target_id: int = 0  # 勋章所属主播的 uid
+
+
+class DanmuInfo(Node, array_like=True):
+    meta: list = msgspec.field(default_factory=list)
+    content: str = ""
+    user: DanmuUser = msgspec.field(default_factory=DanmuUser)
+    medal: DanmuMedal = msgspec.field(default_factory=DanmuMedal)
+    user_level: Any = None
+    title: Any = None
+    _6: Any = None
+    guard_level: int = 0
+    _8: Any = None
+    timestamp: Optional[Dict[str, Any]] = None
+
+
+class DanmuMsgBody(Node):
+    cmd: str
+    info: DanmuInfo
+
+
+class SendGiftData(Node):
+    tid: str = ""
+    uid: int = 0
+    uname: str = ""
+    action: str = ""
+    giftId: int = 0
+    giftName: str = ""
+    giftType: int = 0
+    num: int = 0
+    price: int = 0
+    coin_type: str = ""
+    total_coin: int = 0
+    timestamp: int = 0
+    batch_combo_id: str = ""
+    batch_combo_send: Any = None
+    combo_resources_id: int = 0
+    combo_send: Any = None
+    combo_stay_time: int = 0
+    combo_total_coin: int = 0
+    medal_info: MedalInfo = msgspec.field(default_factory=MedalInfo)
+
+
+class SendGiftBody(Node):
+    cmd: str
+    data: SendGiftData
+
+
+class SuperChatUser(Node):
+    uname: str = ""
+    face: str = ""
+
+
+class SuperChatData(Node):
+    id: int = 0
+    uid: int = 0
+    message: str = ""
+    price: int = 0
+    start_time: int = 0
+    end_time: int = 0
+    time: int = 0
+    background_bottom_color: str = ""
+    user_info: SuperChatUser = msgspec.field(default_factory=SuperChatUser)
+    medal_info: Optional[MedalInfo] = None
+
+
+class SuperChatBody(Node):
+    cmd: str
+    data: SuperChatData
+
+
+class InteractWordData(Node):
+    uid: int = 0
+    uname: str = ""
+    msg_type: int = 0
+    roomid: int = 0
+    timestamp: int = 0
+    fans_medal: Optional[MedalInfo] = None
+
+
+class InteractWordBody(Node):
+    cmd: str
+    data: InteractWordData
+
+
+class GuardBuyData(Node):
+    uid: int = 0
+    username: str = ""
+    guard_level: int = 0
+    num: int = 0
+    price: int = 0
+    gift_id: int = 0
+    gift_name: str = ""
+    start_time: int = 0
+    end_time: int = 0
+
+
+class GuardBuyBody(Node):
+    cmd: str
+    data: GuardBuyData
+
+
+class ComboSendData(Node):
+    uid: int = 0
+    uname: str = ""
+    action: str = ""
+    batch_combo_id: str = ""
+    batch_combo_num: int = 0
+    combo_id: str = ""
+    combo_num: int = 0
+    combo_total_coin: int = 0
+    gift_id: int = 0
+    gift_name: str = ""
+    gift_num: int = 0
+    total_num: int = 0
+    ruid: int = 0
+    r_uname: str = ""
+    medal_info: MedalInfo = msgspec.field(default_factory=MedalInfo)
+
+
+class ComboSendBody(Node):
+    cmd: str
+    data: ComboSendData
+
+
+SCHEMAS = {
+    "DANMU_MSG": DanmuMsgBody,
+    "SEND_GIFT": SendGiftBody,
+    "SUPER_CHAT_MESSAGE": SuperChatBody,
+    "INTERACT_WORD": InteractWordBody,
+    "GUARD_BUY": GuardBuyBody,
+    "COMBO_SEND": ComboSendBody,
+}
+
+
+class TypedDecoder:
+    """按 cmd 选择 schema 解码, 没有 schema 或解码失败时返回 None, 由调用者退回普通 json 解析"""
+
+    def __init__(self, schemas=None) -> None:
+        schemas = SCHEMAS if schemas is None else schemas
+        self.decoders = {cmd: msgspec.json.Decoder(t) for cmd, t in schemas.items()}
+
+    def decode(self, cmd, payload):
+        decoder = self.decoders.get(cmd.split(":", 1)[0])
+        if decoder is None:
+            return None
+        try:
+            return decoder.decode(payload)
+        except msgspec.ValidationError:
+            return None
@@ -0,0 +1,407 @@
+"""
+多进程分片: 把大量直播间按一致性哈希分配给多个工作进程, 每个工作进程运行一个 BLiveHub
+
+    def setup(hub):  # 在每个工作进程中调用, 必须是模块级函数 (工作进程以 spawn 方式启动)
+        @hub.on(Events.DANMU_MSG)
+        async def handler(ctx):
+            ...
+
+    sup = ShardSupervisor(workers=4, setup=setup, forward=[Events.SUPER_CHAT_MESSAGE])
+
+    @sup.on(Events.SUPER_CHAT_MESSAGE)  # forward 中的消息批量转发到主进程
+    def on_sc(event: ShardEvent):
+        print(event.room_id, event.message.content)
+
+    await sup.start(room_ids)
+    sup.add_rooms([...]) / sup.remove_rooms([...])
+    await sup.resize(8)  # 增减工作进程, 只迁移哈希环上变化部分的房间
+    await sup.close()
+
+工作进程异常退出时自动重启 (按指数退避等待), 并重新连接分配给它的房间
+"""
+import asyncio
+import bisect
+import hashlib
+import multiprocessing
+import os
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List
+
+from pyee import AsyncIOEventEmitter
+
+from .batch import Batcher
+from .codec import get_codec
+from .msg import msg_class_for
+from .reconnect import Backoff
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """一致性哈希环, 每个节点在环上放置 vnodes 个虚拟节点"""
+
+    def __init__(self, nodes: Iterable = (), vnodes=160) -> None:
+        self.vnodes = vnodes
+        self.nodes = set()
+        self._keys = []  # 排序后的虚拟节点哈希值
+        self._owners = []  # 与 _keys 对应的节点
+        for node in nodes:
+            self.add(node)
+
+    def _rebuild(self, points):
+        points.sort()
+        self._keys = [k for k, _ in points]
+        self._owners = [n for _, n in points]
+
+    def add(self, node):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        points = list(zip(self._keys, self._owners))
+        points.extend((_hash(f"{node}#{i}"), node) for i in range(self.vnodes))
+        self._rebuild(points)
+
+    def remove(self, node):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        self._rebuild([(k, n) for k, n in zip(self._keys, self._owners) if n != node])
+
+    def node_for(self, key):
+        if not self._keys:
+            raise LookupError("hash ring is empty")
+        i = bisect.bisect(self._keys, _hash(str(key)))
+        return self._owners[i % len(self._owners)]
+
+
+class ShardEvent:
+    """工作进程转发到主进程的消息"""
+
+    __slots__ = ("room_id", "cmd", "payload", "codec", "_body", "_message")
+
+    def __init__(self, room_id, cmd, payload, codec) -> None:
+        self.room_id = room_id
+        self.cmd = cmd
+        self.payload = payload  # 原始 json bytes
+        self.codec = codec
+        self._body = None
+        self._message = None
+
+    @property
+    def body(self) -> dict:
+        if self._body is None:
+            self._body = self.codec.loads(self.payload)
+        return self._body
+
+    @property
+    def message(self):
+        if self._message is None:
+            self._message = msg_class_for(self.cmd)(self.body)
+        return self._message
+
+    def __repr__(self) -> str:
+        return f"ShardEvent(room_id={self.room_id!r}, cmd={self.cmd!r})"
+
+
+def _send_items(conn, items):
+    conn.send_bytes(pickle.dumps(items, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _worker_main(index, rooms, conn, setup, forward, hub_kwargs, batch_size, batch_delay):
+    asyncio.run(_run_worker(index, rooms, conn, setup, forward, hub_kwargs, batch_size, batch_delay))
+
+
+async def _run_worker(index, rooms, conn, setup, forward, hub_kwargs, batch_size, batch_delay):
+    from .hub import BLiveHub
+
+    loop = asyncio.get_event_loop()
+    hub = BLiveHub(**hub_kwargs)
+    if setup is not None:
+        ret = setup(hub)
+        if asyncio.iscoroutine(ret):
+            await ret
+
+    batcher = sender = None
+    if forward:
+        codec = get_codec(hub.codec)
+        # 主进程读得慢时 send_bytes 会阻塞, 在单独的线程中按顺序发送, 不阻塞工作进程的事件循环
+        sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix="blive-shard-forward")
+        batcher = Batcher(
+            lambda items: loop.run_in_executor(sender, _send_items, conn, items),
+            max_size=batch_size,
+            max_delay=batch_delay,
+        )
+
+        def forwarder(ctx):
+            payload = ctx.msg[1]
+            if payload is None:  # 由 offloader 解析的消息没有原始数据
+                payload = codec.dumps(ctx.body)
+            bliver = ctx.bliver
+            batcher.add((bliver.real_room_id or bliver.room_id, ctx.body.get("cmd"), bytes(payload)))
+
+        for cmd in forward:
+            hub.on(cmd, forwarder)
+
+    stopped = loop.create_future()
+
+    def on_control():
+        try:
+            op, arg = conn.recv()
+        except (EOFError, OSError):  # 主进程已退出
+            op, arg = "stop", None
+        if op == "add":
+            asyncio.ensure_future(hub.add_rooms(arg))
+        elif op == "remove":
+            for room_id in arg:
+                asyncio.ensure_future(hub.remove_room(room_id))
+        elif op == "stop" and not stopped.done():
+            stopped.set_result(None)
+
+    loop.add_reader(conn.fileno(), on_control)
+    await hub.add_rooms(rooms)
+    await stopped
+    loop.remove_reader(conn.fileno())
+    if batcher is not None:
+        await batcher.close()
+        sender.shutdown()
+    await hub.close()
+    conn.close()
+
+
+class _Worker:
+    __slots__ = ("index", "process", "conn", "rooms", "started", "backoff", "restarts", "stopping")
+
+    def __init__(self, index) -> None:
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.rooms = set()
+        self.started = 0.0
+        self.backoff = Backoff(base=1.0, cap=30.0)
+        self.restarts = 0
+        self.stopping = False
+
+
+class ShardSupervisor(AsyncIOEventEmitter):
+    """
+    workers: 工作进程数, 默认为 CPU 核数
+    setup: 在每个工作进程中以 hub 为参数调用的函数 (或协程函数), 用于注册 handler, 需要可以被 pickle
+    forward: 需要转发到主进程的 cmd, 在主进程中以 ShardEvent 为参数触发
+    hub_kwargs: 创建工作进程中 BLiveHub 的参数, 需要可以被 pickle
+    batch_size / batch_delay: 转发时每批的最大消息数和最长等待时间
+    """
+
+    def __init__(
+        self,
+        workers=None,
+        setup=None,
+        forward=(),
+        hub_kwargs=None,
+        batch_size=500,
+        batch_delay=0.05,
+        vnodes=160,
+    ) -> None:
+        super().__init__()
+        self.size = workers or os.cpu_count() or 1
+        self.setup = setup
+        self.forward = [str(getattr(cmd, "value", cmd)) for cmd in forward]
+        self.hub_kwargs = hub_kwargs or {}
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.codec = get_codec(self.hub_kwargs.get("codec"))
+        self.ring = HashRing(range(self.size), vnodes=vnodes)
+        self.workers: Dict[int, _Worker] = {}
+        self.assignment = {}  # room_id -> 工作进程编号
+        self.forwarded = 0  # 转发到主进程的消息数
+        self.running = False
+        self._mp = multiprocessing.get_context("spawn")
+
+    # 工作进程管理
+
+    def _spawn(self, worker: _Worker):
+        loop = asyncio.get_event_loop()
+        parent, child = self._mp.Pipe()
+        process = self._mp.Process(
+            target=_worker_main,
+            args=(
+                worker.index,
+                sorted(worker.rooms),
+                child,
+                self.setup,
+                self.forward,
+                self.hub_kwargs,
+                self.batch_size,
+                self.batch_delay,
+            ),
+            name=f"blive-shard-{worker.index}",
+            daemon=True,
+        )
+        process.start()
+        child.close()
+        worker.process = process
+        worker.conn = parent
+        worker.started = time.monotonic()
+        loop.add_reader(parent.fileno(), self._on_readable, worker)
+        loop.add_reader(process.sentinel, self._on_exit, worker)
+
+    def _detach(self, worker: _Worker):
+        loop = asyncio.get_event_loop()
+        if worker.conn is not None:
+            loop.remove_reader(worker.conn.fileno())
+            worker.conn.close()
+            worker.conn = None
+        if worker.process is not None:
+            loop.remove_reader(worker.process.sentinel)
+
+    def _on_readable(self, worker: _Worker):
+        conn = worker.conn
+        if conn is None:
+            return
+        try:
+            while conn.poll():
+                self._dispatch(pickle.loads(conn.recv_bytes()))
+        except (EOFError, OSError):
+            pass  # 工作进程已退出, 由 _on_exit 处理
+
+    def _dispatch(self, items):
+        self.forwarded += len(items)
+        codec = self.codec
+        for room_id, cmd, payload in items:
+            self.emit(cmd, ShardEvent(room_id, cmd, payload, codec))
+
+    def _on_exit(self, worker: _Worker):
+        self._on_readable(worker)  # 读取退出前发出的消息
+        self._detach(worker)
+        worker.process.join()
+        if worker.stopping or not self.running:
+            return
+        # 异常退出: 运行了一段时间后才退出的重新从最短的等待开始
+        if time.monotonic() - worker.started > 60:
+            worker.backoff.reset()
+        worker.restarts += 1
+        delay = worker.backoff.next_delay()
+        asyncio.get_event_loop().call_later(delay, self._restart, worker)
+
+    def _restart(self, worker: _Worker):
+        if self.running and not worker.stopping and self.workers.get(worker.index) is worker:
+            self._spawn(worker)
+
+    def _send(self, worker: _Worker, op, arg=None):
+        if worker.conn is None:
+            return  # 重启时会带上最新的房间列表
+        try:
+            worker.conn.send((op, arg))
+        except (BrokenPipeError, OSError):
+            pass  # 工作进程正在退出, 由 _on_exit 处理
+
+    # 房间分配
+
+    def _assign(self, room_ids) -> Dict[int, List]:
+        moves = {}
+        for room_id in room_ids:
+            index = self.ring.node_for(room_id)
+            self.assignment[room_id] = index
+            self.workers[index].rooms.add(room_id)
+            moves.setdefault(index, []).append(room_id)
+        return moves
+
+    async def start(self, room_ids: Iterable = ()):
+        self.running = True
+        for index in range(self.size):
+            self.workers[index] = _Worker(index)
+        self._assign(room_ids)
+        for worker in self.workers.values():
+            self._spawn(worker)
+        return self
+
+    def add_rooms(self, room_ids: Iterable):
+        room_ids = [r for r in room_ids if r not in self.assignment]
+        for index, rooms in self._assign(room_ids).items():
+            self._send(self.workers[index], "add", rooms)
+
+    def remove_rooms(self, room_ids: Iterable):
+        removed = {}
+        for room_id in room_ids:
+            index = self.assignment.pop(room_id, None)
+            if index is not None:
+                self.workers[index].rooms.discard(room_id)
+                removed.setdefault(index, []).append(room_id)
+        for index, rooms in removed.items():
+            self._send(self.workers[index], "remove", rooms)
+
+    async def resize(self, workers: int) -> int:
+        """调整工作进程数, 返回迁移的房间数"""
+        if workers == self.size:
+            return 0
+        old_size, self.size = self.size, workers
+        for index in range(old_size, workers):
+            self.ring.add(index)
+            self.workers[index] = _Worker(index)
+        for index in range(workers, old_size):
+            self.ring.remove(index)
+
+        moved = {}
+        for room_id, old in self.assignment.items():
+            new = self.ring.node_for(room_id)
+            if new != old:
+                moved.setdefault((old, new), []).append(room_id)
+        for (old, new), rooms in moved.items():
+            self.workers[old].rooms.difference_update(rooms)
+            self.workers[new].rooms.update(rooms)
+            for room_id in rooms:
+                self.assignment[room_id] = new
+            if old < workers:
+                self._send(self.workers[old], "remove", rooms)
+            if new < old_size:
+                self._send(self.workers[new], "add", rooms)
+
+        for index in range(old_size, workers):
+            self._spawn(self.workers[index])  # 新进程启动时带上分配给它的房间
+        await asyncio.gather(*[self._stop_worker(self.workers[i]) for i in range(workers, old_size)])
+        return sum(len(rooms) for rooms in moved.values())
+
+    async def _stop_worker(self, worker: _Worker, timeout=10.0):
+        worker.stopping = True
+        self._send(worker, "stop")
+        process = worker.process
+        deadline = time.monotonic() + timeout
+        while process is not None and process.is_alive() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if process is not None:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+            self._on_readable(worker)  # 读取退出前发出的消息
+        self._detach(worker)
+        self.workers.pop(worker.index, None)
+
+    def stats(self) -> dict:
+        return {
+            "workers": {
+                index: {
+                    "pid": w.process.pid if w.process is not None else None,
+                    "alive": w.process is not None and w.process.is_alive(),
+                    "rooms": len(w.rooms),
+                    "restarts": w.restarts,
+                }
+                for index, w in self.workers.items()
+            },
+            "rooms": len(self.assignment),
+            "forwarded": self.forwarded,
+        }
+
+    async def close(self):
+        self.running = False
+        await asyncio.gather(*[self._stop_worker(w) for w in list(self.workers.values())])
+
+    def run(self, room_ids: Iterable = ()):
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(self.start(room_ids))
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(self.close())
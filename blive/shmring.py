@@ -0,0 +1,358 @@
+"""
+共享内存环形缓冲区: 一个进程接收并解包, 多个进程消费同一批直播间的消息
+
+    # 接收进程: 解压, 拆包后把每条消息的原始 json 写入共享内存 (不做 json 解析, 每个消费者各自解析)
+    publisher = RingPublisher("blive-events", size=64 * 1024 * 1024)
+    hub = BLiveHub(publisher=publisher)  # 或 BLiver(510, publisher=publisher)
+
+    # 消费进程: 用法与 BLiveHub 相同, handler 不需要修改
+    sub = RingSubscriber("blive-events")
+
+    @sub.on(Events.DANMU_MSG)
+    async def handler(ctx):
+        print(ctx.bliver.room_id, ctx.message.content)
+
+    sub.run()
+
+缓冲区格式 (小端):
+
+    | magic "BLIVERNG" | capacity(u64) | write_pos(u64) | records(u64) | max_readers(u32) | pad(u32) |
+    | oldest(u64) | reserved(u64) | ... |
+    | 读者槽位 [pid(u32) | pad(u32) | pos(u64)] * max_readers |
+    | 数据区: [length(u32) | pad(u32) | room_id(u64) | timestamp(f64) | payload(length 字节) | 补齐到 8 字节] ... |
+
+write_pos / pos 为写入 / 读取的总字节数, 只增不减, 在数据区中的位置为 pos % capacity.
+oldest 为缓冲区中最旧的完整消息的位置, 新读者使用 from_start 时从这里开始.
+reserved 为正在写入的位置, 写入者在覆盖数据之前更新, 读者复制完后据此判断读到的数据是否已被覆盖.
+只有一个写入者, 写入者不等待读者; 读者落后超过 capacity 时数据已被覆盖, 读者跳到最新位置并计入 lost.
+每个读者把自己的位置写入槽位, 写入者可以通过 readers() / slow_readers() 发现落后的读者.
+读者在文件锁 (临时目录下的 <name>.lock) 中认领槽位, pid 已经不存在的槽位视为空闲, 异常退出的读者不会一直占用槽位.
+
+共享内存中保存的是原始 json 而不是解析后的对象: 跨进程只能传递字节, 保存解析后的对象也需要每个消费者反序列化 (例如 pickle),
+而接收进程要先做一次 json 解析. 见 benchmark/bench_shmring.py 最后一项, 使用 orjson 时解析 json 比 pickle.loads 更快
+"""
+import asyncio
+import contextlib
+import os
+import struct
+import tempfile
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+    import msvcrt
+
+from .core import Operation, PackageHeader
+from .hub import BLiveHub
+
+MAGIC = b"BLIVERNG"
+Header = struct.Struct("<8sQQQIIQQ")
+Slot = struct.Struct("<IIQ")
+RecordHeader = struct.Struct("<IIQd")
+_U32 = struct.Struct("<I")
+_U64 = struct.Struct("<Q")
+WRAP = 0xFFFFFFFF  # 数据区末尾放不下时的标记, 读者遇到后回到数据区开头
+
+_WRITE_POS = 16
+_RECORDS = 24
+_OLDEST = 40
+_RESERVED = 48
+_Bounds = struct.Struct("<QQ")  # oldest, reserved
+_SLOTS = 64
+# 消费者分发时使用的包头, 与 NOTIFY 包相同
+_NOTIFY = PackageHeader(0, 16, 0, Operation.NOTIFY, 0)
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+def _attach(name):
+    """连接已存在的共享内存, 不注册到 resource_tracker, 避免读者退出时删除共享内存"""
+    try:
+        return shared_memory.SharedMemory(name, track=False)  # python >= 3.13
+    except TypeError:
+        pass
+    # spawn 的子进程与父进程共用 resource_tracker, 注册后再 unregister 会把创建者的注册一起去掉
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+
+def _lock_path(name):
+    return os.path.join(tempfile.gettempdir(), f"{name}.lock")
+
+
+@contextlib.contextmanager
+def _slot_lock(name):
+    """认领读者槽位时的跨进程锁, 持有锁的进程退出时由系统释放"""
+    fd = os.open(_lock_path(name), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        else:
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+def _alive(pid) -> bool:
+    """pid 对应的进程是否还存在"""
+    if os.name == "nt":  # windows 上 os.kill 会结束进程, 不检查
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # 进程存在, 属于其他用户
+        return True
+    return True
+
+
+class RingPublisher:
+    """
+    name: 共享内存名称, 消费者使用同一名称连接
+    size: 数据区字节数, 决定读者最多可以落后多少
+    max_readers: 读者槽位数
+    """
+
+    def __init__(self, name, size=64 * 1024 * 1024, max_readers=16) -> None:
+        self.capacity = _align(size)
+        self.max_readers = max_readers
+        self.data_offset = _align(_SLOTS + Slot.size * max_readers)
+        self.shm = shared_memory.SharedMemory(name, create=True, size=self.data_offset + self.capacity)
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.buf[: self.data_offset] = bytes(self.data_offset)
+        Header.pack_into(self.buf, 0, MAGIC, self.capacity, 0, 0, max_readers, 0, 0, 0)
+        self.write_pos = 0
+        self.oldest = 0
+        self.records = 0
+        self.dropped = 0  # 超过 capacity 无法写入的消息数
+
+    def write(self, room_id, payload, ts=None):
+        """写入一条消息"""
+        length = len(payload)
+        size = _align(RecordHeader.size + length)
+        capacity = self.capacity
+        if size > capacity:
+            self.dropped += 1
+            return
+        pos = self.write_pos
+        offset = pos % capacity
+        if offset + size > capacity:
+            self._overwrite(pos + capacity - offset, size)
+            _U32.pack_into(self.buf, self.data_offset + offset, WRAP)
+            pos += capacity - offset
+            offset = 0
+        else:
+            self._overwrite(pos, size)
+        start = self.data_offset + offset
+        RecordHeader.pack_into(self.buf, start, length, 0, room_id, ts or time.time())
+        self.buf[start + RecordHeader.size : start + RecordHeader.size + length] = payload
+        self.write_pos = pos + size
+        self.records += 1
+
+    def _overwrite(self, start, size):
+        """在 start 写入 size 字节之前, 把 oldest 移过将被覆盖的消息, 并公布 reserved"""
+        buf, capacity, base = self.buf, self.capacity, self.data_offset
+        end = start + size
+        oldest = self.oldest
+        while oldest + capacity < end and oldest < self.write_pos:
+            offset = oldest % capacity
+            length = _U32.unpack_from(buf, base + offset)[0]
+            oldest += capacity - offset if length == WRAP else _align(RecordHeader.size + length)
+        if oldest + capacity < end:  # 之前的消息全部被覆盖, 最旧的是正在写入的这条
+            oldest = start
+        self.oldest = oldest
+        _Bounds.pack_into(buf, _OLDEST, oldest, end)
+
+    def commit(self):
+        """更新共享的写入位置, 之前写入的消息对读者可见"""
+        _U64.pack_into(self.buf, _WRITE_POS, self.write_pos)
+        _U64.pack_into(self.buf, _RECORDS, self.records)
+
+    def publish(self, room_id, packages):
+        """写入一个数据帧拆出的 [(header, payload)], 由 BLiver 在解包后调用"""
+        ts = time.time()
+        for _, payload in packages:
+            self.write(room_id, payload, ts)
+        self.commit()
+
+    def readers(self) -> list:
+        """[(pid, 落后的字节数)], 落后超过 capacity 的读者已经丢失了消息. 不包括已经退出但没有释放槽位的读者"""
+        result = []
+        for i in range(self.max_readers):
+            pid, _, pos = Slot.unpack_from(self.buf, _SLOTS + i * Slot.size)
+            if pid and _alive(pid):
+                result.append((pid, self.write_pos - pos))
+        return result
+
+    def slow_readers(self, ratio=0.5) -> list:
+        """落后超过 capacity * ratio 的读者 pid"""
+        limit = self.capacity * ratio
+        return [pid for pid, lag in self.readers() if lag > limit]
+
+    def stats(self) -> dict:
+        return {
+            "write_pos": self.write_pos,
+            "records": self.records,
+            "dropped": self.dropped,
+            "readers": self.readers(),
+        }
+
+    def close(self, unlink=True):
+        self.buf = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+            with contextlib.suppress(OSError):
+                os.remove(_lock_path(self.name))
+
+
+class RingReader:
+    """
+    读取共享内存中的消息, 每个读者有自己的位置
+
+    from_start: True 时从缓冲区中最旧的消息开始读, 否则只读连接之后写入的消息
+    """
+
+    def __init__(self, name, from_start=False) -> None:
+        self.shm = _attach(name)
+        self.buf = self.shm.buf
+        magic, self.capacity, write_pos, _, self.max_readers, _, oldest, _ = Header.unpack_from(self.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"shared memory {name} is not a blive ring")
+        self.data_offset = _align(_SLOTS + Slot.size * self.max_readers)
+        self.pos = oldest if from_start else write_pos
+        self.lost = 0  # 因为落后太多被跳过的次数
+        self.slot = self._claim_slot(name)
+
+    def _claim_slot(self, name):
+        with _slot_lock(name):
+            for i in range(self.max_readers):
+                offset = _SLOTS + i * Slot.size
+                pid = _U32.unpack_from(self.buf, offset)[0]
+                if pid == 0 or not _alive(pid):
+                    Slot.pack_into(self.buf, offset, os.getpid(), 0, self.pos)
+                    return offset
+        return None  # 没有空闲槽位时仍然可以读, 只是写入者看不到这个读者
+
+    def _set_pos(self, pos):
+        self.pos = pos
+        if self.slot is not None:
+            _U64.pack_into(self.buf, self.slot + 8, pos)
+
+    def _write_pos(self):
+        return _U64.unpack_from(self.buf, _WRITE_POS)[0]
+
+    def _reserved(self):
+        return _U64.unpack_from(self.buf, _RESERVED)[0]
+
+    def read(self, max_records=4096) -> list:
+        """返回 [(room_id, timestamp, payload bytes)], 没有新消息时返回空列表"""
+        write_pos = self._write_pos()
+        pos = self.pos
+        if self._reserved() - pos > self.capacity:
+            self.lost += 1
+            self._set_pos(write_pos)
+            return []
+        buf, capacity, base = self.buf, self.capacity, self.data_offset
+        records = []
+        start = pos
+        try:
+            while pos < write_pos and len(records) < max_records:
+                offset = pos % capacity
+                length = _U32.unpack_from(buf, base + offset)[0]
+                if length == WRAP:
+                    pos += capacity - offset
+                    continue
+                _, _, room_id, ts = RecordHeader.unpack_from(buf, base + offset)
+                begin = base + offset + RecordHeader.size
+                records.append((room_id, ts, bytes(buf[begin : begin + length])))
+                pos += _align(RecordHeader.size + length)
+        except struct.error:  # 读到了正在被覆盖的消息头, 由下面的检查丢弃
+            pass
+        # 写入者先更新 reserved 再覆盖数据, 复制完后 reserved 超过 start + capacity 说明读到的数据可能已被覆盖,
+        # 这种情况下丢弃这一批
+        if self._reserved() - start > capacity:
+            self.lost += 1
+            self._set_pos(self._write_pos())
+            return []
+        self._set_pos(pos)
+        return records
+
+    def close(self):
+        if self.slot is not None:
+            Slot.pack_into(self.buf, self.slot, 0, 0, 0)
+            self.slot = None
+        self.buf = None
+        self.shm.close()
+
+
+class RingSubscriber(BLiveHub):
+    """
+    从共享内存读取消息并分发的 BLiveHub, 每个房间对应一个不连接服务器的 HubRoom,
+    ctx.bliver.room_id, 带条件的 handler, on_batch, typed, dedup 等用法与 BLiveHub 相同
+
+    poll_interval: 两次读取之间的间隔 (秒), 即最多增加的延迟, 越短 CPU 占用越高
+    max_records: 每次最多读取的消息数, 读满时不等待, 立即读取下一批
+    """
+
+    def __init__(self, name, from_start=False, poll_interval=0.005, max_records=4096, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.reader = RingReader(name, from_start=from_start)
+        self.poll_interval = poll_interval
+        self.max_records = max_records
+        self.running = False
+
+    def _room_for(self, room_id):
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = self._create_room(room_id)
+            room.real_room_id = room_id
+            room.uname = None
+        return room
+
+    async def _dispatch(self, records):
+        by_room = {}
+        for room_id, _, payload in records:
+            by_room.setdefault(room_id, []).append((_NOTIFY, payload))
+        for room_id, packages in by_room.items():
+            room = self._room_for(room_id)
+            if room.dispatcher is None:
+                for cmd, ctx in room._ctxs_from_packages(packages):
+                    room.emit(cmd, ctx)
+            else:
+                for cmd, ctx in room._ctxs_from_packages(packages):
+                    await room.dispatcher.put(room, cmd, ctx)
+
+    async def listen(self):
+        self.running = True
+        while self.running:
+            records = self.reader.read(self.max_records)
+            if records:
+                await self._dispatch(records)
+            # 没有新消息, 或者读完一批后等待下一批, 一次唤醒处理多个数据帧
+            await asyncio.sleep(0 if len(records) == self.max_records else self.poll_interval)
+
+    async def close(self):
+        self.running = False
+        await super().close()
+        self.reader.close()
+
+    def run(self):
+        loop = asyncio.get_event_loop()
+        loop.create_task(self.listen())
+        loop.run_forever()
@@ -0,0 +1,188 @@
+"""
+保存消息到本地 SQLite 数据库, 不需要额外的依赖
+
+消息在事件循环中只提取为一行 tuple 放入队列, 由单独的写入线程批量写入 (一个事务 executemany 多行), 数据库开启 WAL 模式
+
+    sink = SQLiteSink("blive.db", cmds=[Events.DANMU_MSG, Events.SEND_GIFT])
+    sink.attach(app)  # BLiver 或 BLiveHub
+    ...
+    await sink.close()
+
+每个 cmd 一张表, 表名为小写的 cmd (danmu_msg, send_gift, ...), 列见 blive.rows.COLUMNS
+
+写入跟不上时队列会被写满, 之后的消息由 handler 返回的协程等待队列有空位后放入.
+配合 BoundedDispatcher 使用时 worker 会等待该协程, 从而把压力传递给分发队列 (例如 OverflowPolicy.BLOCK 时暂停读取 websocket)
+"""
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+
+from .rows import COLUMNS, columns_for, extract_row
+
+_SQLITE_TYPES = {"int": "INTEGER", "str": "TEXT", "timestamp": "REAL"}
+
+_STOP = object()
+
+
+def table_for(cmd) -> str:
+    return cmd.lower()
+
+
+class SQLiteSink:
+    """
+    path: 数据库文件路径
+    cmds: 需要保存的 cmd, 默认为 blive.rows.COLUMNS 中的全部 cmd
+    batch_size: 每个事务最多写入的行数
+    flush_interval: 队列中的消息最多等待多少秒写入
+    maxsize: 队列最大长度, 超过后对 handler 产生背压
+    """
+
+    def __init__(self, path, cmds=None, batch_size=2000, flush_interval=0.5, maxsize=50000) -> None:
+        self.path = path
+        self.cmds = list(COLUMNS) if cmds is None else list(cmds)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize)
+        self.written = 0  # 已写入的行数
+        self.transactions = 0  # 已提交的事务数
+        self.blocked = 0  # 因队列满而等待的消息数
+        self.error = None  # 写入线程的异常, 发生异常后停止写入
+        self._loop = None
+        self._space = None  # 队列有空位时 set 的 asyncio.Event
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="blive-sqlite", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.queue.qsize(),
+            "written": self.written,
+            "transactions": self.transactions,
+            "blocked": self.blocked,
+        }
+
+    def attach(self, emitter):
+        """在 BLiver 或 BLiveHub 上注册 listener"""
+        for cmd in self.cmds:
+            emitter.on(cmd, self._listener(cmd))
+        return emitter
+
+    def _listener(self, cmd):
+        def listener(ctx):
+            bliver = ctx.bliver
+            return self.add(cmd, getattr(bliver, "real_room_id", None) or bliver.room_id, ctx.message)
+
+        return listener
+
+    def add(self, cmd, room_id, msg, ts=None):
+        """
+        添加一条消息, msg 为消息操作类对象
+
+        队列未满时直接放入并返回 None, 队列已满时返回一个协程, 需要 await 它直到消息放入队列
+        """
+        item = (cmd, extract_row(cmd, msg, room_id, time.time() if ts is None else ts))
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.blocked += 1
+            return self._put_when_space(item)
+
+    async def _put_when_space(self, item):
+        if self._space is None:
+            self._loop = asyncio.get_event_loop()
+            self._space = asyncio.Event()
+        while True:
+            if self.error is not None:
+                raise self.error
+            self._space.clear()
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                await self._space.wait()
+
+    def _notify_space(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._space.set)
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        statements = {}
+        for cmd in self.cmds:
+            table = table_for(cmd)
+            columns = columns_for(cmd)
+            db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                + ", ".join(f"{c.name} {_SQLITE_TYPES[c.type]}" for c in columns)
+                + ")"
+            )
+            db.execute(f"CREATE INDEX IF NOT EXISTS {table}_room_ts ON {table} (room_id, ts)")
+            statements[cmd] = f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})"
+        return db, statements
+
+    def _run(self):
+        try:
+            db, statements = self._connect()
+        except Exception as e:
+            self.error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            stopped = False
+            while not stopped:
+                batch = {}
+                count = 0
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                deadline = time.monotonic() + self.flush_interval
+                # 取出队列中已有的消息, 攒够 batch_size 或超过 flush_interval 时写入
+                while True:
+                    if item is _STOP:
+                        stopped = True
+                        break
+                    batch.setdefault(item[0], []).append(item[1])
+                    count += 1
+                    if count >= self.batch_size:
+                        break
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        timeout = deadline - time.monotonic()
+                        if timeout <= 0:
+                            break
+                        try:
+                            item = self.queue.get(timeout=timeout)
+                        except queue.Empty:
+                            break
+                if batch:
+                    db.execute("BEGIN")
+                    for cmd, rows in batch.items():
+                        db.executemany(statements[cmd], rows)
+                    db.execute("COMMIT")
+                    self.written += count
+                    self.transactions += 1
+                self._notify_space()
+        except Exception as e:
+            self.error = e
+            self._notify_space()  # 唤醒等待的 handler, 使其抛出异常
+        finally:
+            db.close()
+
+    async def close(self):
+        """写入队列中剩余的消息并关闭数据库"""
+        loop = asyncio.get_event_loop()
+        if self._thread.is_alive():
+            await loop.run_in_executor(None, self.queue.put, _STOP)
+            await loop.run_in_executor(None, self._thread.join)
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,84 @@
+"""
+时间轮定时器
+
+大量房间/消息各自需要定时任务时, 用一个 asyncio task 驱动的时间轮代替每个定时任务一个 timer
+"""
+import asyncio
+import math
+
+
+class WheelTimer:
+    __slots__ = ("expires", "callback", "args", "cancelled")
+
+    def __init__(self, expires, callback, args) -> None:
+        self.expires = expires  # 到期的 tick 数
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimingWheel:
+    """
+    哈希时间轮, 精度为 tick 秒
+
+    callback 可以是普通函数或协程函数, 协程会以 task 的形式运行
+    """
+
+    def __init__(self, tick=1.0, slots=64) -> None:
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.current = 0  # 已经走过的 tick 数
+        self._task = None
+
+    def call_later(self, delay, callback, *args) -> WheelTimer:
+        ticks = max(1, math.ceil(delay / self.tick))
+        timer = WheelTimer(self.current + ticks, callback, args)
+        self.slots[timer.expires % len(self.slots)].append(timer)
+        return timer
+
+    def advance(self):
+        """前进一格, 执行到期的定时器"""
+        self.current += 1
+        idx = self.current % len(self.slots)
+        due, pending = [], []
+        for timer in self.slots[idx]:
+            if timer.cancelled:
+                continue
+            (due if timer.expires <= self.current else pending).append(timer)
+        self.slots[idx] = pending
+        for timer in due:
+            self._fire(timer)
+
+    def _fire(self, timer: WheelTimer):
+        try:
+            ret = timer.callback(*timer.args)
+            if asyncio.iscoroutine(ret):
+                asyncio.ensure_future(ret)
+        except Exception as e:
+            asyncio.get_event_loop().call_exception_handler(
+                {"message": "timing wheel callback error", "exception": e}
+            )
+
+    def __len__(self):
+        return sum(1 for slot in self.slots for t in slot if not t.cancelled)
+
+    async def run(self):
+        loop = asyncio.get_event_loop()
+        next_tick = loop.time() + self.tick
+        while True:
+            await asyncio.sleep(max(0, next_tick - loop.time()))
+            next_tick += self.tick
+            self.advance()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self.run())
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,20 @@
+"""使用 BLiveHub 管理大量直播间的例子, 所有直播间共用一个 session 和心跳定时器"""
+
+from blive import Events, BLiverCtx
+from blive.hub import BLiveHub
+from blive.msg import DanMuMsg
+
+hub = BLiveHub()
+
+
+# handler 注册在 hub 上, 对所有直播间生效
+@hub.on(Events.DANMU_MSG)
+async def listen(ctx: BLiverCtx):
+    danmu = DanMuMsg(ctx.body)
+    print(f'\n【{ctx.bliver.uname}】{danmu.sender.name}: "{danmu.content}"\n')
+
+
+for room_id in (510, 605, 7777):
+    hub.add_room(room_id)
+
+hub.run()
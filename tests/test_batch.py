@@ -0,0 +1,62 @@
+import asyncio
+
+from blive import BLiver, Events
+from blive.batch import Batcher
+
+
+def test_flush_on_size_delay_and_close():
+    async def main():
+        batches = []
+        batcher = Batcher(batches.append, max_size=3, max_delay=0.05)
+        for i in range(4):
+            batcher.add(i)
+        # 攒够 max_size 时立即交出
+        assert batches == [[0, 1, 2]]
+        # 第一条消息等待超过 max_delay 后交出
+        await asyncio.sleep(0.1)
+        assert batches == [[0, 1, 2], [3]]
+        batcher.add(4)
+        await batcher.close()
+        assert batches == [[0, 1, 2], [3], [4]] and batcher.batches == 3
+        await asyncio.sleep(0.1)
+        assert len(batches) == 3  # close 时取消了定时器
+
+    asyncio.run(main())
+
+
+def test_async_handler_errors_and_close_waits():
+    async def main():
+        done, errors = [], []
+
+        async def handler(items):
+            await asyncio.sleep(0.01)
+            if items == ["bad"]:
+                raise ValueError("bad batch")
+            done.append(items)
+
+        batcher = Batcher(handler, max_size=1, on_error=errors.append)
+        batcher.add("bad")
+        batcher.add("ok")
+        await batcher.close()
+        assert done == [["ok"]] and [str(e) for e in errors] == ["bad batch"]
+
+    asyncio.run(main())
+
+
+def test_on_batch_decorator_flushes_on_close():
+    async def main():
+        app = BLiver(510)
+        batches = []
+
+        @app.on_batch(Events.DANMU_MSG, max_size=100, max_delay=10)
+        def save(ctxs):
+            batches.append(ctxs)
+
+        assert save is not None
+        app.emit(Events.DANMU_MSG, "a")
+        app.emit(Events.DANMU_MSG, "b")
+        assert batches == []
+        await app.graceful_close()
+        assert batches == [["a", "b"]]
+
+    asyncio.run(main())
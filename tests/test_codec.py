@@ -0,0 +1,43 @@
+import pytest
+
+from blive import codec as codec_module
+from blive.codec import JSONCodec, available_codecs, get_codec, set_default_codec
+
+
+@pytest.mark.parametrize("name", available_codecs())
+def test_roundtrip_bytes_and_memoryview(name):
+    codec = get_codec(name)
+    obj = {"cmd": "DANMU_MSG", "info": [[0, 1], "弹幕内容", [123, "用户"]], "url": "https://a/b"}
+    data = codec.dumps(obj)
+    assert isinstance(data, bytes)
+    assert codec.loads(data) == obj
+    assert codec.loads(memoryview(b"  " + data)[2:]) == obj
+
+
+def test_orjson_falls_back_to_stdlib():
+    if "orjson" not in available_codecs():
+        pytest.skip("orjson is not installed")
+    # orjson 不接受 NaN, 标准库接受
+    value = get_codec("orjson").loads(b'{"v": NaN}')["v"]
+    assert value != value
+
+
+def test_get_codec_and_default():
+    custom = JSONCodec()
+    assert get_codec(custom) is custom
+    assert get_codec("json").name == "json"
+    assert get_codec("auto").name == available_codecs()[0]
+    with pytest.raises(ValueError):
+        get_codec("yaml")
+    try:
+        set_default_codec("json")
+        assert get_codec().name == "json"
+    finally:
+        set_default_codec(None)
+    assert get_codec().name == available_codecs()[0]
+
+
+def test_missing_codec_names_the_install_command(monkeypatch):
+    monkeypatch.setitem(codec_module._instances, "orjson", None)
+    with pytest.raises(ImportError, match=r"blive\[fast\]"):
+        get_codec("orjson")
@@ -0,0 +1,97 @@
+import asyncio
+from types import SimpleNamespace
+
+from blive import Events
+from blive.combo import ComboAggregator
+from blive.msg import ComboSendMsg, SendGiftMsg
+from blive.timewheel import TimingWheel
+
+
+class Emitter:
+    def __init__(self) -> None:
+        self.handlers = {}
+        self.emitted = []
+
+    def on(self, event, f):
+        self.handlers[event] = f
+
+    def emit(self, event, *args):
+        self.emitted.append((event,) + args)
+
+    def send(self, room_id, msg):
+        ctx = SimpleNamespace(bliver=SimpleNamespace(room_id=room_id, real_room_id=room_id), message=msg)
+        cmd = Events.SEND_GIFT if isinstance(msg, SendGiftMsg) else Events.COMBO_SEND
+        self.handlers[cmd](ctx)
+
+
+def gift(uid, combo_id, num, stay=3):
+    return SendGiftMsg(
+        {
+            "cmd": "SEND_GIFT",
+            "data": {
+                "uid": uid,
+                "uname": f"user{uid}",
+                "giftId": 30607,
+                "giftName": "小心心",
+                "num": num,
+                "total_coin": num * 100,
+                "combo_total_coin": 0,
+                "batch_combo_id": combo_id,
+                "combo_stay_time": stay,
+                "coin_type": "gold",
+            },
+        }
+    )
+
+
+def combo_send(uid, combo_id, total_num, total_coin):
+    return ComboSendMsg(
+        {
+            "cmd": "COMBO_SEND",
+            "data": {"uid": uid, "uname": f"user{uid}", "batch_combo_id": combo_id, "total_num": total_num, "combo_total_coin": total_coin},
+        }
+    )
+
+
+def test_totals_merge_gifts_and_combo_send():
+    async def main():
+        emitter = Emitter()
+        aggregator = ComboAggregator(wheel=TimingWheel(tick=0.5, slots=8))
+        aggregator.attach(emitter)
+        for _ in range(3):
+            emitter.send(510, gift(1, "batch:a", 2))
+        emitter.send(510, combo_send(1, "batch:a", total_num=10, total_coin=1000))  # 部分 SEND_GIFT 被服务器合并, 以 COMBO_SEND 为准
+        emitter.send(605, gift(1, "batch:a", 1))  # 不同房间不合并
+        emitter.send(510, gift(2, "", 4))  # 没有 batch_combo_id 时按礼物合并
+        assert len(aggregator.combos) == 3 and aggregator.received == 6
+        aggregator.flush()
+        combos = {(c.room_id, c.uid): c for _, c in emitter.emitted}
+        a = combos[(510, 1)]
+        assert (a.gift_num, a.combo_num, a.num, a.gift_coin, a.total_coin, a.messages) == (6, 10, 10, 600, 1000, 4)
+        assert (a.uname, a.gift_name, a.coin_type) == ("user1", "小心心", "gold")
+        assert combos[(605, 1)].num == 1
+        assert combos[(510, 2)].batch_combo_id == "gift:30607" and combos[(510, 2)].total_coin == 400
+        assert all(e[0] == Events.GIFT_SETTLED for e in emitter.emitted) and aggregator.settled == 3
+
+    asyncio.run(main())
+
+
+def test_combo_settles_after_stay_time():
+    async def main():
+        emitter = Emitter()
+        wheel = TimingWheel(tick=0.05, slots=8)
+        aggregator = ComboAggregator(wheel=wheel, grace=0)
+        aggregator.attach(emitter)
+        emitter.send(510, gift(1, "batch:a", 1, stay=0.1))
+        await asyncio.sleep(0.06)
+        emitter.send(510, gift(1, "batch:a", 1, stay=0.1))  # 推迟截止时间
+        for _ in range(3):
+            wheel.advance()
+        assert emitter.emitted == []
+        await asyncio.sleep(0.12)
+        for _ in range(8):
+            wheel.advance()
+        assert len(emitter.emitted) == 1 and emitter.emitted[0][1].num == 2
+        assert aggregator.combos == {}
+
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+import itertools
+import zlib
+
+import pytest
+
+from blive import core
+from blive.core import (
+    BLiveMsgPackage,
+    HeaderStruct,
+    Operation,
+    ProtocolVersion,
+    StreamingDecoder,
+    resolve_protover,
+    split_packages,
+)
+
+
+def package(body: bytes, operation=Operation.NOTIFY, version=ProtocolVersion.NORMAL) -> bytes:
+    return HeaderStruct.pack(HeaderStruct.size + len(body), HeaderStruct.size, version, operation, 0) + body
+
+
+def test_split_packages_yields_each_payload():
+    bodies = [b'{"cmd":"A"}', b'{"cmd":"BB"}', b"{}"]
+    data = b"".join(package(b) for b in bodies)
+    packages = list(split_packages(data))
+    assert [bytes(p) for _, p in packages] == bodies
+    assert all(isinstance(p, memoryview) for _, p in packages)
+    assert [h.package_size for h, _ in packages] == [HeaderStruct.size + len(b) for b in bodies]
+
+
+def test_split_packages_truncated_and_corrupt_tail():
+    data = package(b'{"cmd":"A"}') + package(b'{"cmd":"LONG"}')[:-3]
+    assert [bytes(p) for _, p in split_packages(data)] == [b'{"cmd":"A"}', b'{"cmd":"LON']
+    # package_size 小于 header_size 时停止, 不会死循环
+    bad = HeaderStruct.pack(4, HeaderStruct.size, 0, Operation.NOTIFY, 0)
+    assert [bytes(p) for _, p in split_packages(package(b"{}") + bad + package(b"{}"))] == [b"{}"]
+    assert list(split_packages(b"short")) == []
+
+
+def test_unpack_deflate_notify():
+    bodies = [b'{"cmd":"DANMU_MSG","i":%d}' % i for i in range(50)]
+    inner = b"".join(package(b) for b in bodies)
+    frame = package(zlib.compress(inner), version=ProtocolVersion.DEFLATE)
+    packages = BLiveMsgPackage().unpack(frame)
+    assert [p for _, p in packages] == [b.decode() for b in bodies]
+
+
+def test_peek_cmd():
+    from blive.core import peek_cmd
+
+    assert peek_cmd(b'{"cmd":"DANMU_MSG","info":[]}') == "DANMU_MSG"
+    assert peek_cmd(memoryview(b' { "cmd" : "SEND_GIFT", "data": {}}')) == "SEND_GIFT"
+    # cmd 不是第一个字段时交给完整解析
+    assert peek_cmd(b'{"data":{},"cmd":"SEND_GIFT"}') is None
+    assert peek_cmd(b"") is None
+
+
+def test_heartbeat_reply_is_valid_json():
+    import json
+    import struct
+
+    frame = package(struct.pack("!I", 1234), operation=Operation.HEARTBEAT_REPLY)
+    [(_, payload)] = BLiveMsgPackage().unpack_raw(frame)
+    assert json.loads(bytes(payload)) == {"cmd": "HEARTBEAT_REPLY", "popularity": 1234, "payload": None}
+
+
+def test_resolve_protover(monkeypatch):
+    assert resolve_protover(2) == ProtocolVersion.DEFLATE
+    if core.brotli is not None:
+        assert resolve_protover("auto") == ProtocolVersion.BROTLI
+    monkeypatch.setattr(core, "brotli", None)
+    assert resolve_protover("auto") == ProtocolVersion.DEFLATE
+    with pytest.raises(ImportError, match=r"blive\[brotli\]"):
+        resolve_protover(3)
+
+
+@pytest.mark.parametrize("version", [ProtocolVersion.DEFLATE, ProtocolVersion.BROTLI])
+def test_streaming_decoder_matches_one_shot(version):
+    if version == ProtocolVersion.BROTLI and core.brotli is None:
+        pytest.skip("brotli is not installed")
+    compress = zlib.compress if version == ProtocolVersion.DEFLATE else core.brotli.compress
+    inner = b"".join(package(b'{"cmd":"DANMU_MSG","i":%d,"pad":"%s"}' % (i, b"x" * i)) for i in range(200))
+    frame = package(compress(inner), version=version)
+    expected = [(h, bytes(p)) for h, p in BLiveMsgPackage().unpack_raw(frame)]
+    assert len(expected) == 200
+    # chunk_size 小于单个包, 包跨越多个解压块
+    decoder = StreamingDecoder(chunk_size=64)
+    assert list(decoder.iter_packages(compress(inner), version)) == expected
+    assert [(h, bytes(p)) for h, p in BLiveMsgPackage().iter_unpack_raw(frame)] == expected
+
+
+def test_streaming_decoder_truncated_tail():
+    inner = package(b'{"cmd":"A"}') + package(b'{"cmd":"LONG"}')[:-3]
+    packages = list(StreamingDecoder(chunk_size=8).iter_packages(zlib.compress(inner), ProtocolVersion.DEFLATE))
+    assert [p for _, p in packages] == [b'{"cmd":"A"}', b'{"cmd":"LON']
+
+
+def test_streaming_decoder_interleaved_generators():
+    decoder = StreamingDecoder(chunk_size=16)
+    a = [b'{"cmd":"A%d"}' % i for i in range(20)]
+    b = [b'{"cmd":"B%d"}' % i for i in range(20)]
+    gen_a = decoder.iter_packages(zlib.compress(b"".join(package(p) for p in a)), ProtocolVersion.DEFLATE)
+    first = [p for _, p in itertools.islice(gen_a, 3)]
+    # 同一个 decoder 上的另一帧在 gen_a 没有迭代完时完整解出, 之后 gen_a 继续
+    gen_b = decoder.iter_packages(zlib.compress(b"".join(package(p) for p in b)), ProtocolVersion.DEFLATE)
+    assert [p for _, p in gen_b] == b
+    assert first + [p for _, p in gen_a] == a
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import zlib
+
+from blive import BLiver, Events
+from blive.core import HeaderStruct, Operation, ProtocolVersion
+from blive.dedup import KEYS, Deduplicator
+
+
+def danmu(ts_ms, uid, content):
+    return {"cmd": "DANMU_MSG", "info": [[0, 1, 25, 0, ts_ms], content, [uid, "u"], [], [], [], 0, 0, None, {}]}
+
+
+def gift(**data):
+    base = {"uid": 1, "timestamp": 100, "giftId": 1, "batch_combo_id": "b", "num": 1}
+    base.update(data)
+    return {"cmd": "SEND_GIFT", "data": base}
+
+
+def test_keys():
+    assert KEYS["DANMU_MSG"](danmu(1000, 7, "hi")) == (1000, 7, "hi")
+    assert KEYS["SEND_GIFT"](gift(tid="t-1")) == "t-1"
+    # 没有 tid 时按 uid, 时间, 礼物, 连击 id, 数量组合
+    assert KEYS["SEND_GIFT"](gift()) == (1, 100, 1, "b", 1)
+    assert KEYS["SUPER_CHAT_MESSAGE"]({"data": {"id": 42}}) == 42
+    assert KEYS["USER_TOAST_MSG"]({"data": {"payflow_id": "p"}}) == "p"
+
+
+def test_duplicates_are_suppressed_per_room():
+    dedup = Deduplicator()
+    sc = {"cmd": "SUPER_CHAT_MESSAGE", "data": {"id": 42}}
+    assert not dedup.is_duplicate(510, "SUPER_CHAT_MESSAGE", sc)
+    assert dedup.is_duplicate(510, "SUPER_CHAT_MESSAGE", sc)
+    assert not dedup.is_duplicate(605, "SUPER_CHAT_MESSAGE", sc)  # 不同房间
+    assert not dedup.is_duplicate(510, "DANMU_MSG", danmu(1000, 7, "hi"))
+    assert not dedup.is_duplicate(510, "DANMU_MSG", danmu(1001, 7, "hi"))  # 同内容不同时间
+    # 没有 key 的 cmd 和格式不对的消息不做过滤
+    assert not dedup.is_duplicate(510, "ONLINE_RANK_COUNT", {}) and not dedup.is_duplicate(510, "ONLINE_RANK_COUNT", {})
+    assert not dedup.is_duplicate(510, "SUPER_CHAT_MESSAGE", {"data": {}})
+    assert dedup.stats() == {"checked": 5, "suppressed": {"SUPER_CHAT_MESSAGE": 1}, "size": 4}
+
+
+def test_ttl_and_max_size_eviction(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("blive.dedup.time.monotonic", lambda: now[0])
+    dedup = Deduplicator(ttl=10, max_size=2)
+    sc = lambda i: {"data": {"id": i}}  # noqa: E731
+    for i in range(3):
+        dedup.is_duplicate(510, "SUPER_CHAT_MESSAGE", sc(i))
+    assert len(dedup.seen) == 2 and not dedup.is_duplicate(510, "SUPER_CHAT_MESSAGE", sc(0))  # 0 已被淘汰
+    assert dedup.is_duplicate(510, "SUPER_CHAT_MESSAGE", sc(2))
+    now[0] = 11.0
+    assert not dedup.is_duplicate(510, "SUPER_CHAT_MESSAGE", sc(2))  # 超过 ttl 后当作新消息
+    assert len(dedup.seen) == 1
+
+
+def test_bliver_drops_redelivered_messages():
+    def package(body, version=ProtocolVersion.NORMAL):
+        return HeaderStruct.pack(HeaderStruct.size + len(body), HeaderStruct.size, version, Operation.NOTIFY, 0) + body
+
+    messages = [{"cmd": "SUPER_CHAT_MESSAGE", "data": {"id": i}} for i in (1, 2)]
+    frame = package(zlib.compress(b"".join(package(json.dumps(m).encode()) for m in messages)), ProtocolVersion.DEFLATE)
+
+    async def main():
+        app = BLiver(510, dedup=Deduplicator())
+        seen = []
+        app.on(Events.SUPER_CHAT_MESSAGE, lambda ctx: seen.append(ctx.body["data"]["id"]))
+        try:
+            app._handle_frame(frame)
+            app._handle_frame(frame)  # 重连后重新下发
+        finally:
+            await app.aio_session.close()
+        assert seen == [1, 2] and app.dedup.suppressed["SUPER_CHAT_MESSAGE"] == 2
+
+    asyncio.run(main())
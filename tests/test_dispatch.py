@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from blive.dispatch import BoundedDispatcher, OverflowPolicy
+
+
+class Room:
+    def __init__(self, room_id, handled, gate) -> None:
+        self.room_id = room_id
+        self.handled = handled
+        self.gate = gate
+        self.errors = []
+
+    def _listeners_for(self, cmd):
+        return [self.handler]
+
+    async def handler(self, ctx):
+        await self.gate.wait()
+        if ctx == "boom":
+            raise ValueError(ctx)
+        self.handled.append((self.room_id, ctx))
+
+    def _handle_error(self, error):
+        self.errors.append(error)
+
+
+async def drain(dispatcher):
+    while dispatcher.depth:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.01)
+    await dispatcher.close()
+
+
+@pytest.mark.parametrize(
+    "policy, expected",
+    [
+        (OverflowPolicy.DROP_OLDEST, ["m0", "m2", "m3"]),
+        (OverflowPolicy.DROP_NEWEST, ["m0", "m1", "m2"]),
+    ],
+)
+def test_drop_policies(policy, expected):
+    async def main():
+        handled, gate = [], asyncio.Event()
+        room = Room(1, handled, gate)
+        dispatcher = BoundedDispatcher(maxsize=2, policy=policy)
+        await dispatcher.put(room, "DANMU_MSG", "m0")
+        await asyncio.sleep(0)  # worker 取走 m0 后等待 gate
+        results = [await dispatcher.put(room, "DANMU_MSG", m) for m in ("m1", "m2", "m3")]
+        assert results == [True, True, policy == OverflowPolicy.DROP_OLDEST]
+        assert dispatcher.dropped == 1
+        gate.set()
+        await drain(dispatcher)
+        assert [ctx for _, ctx in handled] == expected
+        assert dispatcher.processed == 3
+
+    asyncio.run(main())
+
+
+def test_block_waits_for_free_slot():
+    async def main():
+        handled, gate = [], asyncio.Event()
+        room = Room(1, handled, gate)
+        dispatcher = BoundedDispatcher(maxsize=1, policy=OverflowPolicy.BLOCK)
+        await dispatcher.put(room, "DANMU_MSG", "m0")
+        await asyncio.sleep(0)
+        await dispatcher.put(room, "DANMU_MSG", "m1")
+        blocked = asyncio.ensure_future(dispatcher.put(room, "DANMU_MSG", "m2"))
+        await asyncio.sleep(0.01)
+        assert not blocked.done()
+        gate.set()
+        assert await blocked
+        await drain(dispatcher)
+        assert [ctx for _, ctx in handled] == ["m0", "m1", "m2"] and dispatcher.dropped == 0
+
+    asyncio.run(main())
+
+
+def test_per_event_queues_and_handler_errors():
+    async def main():
+        handled, gate, open_gate = [], asyncio.Event(), asyncio.Event()
+        open_gate.set()
+        slow, fast = Room(1, handled, gate), Room(2, handled, open_gate)
+        dispatcher = BoundedDispatcher(maxsize=10, per_event=True)
+        await dispatcher.put(slow, "SEND_GIFT", "gift")
+        await dispatcher.put(fast, "DANMU_MSG", "boom")
+        await dispatcher.put(fast, "DANMU_MSG", "danmu")
+        await asyncio.sleep(0.01)
+        # 慢 handler 只阻塞自己的 cmd, handler 的异常交给 bliver 处理, 不影响后续消息
+        assert handled == [(2, "danmu")] and [str(e) for e in fast.errors] == ["boom"]
+        gate.set()
+        await drain(dispatcher)
+        assert handled == [(2, "danmu"), (1, "gift")]
+
+    asyncio.run(main())
+
+
+def test_coalesce_keeps_latest_per_room():
+    async def main():
+        handled, gate = [], asyncio.Event()
+        a, b = Room(1, handled, gate), Room(2, handled, gate)
+        dispatcher = BoundedDispatcher(maxsize=2, policy=OverflowPolicy.COALESCE)
+        await dispatcher.put(a, "ONLINE_RANK_COUNT", "a1")
+        await asyncio.sleep(0)  # worker 取走 a1 后等待 gate
+        await dispatcher.put(a, "ONLINE_RANK_COUNT", "a2")
+        await dispatcher.put(b, "ONLINE_RANK_COUNT", "b1")
+        # 队列已满, 新消息只替换同一房间的旧消息
+        await dispatcher.put(a, "ONLINE_RANK_COUNT", "a3")
+        await dispatcher.put(b, "ONLINE_RANK_COUNT", "b2")
+        assert dispatcher.coalesced == 2 and dispatcher.dropped == 0
+        gate.set()
+        await drain(dispatcher)
+        assert handled == [(1, "a1"), (1, "a3"), (2, "b2")]
+
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+import asyncio
+import zlib
+
+from blive import eeframework
+from blive.core import HeaderStruct, Operation, ProtocolVersion
+
+
+def package(body: bytes, operation=Operation.NOTIFY, version=ProtocolVersion.NORMAL) -> bytes:
+    return HeaderStruct.pack(HeaderStruct.size + len(body), HeaderStruct.size, version, operation, 0) + body
+
+
+def frame(*bodies):
+    inner = b"".join(package(b) for b in bodies)
+    return package(zlib.compress(inner), version=ProtocolVersion.DEFLATE)
+
+
+def test_unlistened_cmds_are_not_decoded(monkeypatch):
+    built = []
+
+    class CountingCtx(eeframework.BLiverCtx):
+        def __init__(self, bliver, msg, *args, **kwargs) -> None:
+            super().__init__(bliver, msg, *args, **kwargs)
+            built.append(self.body["cmd"])
+
+    monkeypatch.setattr(eeframework, "BLiverCtx", CountingCtx)
+
+    async def main():
+        app = eeframework.BLiver(510)
+        received = []
+        app.on("DANMU_MSG", lambda ctx: received.append(ctx.body["info"]))
+        try:
+            app._handle_frame(
+                frame(
+                    b'{"cmd":"SEND_GIFT","data":{}}',
+                    b'{"cmd":"DANMU_MSG","info":1}',
+                    b'{"info":2,"cmd":"DANMU_MSG"}',  # cmd 不在开头, 完整解析后分发
+                    b'{"cmd":"INTERACT_WORD","data":{}}',
+                )
+            )
+        finally:
+            await app.aio_session.close()
+        assert received == [1, 2]
+        assert built == ["DANMU_MSG", "DANMU_MSG"]
+
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import zlib
+from types import SimpleNamespace
+
+import pytest
+
+from blive import BLiver, Events
+from blive.core import HeaderStruct, Operation, ProtocolVersion
+from blive.filters import FilterIndex, Ge, Lt, Ne
+from blive.msg import DanMuMsg
+
+
+def danmu(uid, level=0, content="x"):
+    return {"cmd": "DANMU_MSG", "info": [[0], content, [uid, f"user{uid}"], [level, "medal"], [], [], 0, 0, None, {}]}
+
+
+def ctx(uid, level=0, room_id=510):
+    return SimpleNamespace(bliver=SimpleNamespace(room_id=room_id, real_room_id=room_id), message=DanMuMsg(danmu(uid, level)))
+
+
+def test_filter_index_matches_in_registration_order():
+    index = FilterIndex(Events.DANMU_MSG)
+    index.add("vip", {"uid": {1, 2}})
+    index.add("fan", {"medal_level": Ge(20)})
+    index.add("room", {"room_id": 605, "uid": Ne(3)})
+    index.add("custom", {"uname": lambda name: name.endswith("9")})
+    index.add("low-vip", {"medal_level": Lt(5), "uid": 2})
+    assert index.match(ctx(1)) == ["vip"]
+    assert index.match(ctx(2, level=21)) == ["vip", "fan"]
+    assert index.match(ctx(2, level=1)) == ["vip", "low-vip"]
+    assert index.match(ctx(4, room_id=605)) == ["room"]
+    assert index.match(ctx(3, room_id=605)) == []
+    assert index.match(ctx(9, level=30)) == ["fan", "custom"]
+
+
+def test_filter_index_rejects_unknown_fields():
+    with pytest.raises(ValueError):
+        FilterIndex(Events.DANMU_MSG).add("h", {"no_such_field": 1})
+    with pytest.raises(ValueError):
+        FilterIndex(Events.ONLINE_RANK_COUNT)
+
+
+def test_bliver_on_with_filters():
+    def package(body, version=ProtocolVersion.NORMAL):
+        return HeaderStruct.pack(HeaderStruct.size + len(body), HeaderStruct.size, version, Operation.NOTIFY, 0) + body
+
+    inner = b"".join(package(json.dumps(danmu(uid)).encode()) for uid in (1, 2, 3))
+    frame = package(zlib.compress(inner), ProtocolVersion.DEFLATE)
+
+    async def main():
+        app = BLiver(510)
+        seen, everything = [], []
+
+        @app.on(Events.DANMU_MSG, uid={2, 3})
+        async def watch(ctx):
+            seen.append(ctx.message.sender.id)
+
+        app.on(Events.DANMU_MSG, lambda ctx: everything.append(ctx.message.sender.id))
+        try:
+            app._handle_frame(frame)
+            await asyncio.sleep(0.01)
+        finally:
+            await app.aio_session.close()
+        assert seen == [2, 3] and everything == [1, 2, 3]
+
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import aiohttp
+from aiohttp import web
+
+from blive import Events
+from blive.gateway import Gateway
+from blive.hub import BLiveHub
+
+
+def ctx(room_id, body):
+    return SimpleNamespace(bliver=SimpleNamespace(room_id=room_id), msg=(None, json.dumps(body).encode()), body=body)
+
+
+async def start(gateway):
+    runner = web.AppRunner(gateway.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+
+def test_ws_and_sse_clients_share_encoded_batches():
+    async def main():
+        gateway = Gateway(BLiveHub(), manage_rooms=False, batch_delay=0.01)
+        runner, url = await start(gateway)
+        try:
+            async with aiohttp.ClientSession() as session:
+                ws1 = await session.ws_connect(f"{url}/ws?rooms=510&cmds=DANMU_MSG")
+                ws2 = await session.ws_connect(f"{url}/ws?rooms=510&cmds=DANMU_MSG")
+                sse = await session.get(f"{url}/sse?rooms=510,605")
+                assert sse.headers["Content-Type"] == "text/event-stream"
+                for _ in range(50):
+                    if gateway.stats()["clients"] == 3:
+                        break
+                    await asyncio.sleep(0.01)
+                assert gateway.stats()["groups"] == 2
+
+                gateway.hub.emit(Events.DANMU_MSG, ctx(510, {"cmd": "DANMU_MSG", "i": 1}))
+                gateway.hub.emit(Events.DANMU_MSG, ctx(510, {"cmd": "DANMU_MSG", "i": 2}))
+                gateway.hub.emit(Events.SEND_GIFT, ctx(605, {"cmd": "SEND_GIFT", "i": 3}))
+                gateway.hub.emit(Events.DANMU_MSG, ctx(21, {"cmd": "DANMU_MSG", "i": 4}))  # 没有订阅
+
+                expected = [{"room_id": 510, "data": {"cmd": "DANMU_MSG", "i": i}} for i in (1, 2)]
+                assert json.loads(await ws1.receive_str(timeout=2)) == expected
+                assert json.loads(await ws2.receive_str(timeout=2)) == expected
+                line = await asyncio.wait_for(sse.content.readline(), 2)
+                assert line.startswith(b"data: ")
+                assert [m["data"]["i"] for m in json.loads(line[6:])] == [1, 2, 3]
+                # 两个 websocket 客户端同组, 每组每批只编码一次
+                assert gateway.stats()["messages"] == 3 and gateway.stats()["frames"] == 2
+                await ws1.close()
+                await ws2.close()
+                sse.close()
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(main())
+
+
+def test_rejects_bad_subscriptions():
+    async def main():
+        gateway = Gateway(BLiveHub(), manage_rooms=False, max_rooms=2)
+        runner, url = await start(gateway)
+        try:
+            async with aiohttp.ClientSession() as session:
+                for query in ("rooms=abc", "rooms=", "rooms=1,2,3", "rooms=1&cmds=NOT_A_CMD"):
+                    async with session.get(f"{url}/sse?{query}") as resp:
+                        assert resp.status == 400, query
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(main())
+
+
+def test_disconnects_slow_clients():
+    # 在事件循环外创建, 等到第一次使用时才创建 asyncio 对象
+    gateway = Gateway(BLiveHub(), manage_rooms=False, batch_delay=0.01, max_buffer=-1)
+
+    async def main():
+        runner, url = await start(gateway)
+        try:
+            async with aiohttp.ClientSession() as session:
+                ws = await session.ws_connect(f"{url}/ws?rooms=510")
+                for _ in range(50):
+                    if gateway.stats()["clients"]:
+                        break
+                    await asyncio.sleep(0.01)
+                gateway.hub.emit(Events.DANMU_MSG, ctx(510, {"cmd": "DANMU_MSG"}))
+                msg = await ws.receive(timeout=2)
+                assert msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR)
+                assert gateway.stats()["slow_clients"] == 1
+                for _ in range(50):
+                    if not gateway.groups:
+                        break
+                    await asyncio.sleep(0.01)
+                assert gateway.stats()["clients"] == 0
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+import asyncio
+
+from blive import Events, eeframework
+from blive.hub import BLiveHub
+from blive.mockserver import MockBLiveServer
+from blive.reconnect import ConfCache, Reconnector, TokenBucket
+
+
+def test_rooms_share_session_and_heartbeat_wheel():
+    async def main():
+        server = await MockBLiveServer().start()
+        hub = BLiveHub(ssl=False, api_host=server.api_host, heartbeat_interval=1)
+        seen = []
+        hub.on(Events.HEARTBEAT_REPLY, lambda ctx: seen.append(ctx.bliver.room_id))
+        rooms = [hub.add_room(510), hub.add_room(605)]
+        try:
+            assert hub.add_room(510) is rooms[0]
+            assert all(room.aio_session is hub.aio_session for room in rooms)
+            for _ in range(60):
+                if set(seen) == {510, 605}:
+                    break
+                await asyncio.sleep(0.05)
+            # 心跳由 hub 的时间轮发送, 回复分发到 hub 上的 handler
+            assert set(seen) == {510, 605}
+            await hub.remove_room(605)
+            assert list(hub.rooms) == [510] and not hub.aio_session.closed
+        finally:
+            await hub.close()
+            await server.close()
+
+    asyncio.run(main())
+
+
+def test_room_task_restarts_after_error():
+    async def main():
+        server = await MockBLiveServer(rate=50).start()
+        hub = BLiveHub(
+            ssl=False,
+            api_host=server.api_host,
+            reconnector=lambda: Reconnector(limiter=TokenBucket(1e9, 1e9), cache=ConfCache()),
+            restart_delay=0.05,
+        )
+        errors, count = [], [0]
+        hub.on("error", errors.append)
+        hub.on(Events.DANMU_MSG, lambda ctx: count.__setitem__(0, count[0] + 1))
+        room = hub.add_room(510)
+        dispatch_frame = room._dispatch_frame
+
+        async def broken(data):
+            room._dispatch_frame = dispatch_frame
+            raise ValueError("bad frame")
+
+        room._dispatch_frame = broken
+        try:
+            for _ in range(100):
+                if count[0]:
+                    break
+                await asyncio.sleep(0.05)
+            assert [type(e) for e in errors] == [ValueError]
+            assert count[0] and hub.rooms[510] is room
+            assert not hub.tasks[510].done()
+        finally:
+            await hub.close()
+            await server.close()
+
+    asyncio.run(main())
+
+
+def test_room_filter_skips_decode(monkeypatch):
+    built = []
+
+    class CountingCtx(eeframework.BLiverCtx):
+        def __init__(self, bliver, msg, body=None) -> None:
+            super().__init__(bliver, msg, body)
+            if self.body.get("cmd") == Events.DANMU_MSG:
+                built.append(bliver.room_id)
+
+    monkeypatch.setattr(eeframework, "BLiverCtx", CountingCtx)
+
+    async def main():
+        server = await MockBLiveServer(rate=50).start()
+        hub = BLiveHub(ssl=False, api_host=server.api_host)
+        seen = []
+        hub.on(Events.DANMU_MSG, lambda ctx: seen.append(ctx.bliver.room_id), room_id=605)
+        hub.add_room(510)
+        hub.add_room(605)
+        try:
+            # 两个房间都收到若干个数据帧
+            await asyncio.sleep(1.5)
+            assert seen and set(seen) == {605}
+            # 510 只有 room_id 不满足的 handler, 消息在创建 ctx (解析 json) 之前就被跳过
+            assert 510 not in built and 605 in built
+        finally:
+            await hub.close()
+            await server.close()
+
+    asyncio.run(main())
+
+
+def test_add_room_before_run():
+    # README 中的用法: 在事件循环启动前 add_room, 再 hub.run()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        server = loop.run_until_complete(MockBLiveServer(rate=50).start())
+        hub = BLiveHub(ssl=False, api_host=server.api_host)
+        room = hub.add_room(510)
+        assert hub.aio_session is None and not hub.tasks
+        seen = []
+
+        def on_danmu(ctx):
+            seen.append(ctx.bliver.room_id)
+            loop.stop()
+
+        hub.on(Events.DANMU_MSG, on_danmu)
+        loop.call_later(10, loop.stop)
+        hub.run()
+        assert seen and seen[0] == 510
+        assert room.aio_session is hub.aio_session and not hub.aio_session.closed
+        loop.run_until_complete(hub.close())
+        loop.run_until_complete(server.close())
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+import pytest
+
+from blive import BLiver, Events
+from blive import core
+from blive.core import BLiveMsgPackage, HeaderStruct, Operation, PackageHeader, ProtocolVersion
+from blive.mockserver import MockBLiveServer, pack_notify
+
+
+@pytest.mark.parametrize("version", [ProtocolVersion.DEFLATE, ProtocolVersion.BROTLI])
+def test_pack_notify_roundtrip(version):
+    if version == ProtocolVersion.BROTLI and core.brotli is None:
+        pytest.skip("brotli is not installed")
+    messages = [{"cmd": "DANMU_MSG", "i": i} for i in range(3)]
+    packages = BLiveMsgPackage().unpack(pack_notify(messages, version))
+    assert [json.loads(body) for _, body in packages] == messages
+
+
+def test_pushes_at_rate_with_timestamps():
+    async def main():
+        server = await MockBLiveServer(rate=100, batch=5).start()
+        app = BLiver(510, ssl=False, api_host=server.api_host)
+        received = []
+        app.on(Events.DANMU_MSG, lambda ctx: received.append(ctx.body))
+        task = asyncio.ensure_future(app.listen())
+        try:
+            for _ in range(60):
+                if len(received) >= 3:
+                    break
+                await asyncio.sleep(0.05)
+            assert len(received) >= 3 and server.sent >= len(received)
+            assert all("_mock_ts" in body for body in received)
+        finally:
+            await app.graceful_close()
+            task.cancel()
+            await server.close()
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("protover", [2, 3])
+def test_frames_follow_client_protover(protover):
+    if protover == 3 and core.brotli is None:
+        pytest.skip("brotli is not installed")
+
+    class Versions:
+        def __init__(self) -> None:
+            self.seen = set()
+
+        def write(self, room_id, data):
+            header = PackageHeader(*HeaderStruct.unpack_from(data))
+            if header.operation == Operation.NOTIFY:
+                self.seen.add(header.version)
+
+    async def main():
+        server = await MockBLiveServer(rate=100, batch=5).start()
+        versions = Versions()
+        app = BLiver(510, ssl=False, api_host=server.api_host, protover=protover, recorder=versions)
+        task = asyncio.ensure_future(app.listen())
+        try:
+            for _ in range(60):
+                if versions.seen:
+                    break
+                await asyncio.sleep(0.05)
+            assert versions.seen == {protover}
+        finally:
+            await app.graceful_close()
+            task.cancel()
+            await server.close()
+
+    asyncio.run(main())
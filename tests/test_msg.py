@@ -0,0 +1,124 @@
+import asyncio
+import json
+import zlib
+
+from blive import BLiver, Events
+from blive.core import HeaderStruct, Operation, ProtocolVersion
+from blive.msg import (
+    _MSG_CLASSES,
+    BaseMsg,
+    DanMuMsg,
+    InteractWordMsg,
+    SendGiftMsg,
+    dict_chain_get,
+    field,
+    msg_class_for,
+    register_msg_class,
+)
+
+
+DANMU = {
+    "cmd": "DANMU_MSG",
+    "info": [[0, 1, 25], "弹幕内容", [1234, "用户"], [21, "小孩梓", "阿梓", 510], [12, 0], ["", ""], 0, 0, None, 1650000000],
+}
+
+GIFT = {
+    "cmd": "SEND_GIFT",
+    "data": {
+        "uid": 42,
+        "uname": "送礼用户",
+        "action": "投喂",
+        "giftId": 30607,
+        "giftName": "小心心",
+        "giftType": 0,
+        "batch_combo_id": "batch:1",
+        "combo_total_coin": 100,
+        "medal_info": {"medal_level": 3, "medal_name": "粉丝牌"},
+    },
+}
+
+
+def test_dict_chain_get():
+    assert dict_chain_get(GIFT, "data.medal_info.medal_level") == 3
+    assert dict_chain_get(DANMU, ("info", 2, 1)) == "用户"
+    assert dict_chain_get(GIFT, "data.missing.x", default=-1) == -1
+    assert dict_chain_get(DANMU, ("info", 99)) is None
+
+
+def test_field_paths_and_defaults():
+    class Msg(DanMuMsg):
+        __slots__ = ()
+        action = field("data.action")
+        missing = field("data.nope.nested", default="n/a")
+
+    msg = Msg(GIFT)
+    assert msg.action == "投喂" and msg.missing == "n/a"
+    assert isinstance(Msg.action, field)
+
+
+def test_danmu_msg():
+    msg = DanMuMsg(DANMU)
+    assert msg.cmd == "DANMU_MSG" and msg.content == "弹幕内容" and msg.timestamp == 1650000000
+    sender = msg.sender
+    assert (sender.id, sender.name, sender.medal.medal_name, sender.medal.medal_level) == (1234, "用户", "小孩梓", 21)
+    assert sender["name"] == "用户"
+    no_medal = DanMuMsg({"info": DANMU["info"][:3] + [[]] + DANMU["info"][4:]}).sender.medal
+    assert (no_medal.medal_name, no_medal.medal_level) == ("", 0)
+
+
+def test_send_gift_msg():
+    msg = SendGiftMsg(GIFT)
+    assert msg.sender.name == "送礼用户" and msg.sender.medal.medal_level == 3
+    assert msg.gift == {"gift_id": 30607, "gift_name": "小心心", "gift_type": 0}
+    assert msg.combo["batch_combo_id"] == "batch:1" and msg.combo["combo_send"] is None
+    # 计算过的属性在同一个消息对象上只构造一次
+    assert msg.sender is msg.sender and msg.gift is msg.gift
+
+
+def test_wrappers_accept_custom_attributes():
+    msg = SendGiftMsg(GIFT)
+    msg.note = "vip"
+    msg.sender.level = 5
+    msg.sender["tag"] = "x"
+    msg.sender.medal.color = "red"
+    # sender 在消息对象上缓存, 之后访问拿到的是同一个对象
+    assert (msg.note, msg.sender.level, msg.sender.tag, msg.sender.medal.color) == ("vip", 5, "x", "red")
+
+
+def test_interact_word_without_medal():
+    msg = InteractWordMsg({"cmd": "INTERACT_WORD", "data": {"uid": 1, "uname": "u", "timestamp": 5}})
+    assert (msg.user.id, msg.user.name, msg.user.medal.medal_name, msg.timestamp) == (1, "u", None, 5)
+
+
+def test_msg_class_registry(monkeypatch):
+    assert msg_class_for("DANMU_MSG") is DanMuMsg
+    assert msg_class_for("DANMU_MSG:4:0:2:2:2:0") is DanMuMsg
+    assert msg_class_for("UNKNOWN_CMD") is BaseMsg and msg_class_for(None) is BaseMsg
+    monkeypatch.setattr("blive.msg._MSG_CLASSES", dict(_MSG_CLASSES))
+
+    @register_msg_class("WARNING")
+    class WarningMsg(BaseMsg):
+        __slots__ = ()
+
+    assert msg_class_for(Events.WARNING) is WarningMsg
+
+
+def test_ctx_message_is_shared_by_handlers():
+    def package(body, version=ProtocolVersion.NORMAL):
+        return HeaderStruct.pack(HeaderStruct.size + len(body), HeaderStruct.size, version, Operation.NOTIFY, 0) + body
+
+    frame = package(zlib.compress(package(json.dumps(DANMU).encode())), ProtocolVersion.DEFLATE)
+
+    async def main():
+        app = BLiver(510)
+        seen = []
+        app.on(Events.DANMU_MSG, lambda ctx: seen.append(ctx.message))
+        app.on(Events.DANMU_MSG, lambda ctx: seen.append(ctx.message))
+        try:
+            app._handle_frame(frame)
+        finally:
+            await app.aio_session.close()
+        assert isinstance(seen[0], DanMuMsg) and seen[0] is seen[1]
+        assert seen[0].content == "弹幕内容"
+
+    asyncio.run(main())
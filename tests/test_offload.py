@@ -0,0 +1,38 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from blive import BLiver, Events
+from blive.core import ProtocolVersion
+from blive.mockserver import pack_notify
+from blive.offload import FrameOffloader, unpack_frame
+
+MESSAGES = [{"cmd": "DANMU_MSG", "i": 0}, {"cmd": "INTERACT_WORD"}, {"cmd": "DANMU_MSG", "i": 1}]
+
+
+def test_unpack_frame_skips_unwanted_cmds():
+    frame = pack_notify(MESSAGES, ProtocolVersion.DEFLATE)
+    assert [body for _, body in unpack_frame(frame)] == MESSAGES
+    assert [body["i"] for _, body in unpack_frame(frame, wanted={"DANMU_MSG"})] == [0, 1]
+
+
+@pytest.mark.parametrize("parse", [False, True])
+def test_large_frames_are_offloaded(parse):
+    async def main():
+        small = pack_notify(MESSAGES[:1], ProtocolVersion.DEFLATE)
+        large = pack_notify(MESSAGES + [{"cmd": "DANMU_MSG", "i": i} for i in range(2, 50)])
+        offloader = FrameOffloader(ThreadPoolExecutor(1), threshold=len(small), parse=parse)
+        app = BLiver(510, offloader=offloader)
+        received = []
+        app.on(Events.DANMU_MSG, lambda ctx: received.append(ctx.body["i"]))
+        try:
+            await app._dispatch_frame(small)
+            await app._dispatch_frame(large)
+        finally:
+            offloader.shutdown()
+            await app.aio_session.close()
+        assert offloader.offloaded == 1
+        assert received == [0] + list(range(50))
+
+    asyncio.run(main())
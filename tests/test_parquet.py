@@ -0,0 +1,94 @@
+import asyncio
+import glob
+import os
+import time
+
+import pytest
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from blive import Events  # noqa: E402
+from blive.core import ProtocolVersion  # noqa: E402
+from blive.mockserver import pack_notify  # noqa: E402
+from blive.msg import DanMuMsg, SendGiftMsg  # noqa: E402
+from blive.parquet import ParquetSink, PartitionWriter, _hour, convert_recording  # noqa: E402
+from blive.record import FrameRecorder  # noqa: E402
+from blive.rows import extract_row  # noqa: E402
+
+TS = 1653220800.5  # 2022-05-22 12:00:00.5 UTC
+
+
+def danmu(uid, content):
+    return {"cmd": "DANMU_MSG", "info": [[0], content, [uid, f"user{uid}"], [21, "medal"], [], [], 0, 0, None, {}]}
+
+
+def gift(uid):
+    return {"cmd": "SEND_GIFT", "data": {"uid": uid, "uname": "g", "giftId": 1, "giftName": "小心心", "num": 2, "price": 100}}
+
+
+def read(root, cmd):
+    files = sorted(glob.glob(os.path.join(str(root), cmd, "room_id=*", "date=*", "hour=*", "*.parquet")))
+    return files, [row for f in files for row in pq.read_table(f).to_pylist()]
+
+
+def test_sink_writes_partitioned_files(tmp_path):
+    async def main():
+        sink = ParquetSink(str(tmp_path), max_rows=2, flush_interval=60)
+        sink.add(Events.DANMU_MSG, 510, DanMuMsg(danmu(1, "a")), ts=TS)
+        sink.add(Events.DANMU_MSG, 510, DanMuMsg(danmu(2, "b")), ts=TS + 1)  # 攒够 max_rows, 写入一个 row group
+        sink.add(Events.DANMU_MSG, 510, DanMuMsg(danmu(3, "c")), ts=TS + 2)
+        sink.add(Events.DANMU_MSG, 605, DanMuMsg(danmu(4, "d")), ts=TS + 3600)
+        sink.add(Events.SEND_GIFT, 510, SendGiftMsg(gift(5)), ts=TS)
+        await sink.close()
+        return sink
+
+    sink = asyncio.run(main())
+    files, rows = read(tmp_path, "DANMU_MSG")
+    assert len(files) == 2 and sink.writer.rows == 5
+    assert [(r["uid"], r["content"], r["medal_level"]) for r in rows] == [(1, "a", 21), (2, "b", 21), (3, "c", 21), (4, "d", 21)]
+    assert "room_id" not in rows[0]  # room_id 在分区路径中
+    assert rows[0]["ts"].timestamp() == TS
+    files, rows = read(tmp_path, "SEND_GIFT")
+    assert [(r["uid"], r["gift_name"], r["num"], r["coin_type"]) for r in rows] == [(5, "小心心", 2, None)]
+
+
+def test_convert_recording(tmp_path):
+    path = str(tmp_path / "frames.rec")
+    recorder = FrameRecorder(path)
+    recorder.write(510, pack_notify([danmu(1, "a"), {"cmd": "ONLINE_RANK_COUNT", "data": {"count": 1}}, gift(2)], ProtocolVersion.DEFLATE), ts=TS)
+    recorder.write(510, pack_notify([danmu(3, "b")], ProtocolVersion.DEFLATE), ts=TS + 1)
+    recorder.close()
+    assert convert_recording(path, str(tmp_path / "out")) == 3
+    _, rows = read(tmp_path / "out", "DANMU_MSG")
+    assert [r["content"] for r in rows] == ["a", "b"]
+    _, rows = read(tmp_path / "out", "SEND_GIFT")
+    assert [r["uid"] for r in rows] == [2]
+
+
+def test_writer_caps_open_files(tmp_path):
+    writer = PartitionWriter(str(tmp_path), max_open=2)
+
+    def write(room_id, uid):
+        row = extract_row(Events.DANMU_MSG, DanMuMsg(danmu(uid, "x")), room_id, TS)
+        writer.write((Events.DANMU_MSG, room_id, _hour(TS)), [row])
+
+    for room_id in (1, 2, 3):
+        write(room_id, room_id)
+        assert len(writer.writers) <= 2
+    write(2, 4)  # 仍然打开, 写入同一个文件
+    write(1, 5)  # 已被关闭, 写入新文件
+    writer.close()
+    files, rows = read(tmp_path, "DANMU_MSG")
+    assert writer.files == 4 and len(files) == 4
+    assert sorted(r["uid"] for r in rows) == [1, 2, 3, 4, 5]
+
+
+def test_partition_path_is_utc(tmp_path, monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Shanghai")
+    time.tzset()
+    try:
+        path = PartitionWriter(str(tmp_path)).path_for((Events.DANMU_MSG, 510, _hour(TS)))
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    assert os.path.join("date=2022-05-22", "hour=12") in path
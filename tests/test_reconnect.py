@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import aiohttp
+
+from blive import BLiver, Events
+from blive.mockserver import MockBLiveServer
+from blive.reconnect import Backoff, ConfCache, Reconnector, TokenBucket
+
+
+def test_backoff_grows_and_resets(monkeypatch):
+    monkeypatch.setattr("blive.reconnect.random.uniform", lambda a, b: b)
+    backoff = Backoff(base=1.0, cap=5.0)
+    assert [backoff.next_delay() for _ in range(6)] == [0.0, 1.0, 2.0, 4.0, 5.0, 5.0]
+    backoff.reset()
+    assert backoff.next_delay() == 0.0
+
+
+def test_token_bucket_reserves_in_order(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("blive.reconnect.time.monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=10, burst=2)
+    assert [round(bucket.reserve(), 3) for _ in range(4)] == [0.0, 0.0, 0.1, 0.2]
+    assert bucket.waited == 2
+    now[0] = 1.0  # 补充 10 个令牌, 但最多积攒 burst 个
+    assert bucket.reserve() == 0.0 and bucket.tokens == 1.0
+
+
+def test_conf_cache_rotates_hosts_and_expires(monkeypatch):
+    cache = ConfCache(ttl=10)
+    conf = cache.put(510, "token", ["a", "b", "c"])
+    assert cache.get(510) is conf and cache.get(605) is None
+    first = conf.host()
+    assert conf.rotate() and conf.rotate() and not conf.rotate()  # 三个服务器都失败过
+    assert conf.host() == first
+    real = time.monotonic
+    monkeypatch.setattr("blive.reconnect.time.monotonic", lambda: real() + 11)
+    assert cache.get(510) is None
+
+
+def test_reconnector_failed_and_succeeded():
+    cache = ConfCache()
+    reconnector = Reconnector(limiter=TokenBucket(1e9, 1e9), cache=cache)
+    cache.put(510, "token", ["a", "b"])
+    reconnector.backoff.attempt = 3
+    reconnector.failed(510)
+    assert cache.confs[510].failed == 1
+    reconnector.succeeded(510)
+    assert reconnector.backoff.attempt == 0 and cache.confs[510].failed == 0
+    reconnector.failed(510)
+    reconnector.failed(510)  # 所有服务器都失败, 丢弃缓存
+    assert 510 not in cache.confs
+
+
+def test_endpoint_requests_conf_once():
+    async def main():
+        server = await MockBLiveServer().start()
+        reconnector = Reconnector(limiter=TokenBucket(1e9, 1e9), cache=ConfCache())
+        async with aiohttp.ClientSession() as session:
+            try:
+                first = await reconnector.endpoint(510, session, ssl=False, api_host=server.api_host)
+                second = await reconnector.endpoint(510, session, ssl=False, api_host=server.api_host)
+            finally:
+                await server.close()
+        assert first == second == (f"ws://{server.host}:{server.port}/sub", server.token)
+        assert (reconnector.cache.misses, reconnector.cache.hits) == (1, 1)
+
+    asyncio.run(main())
+
+
+async def wait_until(predicate, timeout=10):
+    deadline = asyncio.get_event_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_event_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+def test_listen_survives_server_restart():
+    async def main():
+        server = await MockBLiveServer(rate=50).start()
+        port = server.port
+        reconnector = Reconnector(base=0.05, cap=0.2, retries=2, limiter=TokenBucket(1e9, 1e9), cache=ConfCache())
+        app = BLiver(510, ssl=False, api_host=server.api_host, reconnector=reconnector)
+        errors, count = [], [0]
+        app.on("error", errors.append)
+        app.on(Events.DANMU_MSG, lambda ctx: count.__setitem__(0, count[0] + 1))
+        task = asyncio.ensure_future(app.listen())
+        try:
+            assert await wait_until(lambda: count[0] > 0)
+            await server.close()
+            # 服务器停止期间用完多轮 retries, listen 报告错误但不退出
+            assert await wait_until(lambda: len(errors) >= 2)
+            assert not task.done()
+
+            server = await MockBLiveServer(port=port, rate=50).start()
+            before = count[0]
+            assert await wait_until(lambda: count[0] > before)
+        finally:
+            await app.graceful_close()
+            await server.close()
+            await asyncio.wait_for(task, 5)
+
+    asyncio.run(main())
+
+
+def test_listen_refreshes_stale_token_after_auth_failure():
+    async def main():
+        server = await MockBLiveServer(rate=50).start()
+        cache = ConfCache()
+        cache.put(510, "stale-token", [{"host": "127.0.0.1", "ws_port": server.port}])
+        reconnector = Reconnector(base=0.05, cap=0.2, limiter=TokenBucket(1e9, 1e9), cache=cache)
+        app = BLiver(510, ssl=False, api_host=server.api_host, reconnector=reconnector)
+        errors, backoff, count = [], [], [0]
+        app.on("error", errors.append)
+
+        def on_danmu(ctx):
+            if not count[0]:
+                backoff.append(reconnector.backoff.attempt)
+            count[0] += 1
+
+        app.on(Events.DANMU_MSG, on_danmu)
+        task = asyncio.ensure_future(app.listen())
+        try:
+            assert await wait_until(lambda: count[0] > 0)
+            # 认证失败不算连接成功: 清除缓存的 token, 按退避重连, 收到 NOTIFY 后才重置退避
+            assert [str(e) for e in errors] == ["认证失败 (room 510, code -101)"]
+            assert cache.confs[510].token == server.token and cache.misses == 2
+            assert reconnector.attempts == 2 and backoff == [0]
+        finally:
+            await app.graceful_close()
+            await server.close()
+            await asyncio.wait_for(task, 5)
+
+    asyncio.run(main())
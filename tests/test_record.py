@@ -0,0 +1,74 @@
+import asyncio
+
+from blive import BLiver, Events
+from blive.core import ProtocolVersion
+from blive.mockserver import pack_notify
+from blive.record import FrameRecorder, ReplaySource, iter_records
+
+
+def test_records_roundtrip_and_truncated_tail(tmp_path):
+    path = str(tmp_path / "frames.rec")
+    recorder = FrameRecorder(path)
+    recorder.write(510, b"first", ts=1.0)
+    recorder.write(605, b"second", ts=2.0)
+    recorder.close()
+    with open(path, "ab") as f:
+        f.write(b"\x00\x00\x00\x10partial")  # 没有写完整的记录被忽略
+    assert [(ts, room, bytes(data)) for ts, room, data in iter_records(path)] == [
+        (1.0, 510, b"first"),
+        (2.0, 605, b"second"),
+    ]
+
+
+def test_segments_are_replayed_in_order(tmp_path):
+    recorder = FrameRecorder(str(tmp_path / "frames.rec"), segment_size=32)
+    for i in range(4):
+        recorder.write(510, b"frame-%d" % i, ts=float(i))
+    recorder.close()
+    source = ReplaySource(str(tmp_path / "frames.*.rec"))
+    assert len(source.paths) > 1
+    assert [bytes(data) for _, _, data in source] == [b"frame-%d" % i for i in range(4)]
+
+
+def test_replay_into_bliver(tmp_path):
+    path = str(tmp_path / "frames.rec")
+    recorder = FrameRecorder(path)
+    for i in range(3):
+        recorder.write(510, pack_notify([{"cmd": "DANMU_MSG", "i": i}] * 2, ProtocolVersion.DEFLATE))
+    recorder.close()
+
+    async def main():
+        app = BLiver(510)
+        received = []
+        app.on(Events.DANMU_MSG, lambda ctx: received.append(ctx.body["i"]))
+        try:
+            assert await ReplaySource(path).replay(app) == 3
+        finally:
+            await app.aio_session.close()
+        assert received == [0, 0, 1, 1, 2, 2]
+
+    asyncio.run(main())
+
+
+def test_replay_routes_by_real_room_id(tmp_path):
+    path = str(tmp_path / "frames.rec")
+    recorder = FrameRecorder(path)
+    recorder.write(5440, pack_notify([{"cmd": "DANMU_MSG", "i": 0}], ProtocolVersion.DEFLATE))  # 短号 1 的真实房间号
+    recorder.write(605, pack_notify([{"cmd": "DANMU_MSG", "i": 1}], ProtocolVersion.DEFLATE))
+    recorder.close()
+
+    async def main():
+        short, plain = BLiver(1), BLiver(605)
+        short.real_room_id = 5440  # 连接后由 connect 设置
+        received = []
+        for app in (short, plain):
+            app.on(Events.DANMU_MSG, lambda ctx: received.append((ctx.bliver.room_id, ctx.body["i"])))
+        try:
+            # 与 hub.rooms 一样以 add_room 时的房间号为 key
+            assert await ReplaySource(path).replay({1: short, 605: plain}) == 2
+        finally:
+            await short.aio_session.close()
+            await plain.aio_session.close()
+        assert received == [(1, 0), (605, 1)]
+
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+
+from blive.mockserver import MockBLiveServer
+from blive.reconnect import ConfCache
+from blive.resolver import RoomResolver
+
+INFO_PATH = "/xlive/web-room/v1/index/getInfoByRoom"
+
+
+def info_requests(server):
+    return sum(1 for _, path in server.requests if path == INFO_PATH)
+
+
+def test_resolve_many_fetches_each_room_once(tmp_path):
+    path = str(tmp_path / "rooms.json")
+
+    async def main():
+        server = await MockBLiveServer(api_delay=0.02).start()
+        resolver = RoomResolver(path, concurrency=2)
+        try:
+            async with aiohttp.ClientSession() as session:
+                # 同一房间的并发请求合并为一次
+                results = await resolver.resolve_many([510, 605, 510, 21], session, api_host=server.api_host)
+                assert results == {510: (510, "mock-510"), 605: (605, "mock-605"), 21: (21, "mock-21")}
+                assert info_requests(server) == 3 and resolver.fetched == 3
+                assert await resolver.resolve(510, session, api_host=server.api_host) == (510, "mock-510")
+                assert info_requests(server) == 3 and resolver.hits == 1
+                await resolver.close()
+        finally:
+            await server.close()
+        with open(path, encoding="utf-8") as f:
+            assert set(json.load(f)["rooms"]) == {"510", "605", "21"}
+
+    asyncio.run(main())
+
+
+def test_cache_file_survives_restart_and_refreshes_stale_entries(tmp_path):
+    path = str(tmp_path / "rooms.json")
+    conf_cache = ConfCache()
+    conf_cache.put(510, "token", [{"host": "h", "port": 1, "wss_port": 2, "ws_port": 3}])
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"rooms": {"510": [510, "old-name", time.time() - 100]}}, f)
+
+    async def main():
+        resolver = RoomResolver(path, ttl=10, conf_cache=conf_cache)
+        server = await MockBLiveServer().start()
+        try:
+            async with aiohttp.ClientSession() as session:
+                # 过期的信息先直接返回, 同时在后台刷新
+                assert await resolver.resolve(510, session, api_host=server.api_host) == (510, "old-name")
+                for _ in range(50):
+                    if resolver.fetched:
+                        break
+                    await asyncio.sleep(0.02)
+                assert resolver.rooms[510][1] == "mock-510"
+                await resolver.close()
+        finally:
+            await server.close()
+
+        restored = ConfCache()
+        RoomResolver(path, conf_cache=restored)
+        assert restored.confs[510].token == "token" and restored.get(510) is not None
+
+    asyncio.run(main())
+
+
+def test_missing_or_corrupt_cache_file(tmp_path):
+    path = tmp_path / "rooms.json"
+    path.write_text("{not json", encoding="utf-8")
+    assert RoomResolver(str(path)).rooms == {}
+    assert RoomResolver(str(tmp_path / "missing.json")).rooms == {}
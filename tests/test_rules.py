@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+from blive import Events
+from blive.rules import AhoCorasick, Rule, RuleEngine, RuleSet, load_rules
+
+
+def test_aho_corasick_finds_overlapping_keywords():
+    ac = AhoCorasick([("he", 1), ("she", 2), ("his", 3), ("hers", 4)])
+    assert ac.search("ushers") == {1, 2, 4}
+    assert ac.search("xyz") == set()
+
+
+def test_ruleset_keywords_and_regexes():
+    ruleset = RuleSet(
+        [
+            Rule("qq", r"q+\s*\d{6,}", regex=True),  # 没有固定开头, 走预过滤
+            Rule("wx", r"加微信\w+", regex=True),  # 固定开头加入自动机
+            Rule("ad", "代刷"),
+            Rule("en", "Spam"),
+        ]
+    )
+    assert ruleset.match("SPAM 代刷 加微信abc qq 1234567") == ["qq", "wx", "ad", "en"]
+    assert ruleset.match("加微信") == []  # 只命中固定开头, 正则不满足
+    assert ruleset.match("") == [] and ruleset.match("正常弹幕") == []
+    assert RuleSet([Rule("en", "Spam")], ignore_case=False).match("spam") == []
+
+
+def test_load_rules(tmp_path):
+    path = tmp_path / "rules.txt"
+    path.write_text("# 注释\n\nad 加微信\nqq re:q+\\s*\\d{6,}\n", encoding="utf-8")
+    assert load_rules(str(path)) == [Rule("ad", "加微信"), Rule("qq", r"q+\s*\d{6,}", regex=True)]
+
+
+def test_engine_emits_matches_and_reloads():
+    class Emitter:
+        def __init__(self) -> None:
+            self.handlers, self.emitted = {}, []
+
+        def on(self, event, f):
+            self.handlers[event] = f
+
+        def emit(self, event, arg):
+            self.emitted.append((event, arg))
+
+    async def main():
+        emitter = Emitter()
+        engine = RuleEngine([Rule("ad", "加微信")])
+        engine.attach(emitter)
+
+        def send(content):
+            emitter.handlers[Events.DANMU_MSG](SimpleNamespace(message=SimpleNamespace(content=content)))
+
+        send("加微信看福利")
+        send("正常弹幕")
+        await engine.reload([Rule("normal", "正常")])
+        send("加微信看福利")
+        send("正常弹幕")
+        assert [(e, m.rule_ids, m.content) for e, m in emitter.emitted] == [
+            (Events.RULE_MATCHED, ["ad"], "加微信看福利"),
+            (Events.RULE_MATCHED, ["normal"], "正常弹幕"),
+        ]
+        assert (engine.checked, engine.matched) == (4, 2)
+
+    asyncio.run(main())
+
+
+def test_backreference_rule_is_not_merged_into_prefilter():
+    # 合并后 (\w) 是第二个分组, \1 会指向第一条规则的分组
+    ruleset = RuleSet(
+        [
+            Rule("digits", r"(\d)\d{5,}", regex=True),
+            Rule("repeat", r"(\w)x\1", regex=True),
+            Rule("url", r"\w+\.com", regex=True),
+        ]
+    )
+    assert ruleset.match("axa") == ["repeat"]
+    assert ruleset.match("axb") == []
+    assert ruleset.match("axa 123456 a.com") == ["digits", "repeat", "url"]
+
+
+def test_named_backreference_rules():
+    ruleset = RuleSet(
+        [
+            Rule("a", r"(?P<c>\w)-(?P=c)", regex=True),
+            Rule("b", r"(?P<c>\d)\+(?P=c)", regex=True),
+            Rule("kw", "加微信"),
+        ]
+    )
+    assert ruleset.match("x-x") == ["a"]
+    assert ruleset.match("1+1 加微信") == ["b", "kw"]
@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("msgspec")
+
+from blive import BLiver, Events  # noqa: E402
+from blive.core import ProtocolVersion  # noqa: E402
+from blive.mockserver import pack_notify  # noqa: E402
+from blive.msg import DanMuMsg, SendGiftMsg  # noqa: E402
+from blive.schema import DanmuMsgBody, SendGiftBody, TypedDecoder  # noqa: E402
+
+DANMU = {
+    "cmd": "DANMU_MSG",
+    "info": [[0, 1, 25], "弹幕内容", [1234, "用户"], [21, "小孩梓", "阿梓", 510], [12, 0], ["", ""], 0, 0, None, {"ts": 1650000000, "ct": ""}],
+}
+GIFT = {
+    "cmd": "SEND_GIFT",
+    "data": {"uid": 42, "uname": "送礼用户", "giftId": 30607, "giftName": "小心心", "num": 3, "extra": {"x": 1}},
+}
+
+
+def test_decode_known_cmds_into_structs():
+    decoder = TypedDecoder()
+    danmu = decoder.decode("DANMU_MSG", json.dumps(DANMU).encode())
+    assert isinstance(danmu, DanmuMsgBody)
+    msg = DanMuMsg(danmu)
+    assert (msg.content, msg.sender.id, msg.sender.name, msg.sender.medal.medal_level) == ("弹幕内容", 1234, "用户", 21)
+    gift = decoder.decode("SEND_GIFT", json.dumps(GIFT).encode())
+    assert isinstance(gift, SendGiftBody) and gift["data"]["num"] == 3
+    assert SendGiftMsg(gift).gift["gift_name"] == "小心心"
+    assert gift.get("missing") is None
+
+
+def test_unknown_or_invalid_payloads_fall_back():
+    decoder = TypedDecoder()
+    assert decoder.decode("ONLINE_RANK_COUNT", b'{"cmd":"ONLINE_RANK_COUNT"}') is None
+    assert decoder.decode("SEND_GIFT", b'{"cmd":"SEND_GIFT","data":{"uid":"not-int"}}') is None
+
+
+def test_typed_bliver_mixes_structs_and_dicts():
+    frame = pack_notify([DANMU, {"cmd": "ONLINE_RANK_COUNT", "data": {"count": 7}}], ProtocolVersion.DEFLATE)
+
+    async def main():
+        app = BLiver(510, typed=True)
+        bodies = []
+        app.on(Events.DANMU_MSG, lambda ctx: bodies.append(ctx.body))
+        app.on(Events.ONLINE_RANK_COUNT, lambda ctx: bodies.append(ctx.body))
+        try:
+            app._handle_frame(frame)
+        finally:
+            await app.aio_session.close()
+        assert isinstance(bodies[0], DanmuMsgBody) and bodies[1] == {"cmd": "ONLINE_RANK_COUNT", "data": {"count": 7}}
+
+    asyncio.run(main())
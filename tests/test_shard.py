@@ -0,0 +1,60 @@
+import asyncio
+from collections import Counter
+
+from blive import Events
+from blive.mockserver import MockBLiveServer
+from blive.shard import HashRing, ShardSupervisor
+
+
+def test_hash_ring_spreads_rooms_and_moves_few():
+    ring = HashRing(range(4))
+    rooms = range(10000)
+    before = {r: ring.node_for(r) for r in rooms}
+    counts = Counter(before.values())
+    assert set(counts) == {0, 1, 2, 3} and min(counts.values()) > 1500
+    ring.add(4)
+    moved = [r for r in rooms if ring.node_for(r) != before[r]]
+    # 只有分给新节点的房间会移动, 约占 1/5
+    assert all(ring.node_for(r) == 4 for r in moved) and 1000 < len(moved) < 3000
+    ring.remove(4)
+    assert all(ring.node_for(r) == before[r] for r in rooms)
+
+
+def test_supervisor_forwards_and_resizes():
+    async def main():
+        server = await MockBLiveServer(rate=50, batch=5).start()
+        sup = ShardSupervisor(
+            workers=2,
+            forward=[Events.DANMU_MSG],
+            hub_kwargs={"ssl": False, "api_host": server.api_host},
+            batch_delay=0.01,
+        )
+        rooms = set()
+        sup.on(Events.DANMU_MSG, lambda event: rooms.add(event.room_id))
+        try:
+            await sup.start([510, 605, 21, 22])
+            assert set(sup.assignment) == {510, 605, 21, 22}
+            for _ in range(200):
+                if rooms == {510, 605, 21, 22}:
+                    break
+                await asyncio.sleep(0.05)
+            assert rooms == {510, 605, 21, 22} and sup.forwarded
+            moved = await sup.resize(3)
+            assert sorted(sup.workers) == [0, 1, 2]
+            assert moved == sum(1 for index in sup.assignment.values() if index == 2)
+            sup.remove_rooms([510])
+            assert 510 not in sup.assignment
+            assert sum(w["rooms"] for w in sup.stats()["workers"].values()) == 3
+            workers = list(sup.workers.values())
+            # 超时被 terminate 的工作进程也在返回前停止监听
+            await sup._stop_worker(workers[-1], timeout=0)
+            assert workers[-1].conn is None and not workers[-1].process.is_alive()
+        finally:
+            await sup.close()
+            await server.close()
+        # 关闭后不再监听任何工作进程的管道和退出事件
+        assert sup.workers == {} and all(w.conn is None for w in workers)
+        loop = asyncio.get_event_loop()
+        assert not any(loop.remove_reader(w.process.sentinel) for w in workers)
+
+    asyncio.run(main())
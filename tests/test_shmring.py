@@ -0,0 +1,173 @@
+import asyncio
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from blive import Events
+from blive.shmring import RingPublisher, RingReader, RingSubscriber
+
+
+def test_publish_and_read_across_wrap():
+    publisher = RingPublisher(f"blive-test-rw-{os.getpid()}", size=1024)
+    reader = RingReader(publisher.name)
+    try:
+        received = []
+        for seq in range(100):
+            publisher.write(seq, b"x" * (seq % 50))
+            publisher.commit()
+            received.extend(reader.read())
+        assert [r[0] for r in received] == list(range(100))
+        assert all(payload == b"x" * (room % 50) for room, _, payload in received)
+        assert publisher.write_pos > publisher.capacity and reader.lost == 0
+        publisher.write(1, b"y" * 2048)  # 大于 capacity 的消息无法写入
+        assert publisher.dropped == 1
+    finally:
+        reader.close()
+        publisher.close()
+
+
+def test_reader_slots_and_lapped_reader():
+    publisher = RingPublisher(f"blive-test-slots-{os.getpid()}", size=1024, max_readers=2)
+    readers = [RingReader(publisher.name) for _ in range(3)]
+    try:
+        assert [r.slot is not None for r in readers] == [True, True, False]
+        for seq in range(100):
+            publisher.write(seq, b"z" * 40)
+        publisher.commit()
+        assert [pid for pid, _ in publisher.readers()] == [os.getpid()] * 2
+        assert publisher.slow_readers() == [os.getpid()] * 2
+        # 落后超过 capacity, 跳到最新位置
+        assert readers[0].read() == [] and readers[0].lost == 1
+        assert publisher.slow_readers() == [os.getpid()]
+        readers[1].close()
+        assert len(publisher.readers()) == 1
+    finally:
+        readers[0].close()
+        readers[2].close()
+        publisher.close()
+
+
+def test_subscriber_dispatches_to_handlers():
+    async def main():
+        publisher = RingPublisher(f"blive-test-sub-{os.getpid()}", size=64 * 1024)
+        sub = RingSubscriber(publisher.name, poll_interval=0.001)
+        seen = []
+        sub.on(Events.DANMU_MSG, lambda ctx: seen.append((ctx.bliver.room_id, ctx.body["i"])))
+        task = asyncio.ensure_future(sub.listen())
+        try:
+            publisher.publish(510, [(None, b'{"cmd":"DANMU_MSG","i":1}'), (None, b'{"cmd":"ONLINE_RANK_COUNT"}')])
+            publisher.publish(605, [(None, b'{"cmd":"DANMU_MSG","i":2}')])
+            for _ in range(100):
+                if len(seen) == 2:
+                    break
+                await asyncio.sleep(0.01)
+            assert seen == [(510, 1), (605, 2)]
+        finally:
+            await sub.close()
+            task.cancel()
+            publisher.close()
+
+    asyncio.run(main())
+
+
+def payload_for(seq):
+    return bytes([seq % 251]) * (20 + seq * 7 % 90)
+
+
+def check(records):
+    for room_id, _, payload in records:
+        assert payload == payload_for(room_id)
+
+
+def test_from_start_after_wrap():
+    publisher = RingPublisher(f"blive-test-{os.getpid()}", size=4096)
+    try:
+        for seq in range(1000):
+            publisher.write(seq, payload_for(seq))
+            publisher.commit()
+            if seq % 37 == 0:
+                reader = RingReader(publisher.name, from_start=True)
+                records = reader.read()
+                reader.close()
+                assert records
+                check(records)
+                # 从最旧的完整消息读到最新的一条, 中间不缺
+                seqs = [r[0] for r in records]
+                assert seqs == list(range(seqs[0], seq + 1))
+    finally:
+        publisher.close()
+
+
+def test_lapped_reader_never_returns_torn_records():
+    publisher = RingPublisher(f"blive-test-torn-{os.getpid()}", size=8192)
+    reader = RingReader(publisher.name)
+    stop = threading.Event()
+
+    def write():
+        seq = 0
+        while not stop.is_set():
+            for _ in range(8):
+                publisher.write(seq, payload_for(seq))
+                seq += 1
+            publisher.commit()
+
+    interval = sys.getswitchinterval()
+    # 频繁切换线程, 让写入者在读者复制的过程中覆盖数据
+    sys.setswitchinterval(1e-6)
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        total = 0
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            records = reader.read()
+            check(records)
+            total += len(records)
+            time.sleep(0.0001)
+    finally:
+        stop.set()
+        writer.join()
+        sys.setswitchinterval(interval)
+        reader.close()
+        publisher.close()
+    assert total and reader.lost
+
+
+def _claim(name, barrier, done, results, crash):
+    barrier.wait()
+    reader = RingReader(name)
+    results.put(reader.slot)
+    if crash:
+        results.close()
+        results.join_thread()
+        os._exit(0)  # 不释放槽位
+    done.wait()
+    reader.close()
+
+
+def test_concurrent_claims_and_crashed_readers():
+    ctx = multiprocessing.get_context("spawn")
+    publisher = RingPublisher(f"blive-test-claim-{os.getpid()}", size=1024, max_readers=4)
+    barrier, done, results = ctx.Barrier(4), ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=_claim, args=(publisher.name, barrier, done, results, i < 2)) for i in range(4)]
+    for p in procs:
+        p.start()
+    try:
+        slots = [results.get(timeout=30) for _ in procs]
+        # 同时认领的读者拿到不同的槽位
+        assert None not in slots and len(set(slots)) == 4
+        for p in procs[:2]:
+            p.join(30)  # 回收后 pid 才不存在
+        # 异常退出的两个读者不再算作读者, 它们的槽位可以被新读者认领
+        assert len(publisher.readers()) == 2
+        readers = [RingReader(publisher.name) for _ in range(2)]
+        assert None not in [r.slot for r in readers] and len(publisher.readers()) == 4
+        for r in readers:
+            r.close()
+    finally:
+        done.set()
+        for p in procs:
+            p.join(30)
+        publisher.close()
@@ -0,0 +1,64 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from blive import BLiver, Events
+from blive.msg import DanMuMsg, InteractWordMsg
+from blive.sqlite import SQLiteSink
+
+
+def danmu(uid, content):
+    return DanMuMsg({"cmd": "DANMU_MSG", "info": [[0], content, [uid, f"user{uid}"], [], [], [], 0, 0, None, {}]})
+
+
+def test_rows_are_written_in_batches(tmp_path):
+    path = str(tmp_path / "blive.db")
+
+    async def main():
+        sink = SQLiteSink(path, cmds=[Events.DANMU_MSG, Events.INTERACT_WORD], batch_size=100, flush_interval=0.05)
+        for i in range(250):
+            assert sink.add(Events.DANMU_MSG, 510, danmu(i, f"弹幕{i}"), ts=1000.0 + i) is None
+        sink.add(Events.INTERACT_WORD, 605, InteractWordMsg({"data": {"uid": 7, "uname": "u", "msg_type": 2}}), ts=1.0)
+        await sink.close()
+        return sink
+
+    sink = asyncio.run(main())
+    assert sink.written == 251 and sink.transactions >= 3
+    db = sqlite3.connect(path)
+    assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    rows = db.execute("SELECT room_id, ts, uid, uname, medal_name, content FROM danmu_msg ORDER BY ts").fetchall()
+    assert len(rows) == 250 and rows[0] == (510, 1000.0, 0, "user0", "", "弹幕0")
+    assert db.execute("SELECT room_id, uid, msg_type FROM interact_word").fetchall() == [(605, 7, 2)]
+
+
+def test_full_queue_applies_backpressure(tmp_path):
+    async def main():
+        sink = SQLiteSink(str(tmp_path / "blive.db"), cmds=[Events.DANMU_MSG], maxsize=2, flush_interval=0.01)
+        waits = []
+        for i in range(20):
+            ret = sink.add(Events.DANMU_MSG, 510, danmu(i, "x"))
+            if ret is not None:
+                waits.append(ret)
+                await ret
+        await sink.close()
+        return sink, waits
+
+    sink, waits = asyncio.run(main())
+    assert sink.written == 20 and sink.blocked == len(waits)
+
+
+def test_attach_and_connect_error(tmp_path):
+    async def main():
+        app = BLiver(510)
+        sink = SQLiteSink(str(tmp_path / "blive.db"), cmds=[Events.DANMU_MSG], flush_interval=0.01)
+        sink.attach(app)
+        try:
+            assert app.listeners(Events.DANMU_MSG)
+        finally:
+            await app.aio_session.close()
+        await sink.close()
+
+    asyncio.run(main())
+    with pytest.raises(sqlite3.OperationalError):
+        SQLiteSink(str(tmp_path / "missing" / "blive.db"))
@@ -0,0 +1,25 @@
+from blive.timewheel import TimingWheel
+
+
+def test_timers_fire_on_their_tick():
+    wheel = TimingWheel(tick=1.0, slots=4)
+    fired = []
+    wheel.call_later(1, fired.append, "a")
+    wheel.call_later(2.5, fired.append, "b")  # 向上取整到 3 个 tick
+    wheel.call_later(6, fired.append, "c")  # 超过一圈, 第二次经过该槽时才触发
+    cancelled = wheel.call_later(1, fired.append, "x")
+    cancelled.cancel()
+    assert len(wheel) == 3
+    ticks = []
+    for i in range(1, 7):
+        wheel.advance()
+        ticks.append((i, list(fired)))
+    assert ticks == [
+        (1, ["a"]),
+        (2, ["a"]),
+        (3, ["a", "b"]),
+        (4, ["a", "b"]),
+        (5, ["a", "b"]),
+        (6, ["a", "b", "c"]),
+    ]
+    assert len(wheel) == 0